@@ -0,0 +1,262 @@
+"""Mesures de performance de la génération (sans Office : conversion par FakeConverter).
+
+Usage :
+    python -m Worker.benchmarks deck-io template_certificat.pptx [--count 200] [--batch-size 1] [--output DOSSIER]
+    python -m Worker.benchmarks mail [--count 200] [--latency 0.2] [--error-rate 0.05] [--concurrency 4] [--rate 0]
+    python -m Worker.benchmarks kpi [--rows 300000] [--years 4] [--units 40]
+
+deck-io : écritures dans le dossier de sortie par certificat, ancien flux (PPTX
+écrit à côté du PDF, converti puis supprimé) contre decks en mémoire (seul le
+PDF est écrit). `--output` permet de viser un partage réseau pour mesurer le
+gain en temps, le gain en octets ne dépendant pas du dossier.
+
+mail : envoi par le dispatcher asynchrone vers un serveur SMTP local (aiosmtpd
+requis) qui ajoute une latence par message et refuse une part des messages
+avec une erreur passagère (451), comparé à un envoi en série sans retry.
+
+kpi : rafraîchissement du tableau de bord KPI sur un historique synthétique,
+filtrage + groupby des lignes brutes (ancien `update_view`) contre requête du
+cube pré-agrégé (Worker/kpi_cube.py), pour un seuil balayé de 70 à 90 %.
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+
+from Worker.converters import FakeConverter
+from Worker.generation import CertificateGenerator, CertificateJob
+from Worker.mail import MailSkeleton
+from Worker.transports import SmtpTransport
+from Worker.dispatcher import MailDispatcher, MailRequest
+from Worker.kpi_cube import KPICube
+
+
+def _jobs(output_folder, count):
+    for index in range(count):
+        replacements = {
+            "{{NOM}}": f"Participant {index}",
+            "{{SSO}}": str(100000000 + index),
+            "{{FORMATION}}": "Benchmark",
+            "{{DATE_FORMATION}}": "01/01/2025",
+            "{{DATE_EDITION}}": "01/01/2025",
+        }
+        pdf_path = os.path.join(output_folder, f"Benchmark - Participant {index}.pdf")
+        yield CertificateJob(index, replacements["{{NOM}}"], "", replacements, pdf_path)
+
+
+def _folder_usage(folder):
+    return sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+
+
+def _legacy_run(generator, jobs):
+    """Ancien flux : PPTX enregistré dans le dossier de sortie, converti puis supprimé."""
+    written = operations = 0
+    for job in jobs:
+        pptx_path = os.path.splitext(job.pdf_path)[0] + ".pptx"
+        generator.template.save(job.replacements, pptx_path)
+        written += os.path.getsize(pptx_path)
+        generator.converter.convert(pptx_path, job.pdf_path)
+        os.remove(pptx_path)
+        # Écriture du PPTX, écriture du PDF, suppression du PPTX
+        operations += 3
+    return written, operations
+
+
+def _memory_run(generator, jobs):
+    operations = 0
+    for result in generator.generate_all(jobs):
+        operations += 1 if result.ok else 0
+    return 0, operations
+
+
+def deck_io(args):
+    root = args.output or tempfile.mkdtemp(prefix="certificates_bench_")
+    results = {}
+    try:
+        for mode, run in (("file", _legacy_run), ("memory", _memory_run)):
+            folder = os.path.join(root, mode)
+            os.makedirs(folder, exist_ok=True)
+            jobs = list(_jobs(folder, args.count))
+            batch_size = args.batch_size if mode == "memory" else 1
+            with CertificateGenerator(args.template, converter=FakeConverter(), batch_size=batch_size) as generator:
+                started = time.perf_counter()
+                pptx_bytes, operations = run(generator, jobs)
+                elapsed = time.perf_counter() - started
+            pdf_bytes = _folder_usage(folder)
+            leftovers = [name for name in os.listdir(folder) if not name.endswith(".pdf")]
+            results[mode] = (pptx_bytes + pdf_bytes, operations, elapsed, leftovers)
+    finally:
+        if not args.output:
+            shutil.rmtree(root, ignore_errors=True)
+
+    for mode, (written, operations, elapsed, leftovers) in results.items():
+        print(f"{mode:>6}: {written / args.count / 1e3:8.1f} kB written and {operations / args.count:.0f} "
+              f"file operations per certificate in the output folder, {elapsed / args.count * 1e3:6.2f} ms "
+              f"per certificate" + (f", {len(leftovers)} leftover files" if leftovers else ""))
+    saved = results["file"][0] - results["memory"][0]
+    print(f"saved {saved / args.count / 1e3:.1f} kB of output-folder writes per certificate")
+    return 0
+
+
+class _SlowSmtpHandler:
+    """Serveur SMTP de test : `latency` secondes par message, 451 pour une part `error_rate` des messages."""
+
+    def __init__(self, latency, error_rate, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.accepted = 0
+        self.rejected = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.latency)
+        if self.random.random() < self.error_rate:
+            self.rejected += 1
+            return "451 4.3.2 Temporary server error, try again later"
+        self.accepted += 1
+        return "250 OK"
+
+
+def mail(args):
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        print("aiosmtpd is required for the mail benchmark (pip install aiosmtpd)")
+        return 1
+
+    attachment = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+    attachment.write(b"%PDF-1.4\n" + os.urandom(args.attachment_kb * 1024))
+    attachment.close()
+    skeleton = MailSkeleton("Dears,\n\nPlease find attached your certificate.", cc="cc@example.com",
+                            sender="certificates@example.com")
+    try:
+        for mode in ("serial", "dispatcher"):
+            handler = _SlowSmtpHandler(args.latency, args.error_rate)
+            controller = Controller(handler, hostname="127.0.0.1", port=args.port)
+            controller.start()
+            try:
+                concurrency = 1 if mode == "serial" else args.concurrency
+                transport = SmtpTransport("127.0.0.1", args.port, pool_size=concurrency, retries=0)
+                started = time.perf_counter()
+                if mode == "serial":
+                    # Ancien comportement : un envoi après l'autre, pas de nouvel essai
+                    sent = failed = retried = 0
+                    for index in range(args.count):
+                        try:
+                            transport.send(skeleton, f"participant{index}@example.com", "Certificate",
+                                           attachment.name)
+                            sent += 1
+                        except Exception:
+                            failed += 1
+                else:
+                    dispatcher = MailDispatcher(transport, concurrency, args.rate or None, retries=args.retries,
+                                                backoff=args.backoff)
+                    with dispatcher:
+                        for index in range(args.count):
+                            dispatcher.submit(MailRequest(f"participant{index}@example.com", "Certificate",
+                                                          skeleton, attachment.name, index))
+                    sent, failed, retried = dispatcher.sent, dispatcher.failed, dispatcher.retried
+                elapsed = time.perf_counter() - started
+                transport.close()
+            finally:
+                controller.stop()
+            print(f"{mode:>10}: {sent} sent, {failed} failed, {retried} retries in {elapsed:.2f}s "
+                  f"({sent / elapsed * 60:.0f} mails/min, {transport.connections_opened} SMTP connections)")
+    finally:
+        os.remove(attachment.name)
+    return 0
+
+
+def _synthetic_attempts(rows, years, units, seed=0):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    names = np.array([f"U{index:03d}" for index in range(units)], dtype=object)
+    regions = {name: ("ERCIS", "NAM", "MENAT", "LAM", "CEAP", "IND")[index % 6] for index, name in enumerate(names)}
+    df = pd.DataFrame({
+        "SDSU Unit": rng.choice(names, rows),
+        "Date": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, years * 365 * 86400, rows), unit="s"),
+        "Percent Score": rng.integers(0, 101, rows),
+        "Attempts": rng.integers(1, 4, rows),
+    })
+    df["Region"] = df["SDSU Unit"].map(regions)
+    return df
+
+
+def _legacy_kpi(df, start, end, success_threshold):
+    import pandas as pd
+
+    df = df.copy()
+    df = df[(df["Date"] >= pd.to_datetime(start)) & (df["Date"] <= pd.to_datetime(end))]
+    return df.groupby(["Region", "SDSU Unit"]).agg(
+        Attempts=('Attempts', 'sum'),
+        Successes=('Percent Score', lambda x: (x >= success_threshold).sum())
+    ).reset_index()
+
+
+def kpi(args):
+    df = _synthetic_attempts(args.rows, args.years, args.units)
+    started = time.perf_counter()
+    cube = KPICube.from_frame(df)
+    build = time.perf_counter() - started
+    start, end = cube.date_bounds()
+    thresholds = range(70, 91)
+
+    timings = {}
+    for mode in ("rows", "cube"):
+        started = time.perf_counter()
+        for threshold in thresholds:
+            if mode == "rows":
+                _legacy_kpi(df, start, end, threshold)
+            else:
+                cube.query(start, end, threshold)
+        timings[mode] = (time.perf_counter() - started) / len(thresholds)
+
+    print(f"{args.rows} attempts over {args.years} years, {args.units} units: cube of {len(cube)} cells "
+          f"built in {build:.2f}s")
+    for mode, seconds in timings.items():
+        print(f"{mode:>5}: {seconds * 1e3:8.2f} ms per refresh")
+    print(f"speed-up x{timings['rows'] / timings['cube']:.0f}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Certificate generation benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    io_parser = commands.add_parser("deck-io", help="output-folder I/O per certificate, file vs in-memory decks")
+    io_parser.add_argument("template")
+    io_parser.add_argument("--count", type=int, default=200)
+    io_parser.add_argument("--batch-size", type=int, default=1)
+    io_parser.add_argument("--output", help="output folder to measure (temporary folder if omitted)")
+    mail_parser = commands.add_parser("mail", help="asynchronous mail dispatch against a slow, flaky SMTP stand-in")
+    mail_parser.add_argument("--count", type=int, default=200)
+    mail_parser.add_argument("--latency", type=float, default=0.2, help="seconds per message on the server")
+    mail_parser.add_argument("--error-rate", type=float, default=0.05, help="share of messages refused with 451")
+    mail_parser.add_argument("--concurrency", type=int, default=4)
+    mail_parser.add_argument("--rate", type=float, default=0, help="messages per minute (0 = unlimited)")
+    mail_parser.add_argument("--retries", type=int, default=3)
+    mail_parser.add_argument("--backoff", type=float, default=0.5)
+    mail_parser.add_argument("--attachment-kb", type=int, default=100)
+    mail_parser.add_argument("--port", type=int, default=8025)
+    kpi_parser = commands.add_parser("kpi", help="KPI dashboard refresh, raw-row groupby vs pre-aggregated cube")
+    kpi_parser.add_argument("--rows", type=int, default=300000)
+    kpi_parser.add_argument("--years", type=int, default=4)
+    kpi_parser.add_argument("--units", type=int, default=40)
+    args = parser.parse_args(argv)
+
+    if args.command == "deck-io":
+        return deck_io(args)
+    if args.command == "mail":
+        return mail(args)
+    if args.command == "kpi":
+        return kpi(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
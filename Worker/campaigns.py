@@ -0,0 +1,403 @@
+"""Mode batch : plusieurs campagnes (exports Forms) générées en un seul run.
+
+Usage :
+    python -m Worker.campaigns init Templates --template template_certificat.pptx > campaigns.json
+    python -m Worker.campaigns run campaigns.json [--workers 1] [--backend native] [--no-mail] [--quiet]
+
+Le manifeste (JSON) associe chaque export à un titre de formation et à un
+modèle ; les clés de premier niveau servent de valeurs par défaut :
+
+    {
+        "template": "template_certificat.pptx",
+        "output": "Certificats",
+        "score_min": 80,
+        "campaigns": [
+            {"excel": "Templates/FORM_DSA_LV1_....xlsx", "title": "DS Agile LV1"},
+            {"excel": "Templates/FORM_DSA_LV2_....xlsx", "title": "DS Agile LV2", "output": "Certificats/LV2"}
+        ]
+    }
+
+Les chemins relatifs partent du dossier du manifeste ; sans `output` propre,
+une campagne écrit dans `<output>/<name>` (name : titre par défaut). Chaque
+campagne garde son dossier de sortie, son manifeste de reprise et son outbox
+(Worker/engine.py) ; les modèles, les sessions de conversion et le
+dispatcher des mails sont partagés par tout le batch.
+"""
+import os
+import re
+import sys
+import json
+import glob
+import time
+import logging
+import argparse
+from collections import namedtuple
+from datetime import date
+
+from Worker.engine import EventSource, CertificateEngine, ConverterSessions, DEFAULT_STAGE_WORKERS
+from Worker.generation import RENDER_BACKENDS, CertificateGenerator
+from Worker.parallel import generate_tagged
+from Worker.pipeline import Pipeline
+from Worker.roster import FIRST_DATA_ROW
+from Worker.mail import MailComposer
+from Worker.transports import transport_from_env
+from Worker.dispatcher import MailDispatcher
+from Worker.metrics import RunMetrics, ProgressTracker, progress_stats, format_progress
+
+
+Campaign = namedtuple("Campaign", ["name", "excel", "title", "template", "output", "score_min", "date_start",
+                                   "date_end"])
+
+# Bilan d'une campagne à la fin du batch (error : None si terminée normalement)
+CampaignSummary = namedtuple("CampaignSummary", ["name", "rows", "certificates", "mails_sent", "mails_failed",
+                                                 "output", "error"])
+
+# Nom d'un export Forms : FORM_<campagne>_<id>_<horodatage>.xlsx
+_EXPORT_NAME = re.compile(r"^FORM_(.+?)_\d+_\d+_")
+
+
+def _date(value):
+    return date.fromisoformat(value) if value else None
+
+
+def load_campaigns(path):
+    """Lit le manifeste JSON et retourne la liste des Campaign (chemins absolus)."""
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+
+    def resolve(value):
+        return os.path.normpath(os.path.join(base, value)) if value else None
+
+    defaults = {key: value for key, value in manifest.items() if key != "campaigns"}
+    campaigns, names = [], set()
+    for position, entry in enumerate(manifest.get("campaigns", []), 1):
+        settings = dict(defaults, **entry)
+        missing = [key for key in ("excel", "title", "template") if not settings.get(key)]
+        if missing:
+            raise ValueError(f"Campaign {position} in {path}: missing {', '.join(missing)}")
+        name = settings.get("name") or settings["title"]
+        if name in names:
+            raise ValueError(f"Campaign {position} in {path}: duplicate name {name!r}")
+        names.add(name)
+        output = settings.get("output") if "output" in entry else None
+        if output is None:
+            output = os.path.join(defaults.get("output") or "Certificats", re.sub(r'[\\/*?:"<>|]', "", name))
+        campaigns.append(Campaign(
+            name, resolve(settings["excel"]), settings["title"], resolve(settings["template"]), resolve(output),
+            float(settings.get("score_min", 80)), _date(settings.get("date_start")), _date(settings.get("date_end")),
+        ))
+    return campaigns
+
+
+def estimate_rows(excel_path):
+    """Nombre de lignes annoncé par le classeur (sans le lire), pour l'ordonnancement et la progression."""
+    try:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(excel_path, read_only=True)
+        try:
+            return max(0, (workbook.worksheets[0].max_row or 0) - FIRST_DATA_ROW + 1)
+        finally:
+            workbook.close()
+    except Exception:
+        # Format non lu par openpyxl : la taille du fichier suffit pour ordonner
+        return os.path.getsize(excel_path) // 1024 if os.path.exists(excel_path) else 0
+
+
+class CampaignBatch(EventSource):
+    """Exécute plusieurs campagnes dans un seul pipeline (ou un seul pool de process).
+
+    Les campagnes sont lues l'une après l'autre, la plus grande d'abord : le
+    remplissage et la conversion n'attendent jamais la fin d'une campagne pour
+    commencer la suivante, et la dernière tranche reste courte. Un modèle
+    n'est chargé qu'une fois par batch, les threads de conversion (ou les
+    process) gardent leur session pour toutes les campagnes et un seul
+    dispatcher envoie les mails de toutes les outbox. Les événements des
+    campagnes sont réunis : `progress` préfixé du nom de la campagne,
+    `progress_percent` et `stats` globaux (mesures et avancement communs),
+    `finished` une fois, avec le bilan.
+    """
+
+    def __init__(self, campaigns, render_backend=None, workers=1, batch_size=1, stage_workers=None,
+                 queue_size=16, converter=None, max_conversions=200, overlay_background="powerpoint",
+                 excel_cache=None, resume=True, mail_transport=None, mail_concurrency=None, mail_rate=None,
+                 send_mail=True, on_event=None):
+        self.campaigns = list(campaigns)
+        self.render_backend = render_backend or os.environ.get("CERT_RENDER_BACKEND", "powerpoint")
+        if self.render_backend not in RENDER_BACKENDS:
+            raise ValueError(f"Unknown render backend: {self.render_backend}")
+        self.workers = workers
+        self.batch_size = batch_size
+        self.stage_workers = dict(DEFAULT_STAGE_WORKERS, **(stage_workers or {}))
+        self.queue_size = queue_size
+        self.converter = converter
+        self.max_conversions = max_conversions
+        self.overlay_background = overlay_background
+        self.excel_cache = excel_cache
+        self.resume = resume
+        self.mail_transport = mail_transport or transport_from_env()
+        self.mail_concurrency = mail_concurrency or int(os.environ.get("CERT_MAIL_CONCURRENCY", 2))
+        self.mail_rate = mail_rate if mail_rate is not None else float(os.environ.get("CERT_MAIL_RATE", 0))
+        self.send_mail = send_mail
+        self.on_event = on_event
+        self.mail_composer = MailComposer()
+        self.dispatcher = None
+        self.pipeline = None
+        self.sessions = ConverterSessions(converter)
+        self.engines = []
+        self.rows = {}
+        self.errors = {}
+        self.metrics = RunMetrics()
+        self.progress = None
+        self.generators = {}
+        self.summary = []
+        self.error = None
+        self.total_certificates = 0
+
+    def schedule(self):
+        """Ordre de lecture : campagnes les plus longues d'abord."""
+        self.rows = {campaign.name: estimate_rows(campaign.excel) for campaign in self.campaigns}
+        return sorted(self.campaigns, key=lambda campaign: self.rows[campaign.name], reverse=True)
+
+    def engine_for(self, campaign):
+        engine = CertificateEngine(
+            campaign.template, campaign.excel, campaign.title, campaign.output, campaign.score_min,
+            campaign.date_start, campaign.date_end, converter=self.converter, max_conversions=self.max_conversions,
+            batch_size=self.batch_size, render_backend=self.render_backend,
+            overlay_background=self.overlay_background, workers=self.workers, queue_size=self.queue_size,
+            excel_cache=self.excel_cache, resume=self.resume, mail_transport=self.mail_transport,
+            mail_concurrency=self.mail_concurrency, mail_rate=self.mail_rate, send_mail=self.send_mail,
+            mail_composer=self.mail_composer, mail_dispatcher=self.dispatcher, metrics=self.metrics,
+            progress=self.progress, on_event=lambda event, value: self.relay(campaign.name, event, value),
+        )
+        engine.campaign = campaign
+        return engine
+
+    def relay(self, name, event, value):
+        if event == "progress":
+            self.emit("progress", f"[{name}] {value}")
+        elif event in ("progress_percent", "stats", "queue_depths"):
+            # Déjà globaux : toutes les campagnes publient le même avancement
+            self.emit(event, value)
+
+    def start_campaign(self, engine):
+        """Ouvre une campagne ; une erreur (fichier absent, modèle illisible) n'arrête que celle-ci."""
+        name = engine.campaign.name
+        try:
+            jobs = engine.open_run()
+            engine.pipeline = self.pipeline
+            logging.info(f"Campaign {name}: {engine.excel_path} -> {engine.output_folder}")
+            return jobs
+        except Exception as e:
+            self.fail_campaign(engine, e)
+            return None
+
+    def fail_campaign(self, engine, error):
+        name = engine.campaign.name
+        self.errors[name] = error
+        if engine.roster is None or not engine.roster.rows_read:
+            # Lignes annoncées pour cette campagne retirées de l'estimation du total
+            self.progress.add_rows(self.rows[name], 0)
+        self.emit("progress", f"[{name}] ❌ {error}")
+        logging.error(f"Campaign {name} failed: {error}")
+
+    def generator(self, template_path):
+        """Générateur du modèle, chargé une fois ; tous partagent la session de conversion du premier."""
+        generator = self.generators.get(template_path)
+        if generator is None:
+            shared = next(iter(self.generators.values())).converter if self.generators else self.converter
+            generator = CertificateGenerator(
+                template_path, render_backend=self.render_backend, converter=shared,
+                max_conversions=self.max_conversions, batch_size=self.batch_size,
+                overlay_background=self.overlay_background,
+            ).open()
+            generator.metrics = self.metrics
+            self.generators[template_path] = generator
+            if self.sessions.converter is None:
+                self.sessions.converter = generator.converter
+        return generator
+
+    def chunks(self):
+        """Source du pipeline : (campagne, générateur, lot de jobs), campagne après campagne."""
+        for engine in self.engines:
+            jobs = self.start_campaign(engine)
+            if jobs is None:
+                continue
+            try:
+                generator = self.generator(os.path.abspath(engine.template_path))
+            except Exception as e:
+                self.fail_campaign(engine, e)
+                continue
+            try:
+                for chunk in generator.chunks(jobs):
+                    yield engine, generator, chunk
+            except Exception as e:
+                # Export illisible en cours de lecture : les lots déjà lus sont produits, le batch continue
+                self.fail_campaign(engine, e)
+        self.progress.reading_done()
+
+    def parallel_results(self):
+        """Source du pipeline en mode multi-process : un seul pool pour les jobs de toutes les campagnes."""
+        tasks = []
+        for position, engine in enumerate(self.engines):
+            jobs = self.start_campaign(engine)
+            if jobs is None:
+                continue
+            try:
+                jobs = list(jobs)
+            except Exception as e:
+                self.fail_campaign(engine, e)
+                continue
+            for job in jobs:
+                if job.row in engine.resumed_rows:
+                    result = engine.resumed_result(job)
+                    engine.record(result)
+                    yield engine, [result]
+            todo = [job for job in jobs if job.row not in engine.resumed_rows]
+            tasks.append((position, os.path.abspath(engine.template_path), todo))
+        self.progress.reading_done()
+        if not tasks:
+            return
+        settings = dict(self.engines[tasks[0][0]].generator_settings(), template_path=tasks[0][1])
+        for position, result in generate_tagged(tasks, settings, self.workers, metrics=self.metrics):
+            engine = self.engines[position]
+            engine.record(result)
+            yield engine, [result]
+
+    def build_pipeline(self):
+        pipeline = Pipeline()
+        if self.workers <= 1:
+            def fill(item):
+                engine, generator, jobs = item
+                return engine, generator, engine.fill_deck(generator, jobs)
+
+            def convert(item):
+                engine, generator, deck = item
+                return engine, engine.convert_deck(generator, deck, self.sessions.get())
+
+            pipeline.add_stage("fill", fill, self.stage_workers["fill"], self.queue_size)
+            pipeline.add_stage("convert", convert, self.stage_workers["convert"], self.queue_size,
+                               thread_exit=self.sessions.close_thread)
+        pipeline.add_stage("mail", lambda item: item[0].deliver(item[1]), self.stage_workers["mail"],
+                           self.queue_size)
+        return pipeline
+
+    def run(self):
+        started = time.perf_counter()
+        try:
+            if self.send_mail:
+                self.dispatcher = MailDispatcher(self.mail_transport, self.mail_concurrency, self.mail_rate or None,
+                                                 queue_size=self.queue_size).start()
+            campaigns = self.schedule()
+            self.progress = ProgressTracker(sum(self.rows.values()),
+                                            interval=float(os.environ.get("CERT_PROGRESS_INTERVAL", 0.5)))
+            self.engines = [self.engine_for(campaign) for campaign in campaigns]
+            self.emit("progress", f"🕒 {len(self.engines)} campaigns, about {sum(self.rows.values())} rows")
+            self.pipeline = self.build_pipeline()
+            self.pipeline.run(self.chunks() if self.workers <= 1 else self.parallel_results())
+
+            # Les derniers mails de chaque campagne partent avant le bilan
+            for engine in self.engines:
+                engine.close_run()
+            self.summarize()
+            stats = progress_stats(self.progress, self.metrics)
+            self.emit("progress_percent", stats["percent"])
+            self.emit("stats", stats)
+            for line in self.metrics.report():
+                logging.info(f"Stage {line}")
+            failed = sum(1 for line in self.summary if line.error is not None)
+            self.emit("finished", f"✅ {self.total_certificates} certificates generated for "
+                                  f"{len(self.summary) - failed}/{len(self.summary)} campaigns "
+                                  f"in {time.perf_counter() - started:.0f}s.")
+        except Exception as e:
+            self.error = e
+            error_msg = f"General error : {e}"
+            self.emit("finished", f"❌ {error_msg}")
+            logging.error(error_msg)
+        finally:
+            for engine in self.engines:
+                engine.close_run()
+            for generator in self.generators.values():
+                generator.close()
+            if self.dispatcher is not None:
+                self.dispatcher.close()
+            self.mail_transport.close()
+
+    def summarize(self):
+        self.summary = [
+            CampaignSummary(engine.campaign.name, engine.roster.total_rows if engine.roster else None,
+                            engine.total_certificates, engine.mails_sent, engine.mails_failed,
+                            engine.output_folder, self.errors.get(engine.campaign.name))
+            for engine in self.engines
+        ]
+        self.total_certificates = sum(line.certificates for line in self.summary)
+        for line in self.summary:
+            logging.info(f"Campaign {line.name}: {line.certificates} certificates, {line.mails_sent} mails sent, "
+                         f"{line.mails_failed} failed" + (f", error: {line.error}" if line.error else ""))
+        return self.summary
+
+
+def scaffold(folder, template, output="Certificats", pattern="FORM_*.xlsx"):
+    """Manifeste de départ pour les exports d'un dossier (titres à relire)."""
+    base = os.path.abspath(os.getcwd())
+    campaigns = []
+    for path in sorted(glob.glob(os.path.join(folder, pattern))):
+        match = _EXPORT_NAME.match(os.path.basename(path))
+        name = match.group(1) if match else os.path.splitext(os.path.basename(path))[0]
+        title = re.sub(r"^DSA_", "DS Agile ", name).replace("_", " ")
+        campaigns.append({"name": name, "excel": os.path.relpath(path, base), "title": title})
+    return {"template": template, "output": output, "score_min": 80, "campaigns": campaigns}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the certificates of several Forms exports in one run.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    init_parser = commands.add_parser("init", help="print a campaign manifest for the exports of a folder")
+    init_parser.add_argument("folder")
+    init_parser.add_argument("--template", default="template_certificat.pptx")
+    init_parser.add_argument("--output", default="Certificats")
+    run_parser = commands.add_parser("run", help="run every campaign of a manifest")
+    run_parser.add_argument("manifest")
+    run_parser.add_argument("--backend", choices=RENDER_BACKENDS, help="render backend (default: CERT_RENDER_BACKEND)")
+    run_parser.add_argument("--workers", type=int, default=1, help="generation processes")
+    run_parser.add_argument("--batch-size", type=int, default=1, help="certificates per PowerPoint conversion")
+    run_parser.add_argument("--convert-threads", type=int, default=1, help="conversion threads (single process)")
+    run_parser.add_argument("--only", nargs="+", help="campaign names to run (all if omitted)")
+    run_parser.add_argument("--no-mail", action="store_true", help="generate the PDFs without sending any mail")
+    run_parser.add_argument("--no-resume", action="store_true", help="ignore the run manifests")
+    run_parser.add_argument("--quiet", action="store_true", help="only print the final summary")
+    run_parser.add_argument("--stats", action="store_true", help="print throughput and ETA while running")
+    run_parser.add_argument("--log-file", default="certificates_generation.log")
+    args = parser.parse_args(argv)
+
+    if args.command == "init":
+        print(json.dumps(scaffold(args.folder, args.template, args.output), indent=4, ensure_ascii=False))
+        return 0
+
+    logging.basicConfig(filename=args.log_file, level=logging.INFO,
+                        format="%(asctime)s - %(levelname)s - %(message)s")
+    campaigns = load_campaigns(args.manifest)
+    if args.only:
+        campaigns = [campaign for campaign in campaigns if campaign.name in args.only]
+    batch = CampaignBatch(campaigns, render_backend=args.backend, workers=args.workers, batch_size=args.batch_size,
+                          stage_workers={"convert": args.convert_threads}, resume=not args.no_resume,
+                          send_mail=not args.no_mail)
+    for event, value in batch.events():
+        if event == "finished" or (event == "progress" and not args.quiet):
+            print(value, flush=True)
+        elif event == "stats" and args.stats:
+            print(format_progress(value), flush=True)
+
+    print(f"{'campaign':<24} {'rows':>6} {'certificates':>12} {'mails':>6} {'failed':>6}  output")
+    for line in batch.summary:
+        print(f"{line.name:<24} {line.rows if line.rows is not None else '-':>6} {line.certificates:>12} "
+              f"{line.mails_sent:>6} {line.mails_failed:>6}  {line.output}"
+              + (f"  ERROR: {line.error}" if line.error else ""))
+    for line in batch.metrics.report():
+        print(line)
+    return 1 if batch.error is not None or any(line.error for line in batch.summary) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
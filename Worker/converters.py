@@ -0,0 +1,268 @@
+import os
+import re
+import copy
+import html
+import uuid
+import logging
+import zipfile
+import tempfile
+import posixpath
+from contextlib import contextmanager
+import xml.etree.ElementTree as ET
+
+
+PP_SAVE_AS_PDF = 32  # ppSaveAsPDF
+
+NS_P = "http://schemas.openxmlformats.org/presentationml/2006/main"
+NS_R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+def scratch_dir():
+    """Dossier des fichiers intermédiaires (decks à convertir, PDF de lot avant découpe).
+
+    CERT_SCRATCH_DIR s'il est défini, sinon /dev/shm (tmpfs, en mémoire) s'il existe,
+    sinon le dossier temporaire local : jamais le dossier de sortie (souvent un partage réseau).
+    """
+    folder = os.environ.get("CERT_SCRATCH_DIR")
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+        return folder
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+@contextmanager
+def scratch_path(suffix, data=None):
+    """Chemin temporaire dans `scratch_dir()`, supprimé à la sortie du bloc.
+
+    Avec `data` (bytes), le fichier est créé avec ce contenu ; sinon seul le chemin est réservé
+    (fichier de sortie d'une conversion).
+    """
+    path = os.path.join(scratch_dir(), f"cert_{os.getpid()}_{uuid.uuid4().hex}{suffix}")
+    try:
+        if data is not None:
+            with open(path, "wb") as f:
+                f.write(data)
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Could not delete scratch file {path}: {e}")
+
+
+class PdfConverter:
+    """Session de conversion PPTX -> PDF partagée pour tout un run.
+
+    La session démarre l'application à la première conversion, la redémarre
+    toutes les `max_conversions` conversions (fuites mémoire PowerPoint) ou
+    après un plantage, et n'est fermée qu'une fois par `close()`.
+    Les sous-classes implémentent `_start`, `_stop` et `_convert`.
+    """
+
+    def __init__(self, max_conversions=200, retries=1):
+        self.max_conversions = max_conversions
+        self.retries = retries
+        self.started = False
+        self.sessions_started = 0
+        self.conversions = 0
+        self.session_conversions = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def open(self):
+        if not self.started:
+            self._start()
+            self.started = True
+            self.sessions_started += 1
+            self.session_conversions = 0
+
+    def close(self):
+        if self.started:
+            try:
+                self._stop()
+            except Exception as e:
+                logging.warning(f"Converter shutdown error: {e}")
+            finally:
+                self.started = False
+
+    def restart(self):
+        self.close()
+        self.open()
+
+    def spawn(self):
+        """Nouvelle session (non démarrée) avec les mêmes réglages, pour un autre thread de conversion."""
+        clone = copy.copy(self)
+        clone.started = False
+        clone.sessions_started = 0
+        clone.conversions = 0
+        clone.session_conversions = 0
+        return clone
+
+    def convert(self, pptx_path, pdf_path):
+        attempt = 0
+        while True:
+            self.open()
+            try:
+                self._convert(os.path.abspath(pptx_path), os.path.abspath(pdf_path))
+                break
+            except Exception as e:
+                logging.error(f"PDF conversion failed for {pptx_path} (attempt {attempt + 1}): {e}")
+                # Une session plantée n'est pas réutilisée
+                self.close()
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+
+        self.conversions += 1
+        self.session_conversions += 1
+        if self.max_conversions and self.session_conversions >= self.max_conversions:
+            logging.info(f"Converter restarted after {self.session_conversions} conversions")
+            self.close()
+
+    def convert_bytes(self, pptx_data, pdf_path):
+        """Convertit un deck produit en mémoire : il ne passe que par un fichier temporaire du scratch."""
+        with scratch_path(".pptx", pptx_data) as pptx_path:
+            self.convert(pptx_path, pdf_path)
+
+    def _start(self):
+        raise NotImplementedError
+
+    def _stop(self):
+        raise NotImplementedError
+
+    def _convert(self, pptx_path, pdf_path):
+        raise NotImplementedError
+
+
+class PowerPointConverter(PdfConverter):
+    """Conversion via PowerPoint (COM), une seule instance pour tout le run."""
+
+    def __init__(self, max_conversions=200, retries=1, visible=False):
+        super().__init__(max_conversions, retries)
+        self.visible = visible
+        self.powerpoint = None
+
+    def spawn(self):
+        clone = super().spawn()
+        clone.powerpoint = None
+        return clone
+
+    def _start(self):
+        import comtypes
+        from comtypes import client
+
+        # COM doit être initialisé dans chaque thread qui pilote PowerPoint
+        comtypes.CoInitialize()
+        self.powerpoint = client.CreateObject("PowerPoint.Application")
+        if self.visible:
+            self.powerpoint.Visible = 1  # Affiche PowerPoint (utile pour le debug)
+
+    def _stop(self):
+        powerpoint, self.powerpoint = self.powerpoint, None
+        if powerpoint is not None:
+            powerpoint.Quit()
+
+    def _convert(self, pptx_path, pdf_path):
+        presentation = self.powerpoint.Presentations.Open(pptx_path, ReadOnly=True, WithWindow=self.visible)
+        try:
+            presentation.SaveAs(pdf_path, PP_SAVE_AS_PDF)
+        finally:
+            presentation.Close()
+
+
+class FakeConverter(PdfConverter):
+    """Convertisseur en mémoire (sans Office) pour tester le batching sous Linux.
+
+    Écrit un PDF d'une page par slide contenant le texte de la slide.
+    `fail_on` : nombre de conversions (numérotées depuis 1) qui lèvent une erreur
+    pour simuler un plantage de l'application.
+    """
+
+    def __init__(self, max_conversions=200, retries=1, fail_on=()):
+        super().__init__(max_conversions, retries)
+        self.fail_on = set(fail_on)
+        self.calls = 0
+        self.converted = []
+
+    def spawn(self):
+        clone = super().spawn()
+        clone.calls = 0
+        clone.converted = []
+        return clone
+
+    def _start(self):
+        pass
+
+    def _stop(self):
+        pass
+
+    def _convert(self, pptx_path, pdf_path):
+        self.calls += 1
+        if self.calls in self.fail_on:
+            raise RuntimeError(f"simulated converter crash on call {self.calls}")
+        write_text_pdf(pdf_path, read_slide_texts(pptx_path))
+        self.converted.append((pptx_path, pdf_path))
+
+
+def read_slide_texts(pptx_path):
+    """Retourne le texte de chaque slide, dans l'ordre de la présentation."""
+    with zipfile.ZipFile(pptx_path) as z:
+        rels = ET.fromstring(z.read("ppt/_rels/presentation.xml.rels"))
+        targets = {
+            rel.get("Id"): posixpath.normpath(posixpath.join("ppt", rel.get("Target")))
+            for rel in rels.iter(f"{{{NS_PKG_REL}}}Relationship")
+        }
+        presentation = ET.fromstring(z.read("ppt/presentation.xml"))
+        texts = []
+        for sld_id in presentation.iter(f"{{{NS_P}}}sldId"):
+            xml = z.read(targets[sld_id.get(f"{{{NS_R}}}id")]).decode("utf-8")
+            texts.append(html.unescape(" ".join(re.findall(r"<a:t>([^<]*)</a:t>", xml))))
+        return texts
+
+
+def _pdf_escape(text):
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_text_pdf(pdf_path, page_texts, width=960, height=540):
+    """Écrit un PDF minimal, une page par texte (Helvetica)."""
+    page_texts = list(page_texts) or [""]
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in page_texts:
+        stream = f"BT /F1 14 Tf 40 {height - 60} Td ({_pdf_escape(text)}) Tj ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_num = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (width, height, content_num)
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (num, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    with open(pdf_path, "wb") as f:
+        f.write(out)
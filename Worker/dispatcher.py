@@ -0,0 +1,179 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Un mail à envoyer. context : donnée de l'appelant rendue avec chaque statut (ex. le job du certificat)
+MailRequest = namedtuple("MailRequest", ["to", "subject", "skeleton", "attachment", "context"])
+
+# Statuts transmis à `on_status(request, status, attempt, error, delay)`
+STATUSES = ("sending", "retrying", "sent", "failed")
+
+
+class TokenBucket:
+    """Limite de débit : `rate_per_minute` jetons par minute, au plus `burst` d'avance."""
+
+    def __init__(self, rate_per_minute, burst=1, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+        self._lock = None
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Les envois attendent leur tour dans l'ordre d'arrivée
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class MailDispatcher:
+    """Envoi asynchrone des mails, alimenté par le worker pendant la génération.
+
+    Une boucle asyncio (thread dédié) répartit la file entre `concurrency`
+    envois simultanés ; chaque envoi passe par un thread qui lui est propre,
+    avec sa session de transport (voir Worker/transports.py). Le débit est
+    limité par un token bucket (`rate_per_minute`, None = illimité) et une
+    erreur passagère est retentée jusqu'à `retries` fois avec un délai
+    exponentiel (`backoff`, doublé à chaque tentative, borné par `max_backoff`).
+    `submit` bloque quand la file (`queue_size`) est pleine. Les statuts vont
+    à `on_status`, ou au callback donné avec la requête (dispatcher partagé par
+    plusieurs outbox en mode batch).
+    """
+
+    def __init__(self, transport, concurrency=2, rate_per_minute=None, burst=1, retries=3, backoff=2.0,
+                 max_backoff=60.0, queue_size=64, on_status=None):
+        self.transport = transport
+        self.concurrency = max(1, concurrency)
+        self.bucket = TokenBucket(rate_per_minute, burst) if rate_per_minute else None
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.queue_size = queue_size
+        self.on_status = on_status
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self._loop = None
+        self._queue = None
+        self._closing = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="mail-dispatcher", daemon=True)
+            self._thread.start()
+            self._ready.wait()
+        return self
+
+    def submit(self, request, on_status=None):
+        """Ajoute un mail à la file (appelé depuis n'importe quel thread)."""
+        if self._thread is None:
+            self.start()
+        asyncio.run_coroutine_threadsafe(self._queue.put((request, on_status)), self._loop).result()
+
+    def close(self):
+        """Attend l'envoi de tous les mails en file puis arrête la boucle."""
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._closing.set)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._closing = asyncio.Event()
+        self._ready.set()
+
+        executors = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"mail-{n + 1}")
+                     for n in range(self.concurrency)]
+        # Le premier envoi garde le transport fourni, les autres en ouvrent un (le même s'il est partagé)
+        transports = [self.transport] + [self.transport.spawn() for _ in range(self.concurrency - 1)]
+        consumers = [asyncio.create_task(self._consume(executor, transport))
+                     for executor, transport in zip(executors, transports)]
+        try:
+            await self._closing.wait()
+            await self._queue.join()
+        finally:
+            for consumer in consumers:
+                consumer.cancel()
+            await asyncio.gather(*consumers, return_exceptions=True)
+            for executor, transport in zip(executors, transports):
+                # Une session COM se libère dans le thread qui l'a ouverte ; un pool partagé reste à l'appelant
+                if not transport.shared:
+                    await self._loop.run_in_executor(executor, transport.close)
+                executor.shutdown(wait=True)
+
+    async def _consume(self, executor, transport):
+        while True:
+            request, on_status = await self._queue.get()
+            try:
+                await self._deliver(request, executor, transport, on_status)
+            except Exception as e:
+                logging.error(f"Mail dispatcher error for {request.to}: {e}")
+                self._status(on_status, request, "failed", 0, e)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, request, executor, transport, on_status=None):
+        attempt = 0
+        while True:
+            if self.bucket is not None:
+                await self.bucket.acquire()
+            self._status(on_status, request, "sending", attempt)
+            try:
+                await self._loop.run_in_executor(
+                    executor, transport.send, request.skeleton, request.to, request.subject, request.attachment
+                )
+            except Exception as e:
+                if attempt < self.retries and transport.transient(e):
+                    # Délai exponentiel avec une part aléatoire (les envois en échec ne repartent pas ensemble)
+                    delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                    attempt += 1
+                    self.retried += 1
+                    self._status(on_status, request, "retrying", attempt, e, delay)
+                    await asyncio.sleep(delay)
+                    continue
+                self.failed += 1
+                self._status(on_status, request, "failed", attempt, e)
+                return
+            self.sent += 1
+            self._status(on_status, request, "sent", attempt)
+            return
+
+    def _status(self, on_status, request, status, attempt, error=None, delay=None):
+        on_status = on_status or self.on_status
+        if on_status is None:
+            return
+        try:
+            on_status(request, status, attempt, error, delay)
+        except Exception as e:
+            logging.error(f"Mail status callback error: {e}")
@@ -0,0 +1,586 @@
+"""Moteur de génération des certificats, sans Qt.
+
+Usage :
+    python -m Worker.engine --template modele.pptx --excel export.xlsx --title "DS Agile" --output sortie
+                            [--score-min 80] [--date-start 2025-01-01] [--date-end 2025-12-31] [--no-mail]
+                            [--history [DIR] [--history-scope export|training]]
+
+`CertificateEngine.run()` exécute un run complet dans le thread appelant et
+signale son avancement par le callback `on_event(événement, valeur)` ;
+`events()` l'exécute dans un thread et produit ces événements au fil de l'eau.
+`CertificateWorker` (Worker/cert_worker.py) n'est qu'un adaptateur QThread
+qui relaie ces événements en signaux Qt.
+"""
+import os
+import re
+import sys
+import time
+import queue
+import logging
+import argparse
+import threading
+from datetime import datetime, date
+
+from Worker.generation import RENDER_BACKENDS, CertificateGenerator, CertificateJob, JobResult
+from Worker.parallel import generate_parallel
+from Worker.pipeline import Pipeline
+from Worker.roster import RosterReader, select_participants
+from Worker.excel_cache import ExcelCache
+from Worker.history import HistoryStore, HistoryRoster
+from Worker.manifest import RunManifest
+from Worker.placeholders import PlaceholderEngine
+from Worker.mail import MailComposer, CERTIFICATE_TEMPLATE
+from Worker.transports import transport_from_env
+from Worker.dispatcher import MailDispatcher
+from Worker.outbox import Outbox, OutboxDrain, new_run_id
+from Worker.metrics import RunMetrics, ProgressTracker, progress_stats, format_progress
+
+
+# Lignes lues depuis l'historique : celles de l'export choisi, ou toute la formation (sur demande explicite)
+HISTORY_SCOPES = ("export", "training")
+
+# Nombre de threads par étape du pipeline (remplissage, conversion PDF, remise des mails au dispatcher)
+DEFAULT_STAGE_WORKERS = {"fill": 1, "convert": 1, "mail": 1}
+
+# Copie de chaque certificat envoyé
+COPIE_EMAIL = "SAM.L3SSystem@gevernova.com"
+
+# Événements transmis à `on_event`, avec le type de la valeur (mêmes noms que les signaux de CertificateWorker)
+# stats : avancement, débit, ETA et durées par étape (Worker/metrics.py), publié au plus toutes les
+# CERT_PROGRESS_INTERVAL secondes comme progress_percent et queue_depths ; les messages `progress` par
+# certificat ou par mail sont regroupés au même rythme (dernier message, suivi du nombre de messages regroupés)
+EVENTS = {"progress": str, "progress_percent": int, "queue_depths": dict, "stats": dict, "finished": str}
+
+_END = object()
+
+
+class EventSource:
+    """Avancement signalé par `on_event(événement, valeur)` ; `events()` exécute `run()` dans un thread."""
+
+    on_event = None
+
+    def emit(self, event, value):
+        if self.on_event is not None:
+            self.on_event(event, value)
+
+    def events(self):
+        """Exécute le run dans un thread et produit ses événements (nom, valeur) au fil de l'eau."""
+        events = queue.Queue()
+        callback = self.on_event
+
+        def relay(event, value):
+            events.put((event, value))
+            if callback is not None:
+                callback(event, value)
+
+        def run():
+            try:
+                self.run()
+            finally:
+                events.put(_END)
+
+        self.on_event = relay
+        thread = threading.Thread(target=run, name="certificate-engine", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = events.get()
+                if item is _END:
+                    break
+                yield item
+        finally:
+            thread.join()
+            self.on_event = callback
+
+    def run(self):
+        raise NotImplementedError
+
+
+class ConverterSessions:
+    """Sessions de conversion des threads de l'étape de conversion.
+
+    Le premier thread garde `converter` (celle du générateur), les suivants en
+    ouvrent une copie (`spawn`) ; chaque thread ferme la sienne en sortant.
+    """
+
+    def __init__(self, converter):
+        self.converter = converter
+        self.sessions = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def get(self):
+        if not hasattr(self._local, "converter"):
+            with self._lock:
+                self._local.converter = self.converter if not self.sessions or self.converter is None \
+                    else self.converter.spawn()
+                self.sessions.append(self._local.converter)
+        return self._local.converter
+
+    def close_thread(self):
+        converter = getattr(self._local, "converter", None)
+        if converter is not None:
+            converter.close()
+
+
+class CertificateEngine(EventSource):
+    """Un run de génération : lecture du fichier Excel, certificats PDF, mails (outbox).
+
+    Indépendant de Qt : utilisable en ligne de commande, depuis un planificateur
+    ou un benchmark. `on_event(événement, valeur)` reçoit l'avancement (EVENTS),
+    appelé depuis les threads du pipeline.
+    """
+
+    def __init__(self, template_path, excel_path, formation_title, output_folder, score_min=80, date_start=None,
+                 date_end=None, converter=None, max_conversions=200, batch_size=1, render_backend=None,
+                 overlay_background="powerpoint", workers=1, stage_workers=None, queue_size=16,
+                 excel_cache=None, resume=True, mail_transport=None, mail_concurrency=None, mail_rate=None,
+                 send_mail=True, mail_composer=None, mail_dispatcher=None, metrics=None, progress=None,
+                 history=None, history_scope="export", on_event=None):
+        self.on_event = on_event
+        self.template_path = template_path
+        self.excel_path = excel_path
+        self.formation_title = formation_title
+        self.output_folder = output_folder
+        self.score_min = score_min
+        self.date_start = date_start
+        self.date_end = date_end
+        self.total_certificates = 0
+        # Erreur qui a interrompu le run (None si terminé normalement)
+        self.error = None
+        # Session de conversion PDF partagée par tout le run (PowerPoint par défaut)
+        self.converter = converter
+        self.max_conversions = max_conversions
+        # batch_size > 1 : un deck fusionné et un seul export PDF par lot, découpé ensuite
+        self.batch_size = batch_size
+        # "powerpoint" (COM, par défaut), "native" (PDF dessiné directement, sans Office)
+        # ou "overlay" (fond rendu une fois par run + calque texte par certificat)
+        self.render_backend = render_backend or os.environ.get("CERT_RENDER_BACKEND", "powerpoint")
+        if self.render_backend not in RENDER_BACKENDS:
+            raise ValueError(f"Unknown render backend: {self.render_backend}")
+        # Rendu du fond en mode overlay : "powerpoint" (fidèle au modèle) ou "native"
+        self.overlay_background = overlay_background
+        # workers > 1 : génération répartie sur un pool de process (un modèle et une session chacun)
+        self.workers = workers
+        # Pipeline : une étape lente (ex. serveur mail) ne bloque plus les autres au-delà de queue_size
+        self.stage_workers = dict(DEFAULT_STAGE_WORKERS, **(stage_workers or {}))
+        self.queue_size = queue_size
+        self.pipeline = None
+        # Lecture en flux du fichier Excel : la génération démarre avant la fin de la lecture
+        self.roster = None
+        # Cache des exports déjà analysés (False pour le désactiver)
+        self.excel_cache = ExcelCache() if excel_cache is None else excel_cache
+        # Historique des tentatives (HistoryStore) : l'export y est ingéré puis ses lignes sont relues depuis
+        # l'historique, filtrées par période. history_scope="training" : toutes les tentatives de la formation,
+        # tous exports reçus confondus (les participants des exports précédents sont alors repris)
+        self.history = history
+        if history_scope not in HISTORY_SCOPES:
+            raise ValueError(f"Unknown history scope: {history_scope}")
+        self.history_scope = history_scope
+        # Manifeste SQLite dans le dossier de sortie : un run relancé reprend là où le précédent s'est arrêté
+        self.resume = resume
+        self.manifest = None
+        self.resumed_rows = set()
+        self.started_at = None
+        self.time_to_first_certificate = None
+        # Signature Outlook lue une fois par run (relue si modifiée) et squelettes communs des mails
+        self.mail_composer = mail_composer or MailComposer()
+        # Transport des mails (Outlook par défaut, SMTP si CERT_SMTP_HOST est défini), une session par thread d'envoi
+        self.mail_transport = mail_transport or transport_from_env()
+        # Envois simultanés et débit maximal (mails par minute, 0 = illimité) du dispatcher asynchrone
+        self.mail_concurrency = mail_concurrency or int(os.environ.get("CERT_MAIL_CONCURRENCY", 2))
+        self.mail_rate = mail_rate if mail_rate is not None else float(os.environ.get("CERT_MAIL_RATE", 0))
+        # send_mail=False : certificats seulement (benchmarks, tests), aucun mail inscrit ni envoyé
+        self.send_mail = send_mail
+        # Dispatcher partagé par plusieurs runs (mode batch) : ni créé ni fermé ici, son transport non plus
+        self.mail_dispatcher = mail_dispatcher
+        self.dispatcher = None
+        self.mails_sent = 0
+        self.mails_failed = 0
+        # Outbox SQLite du dossier de sortie : les mails y sont inscrits puis envoyés par un thread de vidage
+        self.outbox = None
+        self.drain = None
+        self.run_id = None
+        # Durées par étape et avancement en certificats ; partagés par les campagnes d'un batch
+        self.metrics = metrics or RunMetrics()
+        self.owns_progress = progress is None
+        self.progress = progress or ProgressTracker(interval=float(os.environ.get("CERT_PROGRESS_INTERVAL", 0.5)))
+        self._sending = {}
+        # Messages par certificat/mail en attente de publication : (dernier message, nombre de messages)
+        self._pending_message = None
+        self._pending_count = 0
+        self._lock = threading.Lock()
+
+    def clean_filename(self, s):
+        return re.sub(r'[\\/*?:"<>|]', "", s)
+
+    def format_date_with_suffix(self, date_obj):
+        day = date_obj.day
+        suffix = "th" if 11 <= day <= 13 else {1: "st", 2: "nd", 3: "rd"}.get(day % 10, "th")
+        return f"{day}{suffix} {date_obj.strftime('%B %Y')}"
+
+    def replace_text(self, prs, replacements):
+        # Une passe par paragraphe (tableaux, groupes et notes compris), balises découpées réunies
+        engine = PlaceholderEngine(replacements)
+        for slide in prs.slides:
+            engine.substitute_element(slide._element, replacements)
+            if slide.has_notes_slide:
+                engine.substitute_element(slide.notes_slide._element, replacements)
+
+    def send_certificate(self, job):
+        """Inscrit le mail du certificat dans l'outbox ; il est envoyé par le thread de vidage (statut par `mail_status`)."""
+        email_destinataire, pdf_path = job.email, job.pdf_path
+        if email_destinataire and os.path.exists(pdf_path):
+            mois_formation = datetime.today().strftime("%B %Y")
+            sujet = f"{mois_formation}, {self.formation_title} - Training Certificate"
+            # Corps rendu à l'envoi à partir du modèle (Worker/mail.py) : l'outbox ne garde que ses paramètres
+            params = {"formation_title": self.formation_title}
+            context = {"manifest_key": list(RunManifest.key(job))}
+            state = self.outbox.enqueue(self.run_id, email_destinataire, sujet, CERTIFICATE_TEMPLATE, params,
+                                        pdf_path, cc=COPIE_EMAIL, context=context)
+            if state == "sent":
+                logging.info(f"Certificate already sent to {email_destinataire}, not queued again")
+                if self.manifest:
+                    self.manifest.mark(job, "mailed")
+                return False
+            if state == "duplicate":
+                logging.info(f"Same certificate already queued for {email_destinataire}")
+                return False
+            self.drain.wake()
+            return True
+        return False
+
+    def mail_status(self, request, status, attempt, error=None, delay=None):
+        """Statut d'un envoi (thread du dispatcher), relayé par `progress` au rythme de la progression."""
+        key = request.context.get("id")
+        if status == "sending":
+            self._sending[key] = time.perf_counter()
+            return
+        started = self._sending.pop(key, None)
+        if started is not None:
+            self.metrics.record("mail", time.perf_counter() - started)
+        if status == "sent":
+            with self._lock:
+                self.mails_sent += 1
+            self.progress_message(f"✉️Certificate sent to {request.to}")
+            logging.info(f"Certificate sent to  {request.to} (cc {COPIE_EMAIL})")
+            context = request.context.get("context")
+            if self.manifest and context:
+                self.manifest.mark_mailed(context["manifest_key"])
+        elif status == "retrying":
+            self.progress_message(f"🔁 Retrying email to {request.to} in {delay:.0f}s (attempt {attempt + 1})")
+            logging.warning(f"Email to {request.to} failed, retry {attempt} in {delay:.1f}s: {error}")
+        elif status == "failed":
+            with self._lock:
+                self.mails_failed += 1
+            self.progress_message(f"❌Failed to send email to {request.to}")
+            logging.error(f"Failed to send email to {request.to} after {attempt + 1} attempts: {error}")
+        self.publish_progress()
+
+    def iter_jobs(self, roster, date_edition):
+        """Étape de lecture : filtre chaque bloc du fichier Excel et produit un job par participant éligible."""
+        safe_title = self.clean_filename(self.formation_title)
+        for chunk in self.metrics.timed("read", roster, len):
+            with self.metrics.measure("filter", len(chunk)):
+                participants, rejected = select_participants(chunk, self.score_min, self.date_start, self.date_end)
+            for row in rejected:
+                logging.log(row.level, row.message)
+                if row.level >= logging.WARNING:
+                    self.progress_message(f"⚠️ {row.message}")
+
+            jobs = []
+            for participant in participants:
+                # Remplacement des balises
+                replacements = {
+                    "{{NOM}}": participant.nom,
+                    "{{SSO}}": participant.sso,
+                    "{{FORMATION}}": self.formation_title,
+                    "{{DATE_FORMATION}}": participant.date_formation,
+                    "{{DATE_EDITION}}": date_edition
+                }
+
+                # Construction des chemins
+                safe_nom = self.clean_filename(participant.nom)
+                index = participant.row
+
+                pdf_path = os.path.abspath(os.path.join(self.output_folder, f"{safe_title} - {safe_nom}.pdf"))
+
+                job = CertificateJob(index, participant.nom, participant.email, replacements, pdf_path)
+
+                # Reprise : certificat déjà envoyé -> ignoré, PDF déjà produit -> seulement l'envoi
+                state = self.manifest.resume_state(job) if self.manifest else None
+                if state == "mailed":
+                    logging.info(f"Certificate already sent to {participant.nom}, skipped")
+                    continue
+                if state == "converted":
+                    self.resumed_rows.add(index)
+                jobs.append(job)
+
+            # Avancement en certificats : les lignes rejetées ou déjà envoyées ne comptent pas
+            if self.owns_progress:
+                self.progress.total_rows = roster.total_rows
+            self.progress.add_rows(len(chunk), len(jobs))
+            yield from jobs
+        if self.owns_progress:
+            self.progress.reading_done()
+
+    def generator_settings(self):
+        return dict(
+            template_path=self.template_path,
+            render_backend=self.render_backend,
+            converter=self.converter,
+            max_conversions=self.max_conversions,
+            batch_size=self.batch_size,
+            overlay_background=self.overlay_background,
+        )
+
+    def report(self, result):
+        for level, log_msg, gui_msg in result.messages:
+            logging.log(level, log_msg)
+            if gui_msg:
+                self.progress_message(gui_msg)
+        if result.ok:
+            with self._lock:
+                self.total_certificates += 1
+                first = self.time_to_first_certificate is None
+                if first:
+                    self.time_to_first_certificate = time.perf_counter() - self.started_at
+            if first:
+                logging.info(f"First certificate generated after {self.time_to_first_certificate:.2f}s")
+
+    def record(self, result):
+        """Journalise un résultat de génération et l'inscrit au manifeste."""
+        if result.ok and self.manifest and result.job.row not in self.resumed_rows:
+            self.manifest.mark(result.job, "converted")
+        self.report(result)
+
+    def resumed_result(self, job):
+        return JobResult(job, True, [(logging.INFO, f"Certificate already generated for: {job.nom}", None)])
+
+    def deliver(self, results):
+        """Étape d'envoi : mail de chaque certificat du lot confié au dispatcher, puis progression."""
+        for result in results:
+            if self.send_mail:
+                self.send_certificate(result.job)
+        self.progress.complete(len(results))
+        self.publish_progress()
+
+    def progress_message(self, message):
+        """Message par ligne, certificat ou mail : publié par `publish_progress`, pas à chaque appel."""
+        with self._lock:
+            self._pending_message = message
+            self._pending_count += 1
+
+    def flush_messages(self):
+        """Publie le dernier message en attente, suivi du nombre de messages regroupés depuis le précédent."""
+        with self._lock:
+            message, count = self._pending_message, self._pending_count
+            self._pending_message, self._pending_count = None, 0
+        if count:
+            self.emit("progress", message if count == 1 else f"{message} (+{count - 1} more)")
+
+    def publish_progress(self, force=False):
+        """Messages, pourcentage, débit/ETA et files d'attente, au plus une fois par intervalle (sauf `force`)."""
+        if not self.progress.due(force):
+            return
+        self.flush_messages()
+        stats = progress_stats(self.progress, self.metrics)
+        self.emit("progress_percent", stats["percent"])
+        self.emit("stats", stats)
+        if self.pipeline is not None:
+            self.emit("queue_depths", self.pipeline.queue_depths())
+
+    def fill_deck(self, generator, jobs):
+        """Étape de remplissage : deck des jobs à produire, jobs repris (PDF déjà produit) à part."""
+        ready = [job for job in jobs if job.row in self.resumed_rows]
+        todo = [job for job in jobs if job.row not in self.resumed_rows]
+        deck = generator.fill(todo) if todo else None
+        if self.manifest and deck is not None and (deck.pptx_data or generator.render_backend != "powerpoint"):
+            for job in todo:
+                self.manifest.mark(job, "filled")
+        return deck, ready
+
+    def convert_deck(self, generator, item, converter):
+        """Étape de conversion : PDF du deck avec la session du thread, résultats journalisés dans l'ordre."""
+        deck, ready = item
+        results = generator.convert(deck, converter) if deck is not None else []
+        results += [self.resumed_result(job) for job in ready]
+        results.sort(key=lambda r: r.job.row)
+        for result in results:
+            self.record(result)
+        return results
+
+    def build_pipeline(self, generator):
+        pipeline = Pipeline()
+        if generator is not None:
+            sessions = ConverterSessions(generator.converter)
+            pipeline.add_stage("fill", lambda jobs: self.fill_deck(generator, jobs), self.stage_workers["fill"],
+                               self.queue_size)
+            pipeline.add_stage("convert", lambda item: self.convert_deck(generator, item, sessions.get()),
+                               self.stage_workers["convert"], self.queue_size, thread_exit=sessions.close_thread)
+        pipeline.add_stage("mail", self.deliver, self.stage_workers["mail"], self.queue_size)
+        return pipeline
+
+    def parallel_results(self, jobs):
+        """Source du pipeline en mode multi-process : les JobResult du pool, déjà générés.
+
+        Les jobs sont lus au fil de la génération, par tranches (generate_parallel) ;
+        un job repris (PDF déjà produit) ne passe pas par le pool.
+        """
+        def resumed(job):
+            return self.resumed_result(job) if job.row in self.resumed_rows else None
+
+        for result in generate_parallel(jobs, self.generator_settings(), self.workers, metrics=self.metrics,
+                                        passthrough=resumed):
+            self.record(result)
+            yield [result]
+
+    def open_run(self):
+        """Prépare le run (lecture, dossier de sortie, manifeste, outbox) et retourne les jobs à générer."""
+        # Vérification existence du modèle
+        if not os.path.exists(self.template_path):
+            raise FileNotFoundError(f"PPTX template not found : {self.template_path}")
+        if not os.path.exists(self.excel_path):
+            raise FileNotFoundError(f"Excel file not found : {self.excel_path}")
+
+        self.started_at = time.perf_counter()
+        if self.history is not None:
+            ingested = self.history.ingest(self.excel_path)
+            digest = ingested.digest if self.history_scope == "export" else None
+            self.roster = HistoryRoster(self.history, ingested.training, digest, self.date_start, self.date_end)
+        else:
+            self.roster = RosterReader(self.excel_path, cache=self.excel_cache or None)
+        date_edition = self.format_date_with_suffix(datetime.today())
+        self.emit("progress", "🕒 Generating certificates...")
+
+        if not os.path.exists(self.output_folder):
+            os.makedirs(self.output_folder)
+            logging.info(f"Output folder created: {self.output_folder}")
+
+        self.resumed_rows = set()
+        if self.resume:
+            self.manifest = RunManifest(self.output_folder)
+
+        self.run_id = new_run_id()
+        if self.send_mail:
+            self.outbox = Outbox(self.output_folder)
+            self.dispatcher = self.mail_dispatcher or MailDispatcher(
+                self.mail_transport, self.mail_concurrency, self.mail_rate or None, queue_size=self.queue_size
+            )
+            self.drain = OutboxDrain(self.outbox, self.dispatcher, self.mail_composer, self.run_id,
+                                     on_status=self.mail_status,
+                                     close_dispatcher=self.mail_dispatcher is None).start()
+            logging.info(f"Run {self.run_id}: mails queued in {self.outbox.path}")
+
+        return self.iter_jobs(self.roster, date_edition)
+
+    def close_run(self):
+        """Attend les derniers mails du run puis ferme l'outbox et le manifeste."""
+        if self.drain is not None:
+            self.drain.close()
+            self.drain = None
+        if self.mail_dispatcher is None:
+            self.mail_transport.close()
+        if self.outbox is not None:
+            logging.info(f"Outbox {self.outbox.path}: {self.outbox.runs().get(self.run_id, {})}")
+            self.outbox.close()
+            self.outbox = None
+        if self.manifest is not None:
+            logging.info(f"Run manifest {self.manifest.path}: {self.manifest.counts()}")
+            self.manifest.close()
+            self.manifest = None
+        # Statuts des derniers mails (campagnes : pas de publication forcée par campagne)
+        self.flush_messages()
+
+    def run(self):
+        generator = None
+        try:
+            jobs = self.open_run()
+
+            # lecture -> remplissage -> conversion -> envoi, reliés par des files bornées
+            if self.workers > 1:
+                self.pipeline = self.build_pipeline(None)
+                self.pipeline.run(self.parallel_results(jobs))
+            else:
+                generator = CertificateGenerator(**self.generator_settings()).open()
+                generator.metrics = self.metrics
+                self.pipeline = self.build_pipeline(generator)
+                self.pipeline.run(generator.chunks(jobs))
+
+            # Les derniers mails partent avant le message de fin
+            if self.drain is not None:
+                self.drain.close()
+                logging.info(f"Mail dispatcher: {self.mails_sent} sent, {self.mails_failed} failed, "
+                             f"{self.dispatcher.retried} retries")
+            self.publish_progress(force=True)
+            for line in self.metrics.report():
+                logging.info(f"Stage {line}")
+            self.emit("finished", f"✅ {self.total_certificates} certificates successfully generated.")
+            logging.info(f"{self.total_certificates} certificates generated successfully.")
+
+        except Exception as e:
+            self.error = e
+            error_msg = f"General error : {e}"
+            self.flush_messages()
+            self.emit("finished", f"❌ {error_msg}")
+            logging.error(error_msg)
+        finally:
+            if generator is not None:
+                generator.close()
+            self.close_run()
+
+
+def _iso_date(text):
+    return date.fromisoformat(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate (and e-mail) training certificates without the GUI.")
+    parser.add_argument("--template", required=True, help="PowerPoint template (.pptx)")
+    parser.add_argument("--excel", required=True, help="Forms export (.xlsx)")
+    parser.add_argument("--title", required=True, help="training title printed on the certificates")
+    parser.add_argument("--output", required=True, help="output folder")
+    parser.add_argument("--score-min", type=float, default=80)
+    parser.add_argument("--date-start", type=_iso_date, help="first training date (YYYY-MM-DD)")
+    parser.add_argument("--date-end", type=_iso_date, help="last training date (YYYY-MM-DD)")
+    parser.add_argument("--backend", choices=RENDER_BACKENDS, help="render backend (default: CERT_RENDER_BACKEND)")
+    parser.add_argument("--workers", type=int, default=1, help="generation processes")
+    parser.add_argument("--batch-size", type=int, default=1, help="certificates per PowerPoint conversion")
+    parser.add_argument("--no-mail", action="store_true", help="generate the PDFs without sending any mail")
+    parser.add_argument("--no-resume", action="store_true", help="ignore the run manifest of the output folder")
+    parser.add_argument("--history", nargs="?", const="", metavar="DIR",
+                        help="add the export to the attempts history and read its rows from it "
+                             "(default folder: CERT_HISTORY_DIR)")
+    parser.add_argument("--history-scope", choices=HISTORY_SCOPES, default="export",
+                        help="with --history: only this export's rows (default) or every stored attempt "
+                             "of its training, including participants of earlier exports")
+    parser.add_argument("--quiet", action="store_true", help="only print the final summary")
+    parser.add_argument("--stats", action="store_true", help="print throughput and ETA while running")
+    parser.add_argument("--log-file", default="certificates_generation.log")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(filename=args.log_file, level=logging.INFO,
+                        format="%(asctime)s - %(levelname)s - %(message)s")
+
+    engine = CertificateEngine(
+        args.template, args.excel, args.title, args.output, args.score_min, args.date_start, args.date_end,
+        batch_size=args.batch_size, render_backend=args.backend, workers=args.workers,
+        resume=not args.no_resume, send_mail=not args.no_mail,
+        history=HistoryStore(args.history or None) if args.history is not None else None,
+        history_scope=args.history_scope,
+    )
+    started = time.perf_counter()
+    for event, value in engine.events():
+        if event == "finished" or (event == "progress" and not args.quiet):
+            print(value, flush=True)
+        elif event == "stats" and args.stats:
+            print(format_progress(value), flush=True)
+    elapsed = time.perf_counter() - started
+    print(f"{engine.total_certificates} certificates in {elapsed:.1f}s", flush=True)
+    for line in engine.metrics.report():
+        print(line)
+    return 1 if engine.error is not None else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""Cache disque des exports Excel déjà analysés (format colonne Arrow IPC).
+
+Usage :
+    python -m Worker.excel_cache list
+    python -m Worker.excel_cache clear [fichier.xlsx ...]
+
+Une entrée est identifiée par l'empreinte du fichier source (taille, date de
+modification et SHA-256 du contenu) et par une variante (ex. roster typé du
+worker, export complet du dashboard KPI). Les relectures d'un fichier inchangé
+passent par un fichier Arrow mappé en mémoire au lieu d'un nouveau parsing
+openpyxl. Le cache est borné en taille (éviction des entrées les moins
+récemment utilisées). Sans pyarrow, le cache est désactivé et chaque lecture
+repasse par le parseur.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather
+except ImportError:
+    pa = None
+
+ENTRY_SUFFIX = ".arrow"
+INDEX_FILE = "fingerprints.json"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def default_cache_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.environ.get("CERT_EXCEL_CACHE_DIR") or os.path.join(base, "CertificatesGeneration", "excel_cache")
+
+
+def file_hash(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _arrow_safe(df):
+    """Colonnes objet à types mélangés (cellules Excel hétérogènes) converties en texte pour Arrow."""
+    df = df.copy()
+    df.columns = [str(column) for column in df.columns]
+    for column in df.columns:
+        if df[column].dtype == object:
+            kind = pd.api.types.infer_dtype(df[column], skipna=True)
+            if kind not in ("string", "empty", "boolean", "floating", "integer", "datetime", "date"):
+                df[column] = df[column].map(lambda v: None if pd.isna(v) else str(v))
+    return df
+
+
+class ExcelCache:
+    """Entrées `<sha256>-<variante>.arrow` dans `cache_dir`, bornées à `max_bytes` (LRU)."""
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.enabled = pa is not None
+        self._lock = threading.Lock()
+        if not self.enabled:
+            logging.info("pyarrow not installed: Excel cache disabled")
+
+    # --- Empreintes ---
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, INDEX_FILE)
+
+    def _read_index(self):
+        try:
+            with open(self._index_path(), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self._index_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path())
+
+    def fingerprint(self, path):
+        """SHA-256 du fichier, recalculé seulement si sa taille ou sa date de modification a changé."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            index = self._read_index()
+            known = index.get(path)
+            if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+                return known["sha256"]
+            digest = file_hash(path)
+            index[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+            self._write_index(index)
+            return digest
+
+    # --- Entrées ---
+
+    def _entry_path(self, digest, variant):
+        return os.path.join(self.cache_dir, f"{digest}-{variant}{ENTRY_SUFFIX}")
+
+    def get(self, path, variant):
+        """DataFrame en cache pour ce fichier et cette variante, ou None."""
+        if not self.enabled:
+            return None
+        entry = self._entry_path(self.fingerprint(path), variant)
+        if not os.path.exists(entry):
+            return None
+        try:
+            df = feather.read_table(entry, memory_map=True).to_pandas()
+        except Exception as e:
+            logging.warning(f"Unreadable cache entry {entry}, ignored: {e}")
+            return None
+        # Date d'utilisation pour l'éviction LRU
+        os.utime(entry)
+        logging.info(f"Excel cache hit for {path} ({variant})")
+        return df
+
+    def put(self, path, variant, df):
+        if not self.enabled:
+            return
+        entry = self._entry_path(self.fingerprint(path), variant)
+        tmp_path = f"{entry}.{os.getpid()}.tmp"
+        try:
+            feather.write_feather(_arrow_safe(df), tmp_path, compression="uncompressed")
+            os.replace(tmp_path, entry)
+        except Exception as e:
+            logging.warning(f"Could not cache {path} ({variant}): {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict(keep=entry)
+
+    def load(self, path, reader, variant="full"):
+        """`reader(path)` mis en cache : relit le fichier seulement s'il a changé."""
+        df = self.get(path, variant)
+        if df is None:
+            df = reader(path)
+            self.put(path, variant, df)
+        return df
+
+    def entries(self):
+        """(chemin, taille, dernière utilisation) de chaque entrée, de la plus ancienne à la plus récente."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(ENTRY_SUFFIX):
+                entry = os.path.join(self.cache_dir, name)
+                stat = os.stat(entry)
+                entries.append((entry, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda e: e[2])
+
+    def evict(self, keep=None):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for entry, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            os.remove(entry)
+            total -= size
+            logging.info(f"Excel cache entry evicted: {entry}")
+
+    def invalidate(self, path=None):
+        """Supprime les entrées d'un fichier source (toutes si `path` est None). Retourne le nombre supprimé."""
+        removed = 0
+        with self._lock:
+            index = self._read_index()
+            if path is None:
+                targets = [entry for entry, _, _ in self.entries()]
+                index = {}
+            else:
+                path = os.path.abspath(path)
+                known = index.pop(path, None)
+                digest = known["sha256"] if known else (file_hash(path) if os.path.exists(path) else None)
+                prefix = f"{digest}-"
+                targets = [e for e, _, _ in self.entries() if digest and os.path.basename(e).startswith(prefix)]
+            for entry in targets:
+                os.remove(entry)
+                removed += 1
+            if os.path.isdir(self.cache_dir):
+                self._write_index(index)
+        return removed
+
+
+def read_excel_cached(path, cache=None, **kwargs):
+    """`pd.read_excel(path, **kwargs)` avec le cache (variante dérivée des options de lecture)."""
+    cache = cache or ExcelCache()
+    variant = "excel" + "".join(f"_{k}-{v}" for k, v in sorted(kwargs.items()))
+    return cache.load(path, lambda p: pd.read_excel(p, **kwargs), variant)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the parsed Excel cache.")
+    parser.add_argument("--cache-dir")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    clear = commands.add_parser("clear")
+    clear.add_argument("files", nargs="*", help="source Excel files (all entries if omitted)")
+    args = parser.parse_args(argv)
+
+    cache = ExcelCache(args.cache_dir)
+    if args.command == "list":
+        total = 0
+        for entry, size, used in cache.entries():
+            total += size
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(used))}  {size / 1e6:8.2f} MB  "
+                  f"{os.path.basename(entry)}")
+        print(f"{total / 1e6:.2f} MB in {cache.cache_dir}")
+    else:
+        removed = sum(cache.invalidate(f) for f in args.files) if args.files else cache.invalidate()
+        print(f"{removed} cache entries removed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
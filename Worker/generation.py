@@ -0,0 +1,207 @@
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from collections import namedtuple
+
+from Worker.converters import PowerPointConverter, scratch_path
+from Worker.template import CompiledTemplate
+from Worker.pdf_tools import split_pdf
+
+
+RENDER_BACKENDS = ("powerpoint", "native", "overlay")
+
+# Un certificat à produire (row : index de la ligne Excel d'origine)
+CertificateJob = namedtuple("CertificateJob", ["row", "nom", "email", "replacements", "pdf_path"])
+
+# Résultat d'un job. messages : liste de (niveau logging, message journal, message GUI ou None)
+JobResult = namedtuple("JobResult", ["job", "ok", "messages"])
+
+# Sortie de l'étape de remplissage : contenu du PPTX à convertir (None si rien à convertir ou échec).
+# Le deck reste en mémoire : seul le PDF final est écrit dans le dossier de sortie.
+FilledDeck = namedtuple("FilledDeck", ["jobs", "pptx_data", "messages"])
+
+
+class CertificateGenerator:
+    """Produit les PDF des certificats avec le backend de rendu configuré.
+
+    Indépendant de Qt : utilisé tel quel par le worker (mode série) et par
+    chaque process du pool (mode parallèle), chacun avec son propre modèle
+    et sa propre session de conversion.
+    """
+
+    def __init__(self, template_path, render_backend="powerpoint", converter=None, max_conversions=200,
+                 batch_size=1, overlay_background="powerpoint"):
+        if render_backend not in RENDER_BACKENDS:
+            raise ValueError(f"Unknown render backend: {render_backend}")
+        self.template_path = template_path
+        self.render_backend = render_backend
+        self.converter = converter
+        self.max_conversions = max_conversions
+        self.batch_size = batch_size
+        self.overlay_background = overlay_background
+        self.template = None
+        self.renderer = None
+        self.work_folder = None
+        # RunMetrics du run (Worker/metrics.py) : durées de remplissage, d'enregistrement et de conversion
+        self.metrics = None
+        self._render_lock = threading.Lock()
+
+    def open(self):
+        needs_converter = self.render_backend == "powerpoint" or (
+            self.render_backend == "overlay" and self.overlay_background == "powerpoint"
+        )
+        if self.converter is None and needs_converter:
+            self.converter = PowerPointConverter(max_conversions=self.max_conversions)
+
+        # Modèle chargé et analysé une seule fois pour tout le run
+        try:
+            if self.render_backend == "native":
+                from Worker.native_renderer import NativeRenderer
+                self.renderer = NativeRenderer(self.template_path)
+            elif self.render_backend == "overlay":
+                from Worker.overlay import OverlayStamper
+                self.work_folder = tempfile.mkdtemp(prefix="certificates_")
+                self.renderer = OverlayStamper.from_template(
+                    self.template_path, self.work_folder, self.converter if needs_converter else None
+                )
+            else:
+                self.template = CompiledTemplate(self.template_path)
+        except Exception as e:
+            raise ValueError(f"Cannot load template: {self.template_path} - Error: {e}")
+        return self
+
+    def close(self):
+        if self.converter is not None:
+            self.converter.close()
+        if self.work_folder:
+            shutil.rmtree(self.work_folder, ignore_errors=True)
+            self.work_folder = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def chunks(self, jobs):
+        """Regroupe les jobs par lot de conversion (un seul job hors mode batch PowerPoint)."""
+        size = self.batch_size if self.render_backend == "powerpoint" and self.batch_size > 1 else 1
+        chunk = []
+        for job in jobs:
+            chunk.append(job)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def generate_all(self, jobs):
+        """Génère les jobs dans l'ordre et produit un JobResult par job."""
+        for chunk in self.chunks(jobs):
+            yield from self.convert(self.fill(chunk))
+
+    def generate(self, job):
+        return self.convert(self.fill([job]))[0]
+
+    def generate_batch(self, jobs):
+        return self.convert(self.fill(jobs))
+
+    def _measure(self, stage, started, items=1):
+        if self.metrics is not None:
+            self.metrics.record(stage, time.perf_counter() - started, items)
+
+    def fill(self, jobs):
+        """Étape de remplissage : PPTX du job ou deck fusionné du lot, produit en mémoire.
+
+        En native/overlay le PDF est dessiné directement, la conversion n'a plus rien à faire.
+        """
+        started = time.perf_counter()
+        deck = self._fill(jobs)
+        self._measure("fill", started, len(jobs))
+        return deck
+
+    def _fill(self, jobs):
+        messages = []
+        if self.render_backend in ("native", "overlay"):
+            for job in jobs:
+                try:
+                    # reportlab n'est pas thread-safe (images partagées) : le parallélisme passe par le pool de process
+                    with self._render_lock:
+                        self.renderer.render(job.replacements, job.pdf_path)
+                except Exception as e:
+                    messages.append((logging.ERROR, f"PDF rendering error for {job.pdf_path}: {e}",
+                                     f" PDF rendering error: {e}"))
+            return FilledDeck(jobs, None, messages)
+
+        if len(jobs) == 1:
+            job = jobs[0]
+            try:
+                data = self.template.render(job.replacements)
+                messages.append((logging.INFO, f"PPTX rendered for {job.nom} ({len(data)} bytes)", None))
+            except Exception as e:
+                messages.append((logging.ERROR, f"PPTX render error for {job.nom} : {e}", f"❌ PPTX render error : {e}"))
+                return FilledDeck(jobs, None, messages)
+            return FilledDeck(jobs, data, messages)
+
+        # Un seul deck pour tout le lot, converti une fois puis découpé par participant
+        try:
+            data = self.template.render_batch([job.replacements for job in jobs])
+            messages.append((logging.INFO, f"Batch PPTX rendered ({len(jobs)} certificates, {len(data)} bytes)", None))
+        except Exception as e:
+            messages.append((logging.ERROR, f"Batch PPTX render error : {e}", f"❌ PPTX render error : {e}"))
+            return FilledDeck(jobs, None, messages)
+        return FilledDeck(jobs, data, messages)
+
+    def convert(self, deck, converter=None):
+        """Étape de conversion : PDF du deck (découpé pour un lot), puis un JobResult par job.
+
+        `converter` : session à utiliser à la place de celle du générateur (un thread de conversion chacun).
+        """
+        jobs, messages = deck.jobs, deck.messages
+        if self.render_backend == "powerpoint":
+            if deck.pptx_data is None:
+                return [JobResult(job, False, messages if i == 0 else []) for i, job in enumerate(jobs)]
+
+            if len(jobs) == 1:
+                self.convert_to_pdf(deck.pptx_data, jobs[0].pdf_path, messages, converter)
+            else:
+                # PDF du lot dans le scratch, seuls les PDF découpés arrivent dans le dossier de sortie
+                with scratch_path(".pdf") as batch_pdf:
+                    self.convert_to_pdf(deck.pptx_data, batch_pdf, messages, converter, len(jobs))
+                    if os.path.exists(batch_pdf):
+                        try:
+                            split_pdf(batch_pdf, [job.pdf_path for job in jobs], len(self.template.slide_parts))
+                        except Exception as e:
+                            messages.append((logging.ERROR, f"PDF split error ({len(jobs)} certificates) : {e}",
+                                             f"❌ PDF split error : {e}"))
+
+        # Les messages d'un lot sont rattachés au premier certificat
+        return [self._result(job, messages if i == 0 else []) for i, job in enumerate(jobs)]
+
+    def _result(self, job, messages):
+        if os.path.exists(job.pdf_path):
+            messages.append((logging.INFO, f"Certificate generated for: {job.nom}", None))
+            return JobResult(job, True, messages)
+        error_msg = f"PDF not generated for {job.nom}."
+        messages.append((logging.ERROR, error_msg, f"❌ {error_msg}"))
+        return JobResult(job, False, messages)
+
+    def convert_to_pdf(self, pptx_data, pdf_path, messages, converter=None, items=1):
+        converter = converter or self.converter
+        try:
+            if self.metrics is None:
+                converter.convert_bytes(pptx_data, pdf_path)
+                return
+            # Même chemin que convert_bytes, mesuré en deux temps : écriture du deck puis conversion
+            started = time.perf_counter()
+            with scratch_path(".pptx", pptx_data) as pptx_path:
+                self._measure("save", started, items)
+                started = time.perf_counter()
+                converter.convert(pptx_path, pdf_path)
+                self._measure("convert", started, items)
+        except Exception as e:
+            messages.append((logging.ERROR, f"PDF conversion error for {pdf_path}: {e}", f" PDF conversion error: {e}"))
@@ -0,0 +1,385 @@
+"""Historique local des tentatives (Parquet partitionné par formation et par mois).
+
+Usage :
+    python -m Worker.history ingest FORM.xlsx Templates FIleInstallation/Data
+    python -m Worker.history list
+
+Chaque export Forms n'est ingéré qu'une fois (empreinte SHA-256 du fichier) :
+ses tentatives sont ajoutées sous `attempts/training=<formulaire>/month=<AAAA-MM>/`,
+sans les tentatives déjà connues (même participant, même formation, même
+horodatage, même score). Les lectures filtrent par formation, dates et unités
+SDSU : les partitions et blocs hors filtre ne sont pas lus. Le dashboard KPI
+(`kpi_frame`) et le worker (`HistoryRoster`) s'en servent à la place de l'Excel.
+Les lignes de chaque export (clé de tentative, index de ligne, nom, SSO,
+email) sont aussi gardées dans `exports/<sha256>.parquet` : le worker relit
+exactement les lignes de l'export choisi, même celles déjà reçues dans un
+export précédent.
+Sans pyarrow, l'historique n'est pas disponible.
+"""
+import os
+import re
+import sys
+import json
+import glob
+import time
+import logging
+import argparse
+import threading
+from collections import namedtuple
+
+import pandas as pd
+
+from Worker.excel_cache import file_hash
+from Worker.roster import RosterReader
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+SOURCES_FILE = "sources.json"
+DATA_DIR = "attempts"
+EXPORTS_DIR = "exports"
+UNKNOWN_MONTH = "unknown"
+
+# FORM_DSA_LV1_1591764_1747642705423_... -> formulaire 1591764, libellé DSA_LV1
+EXPORT_NAME = re.compile(r"^FORM_(?:(?P<label>.+?)_)?(?P<form>\d{5,})_\d{10,}")
+
+# Lignes d'un export : nom, SSO et email tels qu'écrits dans ce fichier (la clé ignore la casse du nom)
+EXPORT_COLUMNS = ["attempt", "row", "nom", "sso", "email"]
+
+COLUMNS = ["training", "month", "date", "nom", "sso", "email", "score", "attempts", "unit",
+           "participant", "attempt", "source", "row"]
+
+# Types fixés : une colonne vide d'un export (ex. pas d'unité SDSU) reste compatible avec les autres fichiers
+SCHEMA = None if pa is None else pa.schema([
+    ("training", pa.string()), ("month", pa.string()), ("date", pa.timestamp("us")), ("nom", pa.string()),
+    ("sso", pa.string()), ("email", pa.string()), ("score", pa.float64()), ("attempts", pa.float64()),
+    ("unit", pa.string()), ("participant", pa.string()), ("attempt", pa.string()), ("source", pa.string()),
+    ("row", pa.int64()),
+])
+
+# Résultat d'une ingestion : formulaire, empreinte de l'export, tentatives ajoutées
+Ingested = namedtuple("Ingested", ["training", "digest", "added"])
+
+PARTITIONING = None if pa is None else ds.partitioning(
+    pa.schema([("training", pa.string()), ("month", pa.string())]), flavor="hive"
+)
+
+
+def default_history_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.environ.get("CERT_HISTORY_DIR") or os.path.join(base, "CertificatesGeneration", "history")
+
+
+def training_of(path):
+    """(formulaire, libellé) d'un export d'après son nom ; le nom du fichier sinon."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    match = EXPORT_NAME.match(stem)
+    if not match:
+        return stem, stem
+    return match.group("form"), match.group("label") or match.group("form")
+
+
+def export_files(paths):
+    """Fichiers .xlsx désignés (dossiers parcourus, fichiers temporaires d'Excel ignorés)."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.xlsx"))))
+        else:
+            files.append(path)
+    return [f for f in files if not os.path.basename(f).startswith("~$")]
+
+
+def _column_positions(path, *names):
+    """Position de la première colonne dont l'en-tête (ligne 1 de l'export) contient chaque nom, ou None."""
+    headers = [str(c) for c in pd.read_excel(path, nrows=0).columns]
+    return [next((i for i, header in enumerate(headers) if name in header), None) for name in names]
+
+
+def read_export(path):
+    """Roster typé d'un export lu comme par le worker (`RosterReader`), plus l'unité SDSU et les tentatives.
+
+    Lignes (vides comprises) et index sont ceux du mode Excel : activer
+    l'historique ne change ni les participants retenus ni les messages.
+    """
+    chunks = list(RosterReader(path))
+    roster = pd.concat(chunks) if chunks else pd.DataFrame(columns=["date", "nom", "score", "sso", "email"])
+    unit_pos, attempts_pos = _column_positions(path, "SDSU Business Unit", "No. of Attempts")
+    positions = [p for p in (unit_pos, attempts_pos) if p is not None]
+    # Même découpage que RosterReader : ligne 1 (en-têtes) et ligne 2 ignorées, index 0 = ligne 3
+    extra = pd.read_excel(path, skiprows=2, header=None, usecols=positions) if positions else pd.DataFrame()
+    extra = extra.reindex(roster.index)
+    roster["unit"] = extra[unit_pos] if unit_pos is not None else None
+    roster["attempts"] = (pd.to_numeric(extra[attempts_pos], errors="coerce") if attempts_pos is not None
+                          else float("nan"))
+    return roster
+
+
+def attempts_frame(roster, training, source):
+    """Tentatives d'un export (`read_export`) au format de l'historique, une par ligne de l'export."""
+    # Participant : nom sans casse ni espaces superflus (les colonnes 7 et 8 ne sont pas SSO/email dans tous
+    # les formulaires, seule la colonne 1 est commune à tous les exports)
+    participant = roster["nom"].fillna("").str.casefold().str.replace(r"\s*,\s*", ",", regex=True)
+    participant = participant.str.replace(r"\s+", " ", regex=True).str.strip()
+    unit = roster["unit"]
+    frame = pd.DataFrame({
+        "training": training,
+        "month": roster["date"].dt.strftime("%Y-%m").fillna(UNKNOWN_MONTH),
+        "date": roster["date"].astype("datetime64[us]"),
+        "nom": roster["nom"],
+        "sso": roster["sso"],
+        "email": roster["email"],
+        "score": roster["score"],
+        "attempts": roster["attempts"],
+        "unit": unit.astype(str).where(unit.notna(), None),
+        "participant": participant,
+        "source": source,
+        # Index de la ligne dans l'export, comme RosterReader (les messages du worker citent row + 2)
+        "row": roster.index.to_numpy().astype("int64"),
+    })
+    # Clé de déduplication, jamais nulle (date ou score illisible : "NaT" / "nan")
+    frame["attempt"] = (frame["participant"] + "|"
+                        + frame["date"].dt.strftime("%Y-%m-%d %H:%M:%S").fillna("NaT") + "|"
+                        + frame["score"].astype(str).fillna("nan"))
+    return frame[COLUMNS].reset_index(drop=True)
+
+
+class HistoryStore:
+    """Dataset Parquet `root/attempts/training=.../month=.../*.parquet` et index des exports ingérés."""
+
+    def __init__(self, root=None):
+        if pa is None:
+            raise RuntimeError("pyarrow is required for the attempts history")
+        self.root = root or default_history_dir()
+        self.data_dir = os.path.join(self.root, DATA_DIR)
+        self.exports_dir = os.path.join(self.root, EXPORTS_DIR)
+        self._lock = threading.Lock()
+
+    # --- Exports ingérés ---
+
+    def _sources_path(self):
+        return os.path.join(self.root, SOURCES_FILE)
+
+    def sources(self):
+        """{sha256: path, training, label, rows (tentatives ajoutées), ingested_at} des exports déjà ingérés."""
+        try:
+            with open(self._sources_path(), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_sources(self, sources):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self._sources_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(sources, f, indent=1)
+        os.replace(tmp_path, self._sources_path())
+
+    def ingest(self, path, training=None, label=None):
+        """Ajoute les nouvelles tentatives d'un export ; retourne `Ingested(formulaire, empreinte, ajoutées)`.
+
+        Un export déjà ingéré (même contenu) n'est pas relu.
+        """
+        digest = file_hash(path)
+        with self._lock:
+            known = self.sources().get(digest)
+            if known:
+                logging.info(f"{path} already in the history ({known['training']})")
+                return Ingested(known["training"], digest, 0)
+
+            form, form_label = training_of(path)
+            training = training or form
+            frame = attempts_frame(read_export(path), training, os.path.basename(path))
+
+            # Lignes de l'export avant déduplication : relues par HistoryRoster pour un run sur cet export
+            os.makedirs(self.exports_dir, exist_ok=True)
+            export_path = self._export_path(digest)
+            tmp_path = f"{export_path}.{os.getpid()}.tmp"
+            pq.write_table(pa.Table.from_pandas(frame[EXPORT_COLUMNS], preserve_index=False), tmp_path)
+            os.replace(tmp_path, export_path)
+
+            frame = frame.drop_duplicates("attempt")
+            frame = frame[~frame["attempt"].isin(self._known_attempts(training, frame["month"].unique()))]
+            if len(frame):
+                pq.write_to_dataset(
+                    pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False), self.data_dir,
+                    partition_cols=["training", "month"], basename_template=f"{digest[:16]}-{{i}}.parquet",
+                    existing_data_behavior="overwrite_or_ignore",
+                )
+
+            sources = self.sources()
+            sources[digest] = {
+                "path": os.path.abspath(path), "training": training, "label": label or form_label,
+                "rows": int(len(frame)), "ingested_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            self._write_sources(sources)
+        logging.info(f"{path}: {len(frame)} new attempts added to the history ({training})")
+        return Ingested(training, digest, len(frame))
+
+    def _export_path(self, digest):
+        return os.path.join(self.exports_dir, f"{digest}.parquet")
+
+    def export_rows(self, digest):
+        """Lignes d'un export ingéré (EXPORT_COLUMNS), toutes, doublons compris."""
+        return pq.read_table(self._export_path(digest)).to_pandas()
+
+    def ingest_paths(self, paths):
+        """Ingère fichiers et dossiers ; un export illisible est journalisé sans arrêter les autres."""
+        added = {}
+        for path in export_files(paths):
+            try:
+                added[path] = self.ingest(path)
+            except Exception as e:
+                logging.error(f"Could not add {path} to the history: {e}")
+        return added
+
+    def _known_attempts(self, training, months):
+        dataset = self.dataset()
+        if dataset is None:
+            return set()
+        table = dataset.to_table(
+            columns=["attempt"],
+            filter=(ds.field("training") == training) & ds.field("month").isin(list(months)),
+        )
+        return set(table.column("attempt").to_pylist())
+
+    # --- Lecture ---
+
+    def dataset(self):
+        if not glob.glob(os.path.join(self.data_dir, "training=*")):
+            return None
+        return ds.dataset(self.data_dir, schema=SCHEMA, format="parquet", partitioning=PARTITIONING)
+
+    def trainings(self):
+        """{formulaire: libellé} des formations présentes."""
+        return {s["training"]: s["label"] for s in self.sources().values()}
+
+    def read(self, columns=None, trainings=None, date_start=None, date_end=None, units=None, attempts=None,
+             undated=False):
+        """Tentatives filtrées (dates incluses en jours entiers) ; filtres poussés jusqu'aux fichiers Parquet.
+
+        `attempts` : clés des tentatives à garder (lignes d'un export, voir `export_rows`).
+        `undated` : garder aussi les tentatives sans date lisible, que le filtre de période écarterait.
+        """
+        dataset = self.dataset()
+        if dataset is None:
+            return pd.DataFrame(columns=columns or COLUMNS)
+        conditions = []
+        if trainings is not None:
+            conditions.append(ds.field("training").isin([str(t) for t in trainings]))
+        period = []
+        if date_start is not None:
+            start = pd.Timestamp(date_start).normalize()
+            period.append(ds.field("month") >= start.strftime("%Y-%m"))
+            period.append(ds.field("date") >= pa.scalar(start.to_pydatetime(), pa.timestamp("us")))
+        if date_end is not None:
+            end = pd.Timestamp(date_end).normalize()
+            period.append(ds.field("month") <= end.strftime("%Y-%m"))
+            period.append(ds.field("date") < pa.scalar((end + pd.Timedelta(days=1)).to_pydatetime(),
+                                                       pa.timestamp("us")))
+        if period:
+            condition = period[0]
+            for c in period[1:]:
+                condition = condition & c
+            # Une comparaison avec une date nulle écarte la ligne : on la réintroduit explicitement
+            conditions.append(condition | ds.field("date").is_null() if undated else condition)
+        if units is not None:
+            conditions.append(ds.field("unit").isin(list(units)))
+        if attempts is not None:
+            conditions.append(ds.field("attempt").isin(list(attempts)))
+        condition = None
+        for c in conditions:
+            condition = c if condition is None else condition & c
+        return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+    def kpi_frame(self, trainings=None, date_start=None, date_end=None, units=None):
+        """Tentatives sous la forme d'un export pour `KPIWindow` (colonnes lues par `prepare_data`)."""
+        df = self.read(["date", "nom", "attempts", "score", "unit", "training"], trainings, date_start, date_end,
+                       units)
+        return pd.DataFrame({
+            "Date Appeared": df["date"],
+            "Created By": df["nom"],
+            # Tentatives inconnues (colonne absente de l'export) : comptées comme une première tentative
+            "No. of Attempts": pd.to_numeric(df["attempts"], errors="coerce").fillna(0),
+            "Percent Score": df["score"],
+            "SDSU Business Unit": df["unit"],
+            "Training": df["training"],
+        })
+
+
+class HistoryRoster:
+    """Roster du worker lu depuis l'historique, par blocs typés comme `RosterReader`.
+
+    Avec `digest` (cas normal) : les lignes de cet export seulement, dans
+    l'ordre et avec l'index du fichier ; la période est appliquée ensuite par
+    `select_participants`, comme en mode Excel (mêmes messages, dates
+    illisibles comprises).
+    Sans `digest` : toutes les tentatives de la formation, tous exports
+    confondus (choix explicite, `history_scope="training"` du moteur) ;
+    l'index numérote alors les tentatives lues et la colonne "line" donne
+    l'export et la ligne d'origine des messages.
+    """
+
+    def __init__(self, store, training, digest=None, date_start=None, date_end=None, chunk_size=500):
+        self.store = store
+        self.training = training
+        self.digest = digest
+        self.date_start = date_start
+        self.date_end = date_end
+        self.chunk_size = chunk_size
+        self.total_rows = None
+        self.rows_read = 0
+        self.from_cache = False
+
+    def _export(self):
+        rows = self.store.export_rows(self.digest)
+        df = self.store.read(["attempt", "date", "score"], [self.training], attempts=rows["attempt"].unique())
+        df = rows.merge(df, on="attempt").sort_values("row", kind="stable")
+        return df.set_index(df["row"].to_numpy())[["date", "nom", "score", "sso", "email"]]
+
+    def _training(self):
+        # Période poussée dans le dataset (tout l'historique de la formation), dates illisibles gardées
+        df = self.store.read(["date", "nom", "score", "sso", "email", "source", "row"], [self.training],
+                             self.date_start, self.date_end, undated=True)
+        df = df.sort_values("date", kind="stable").reset_index(drop=True)
+        df["line"] = df["source"] + ":" + (df["row"] + 2).astype(str)
+        return df[["date", "nom", "score", "sso", "email", "line"]]
+
+    def __iter__(self):
+        df = self._export() if self.digest is not None else self._training()
+        df["date"] = df["date"].astype("datetime64[ns]")
+        self.total_rows = len(df)
+        for start in range(0, len(df), self.chunk_size):
+            chunk = df.iloc[start:start + self.chunk_size]
+            self.rows_read += len(chunk)
+            yield chunk
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the local attempts history.")
+    parser.add_argument("--history-dir", help="history folder (default: CERT_HISTORY_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="add Forms exports (files or folders) to the history")
+    ingest.add_argument("paths", nargs="+")
+    commands.add_parser("list", help="list the ingested exports")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+
+    store = HistoryStore(args.history_dir)
+    if args.command == "ingest":
+        for path, ingested in store.ingest_paths(args.paths).items():
+            print(f"{ingested.added:>6} new attempts  {ingested.training:<10} {path}")
+    else:
+        for digest, source in sorted(store.sources().items(), key=lambda item: item[1]["ingested_at"]):
+            print(f"{source['ingested_at']}  {source['training']:<10} {source['label']:<14} "
+                  f"{source['rows']:>6} rows  {source['path']}")
+    print(f"history: {store.root}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
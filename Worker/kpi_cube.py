@@ -0,0 +1,109 @@
+"""Cube KPI pré-agrégé du tableau de bord (test_kpi.py).
+
+Les tentatives sont agrégées une fois en cellules (région × unité SDSU ×
+jour × score entier) avec le nombre de lignes et la somme des tentatives de
+chaque cellule : l'histogramme des scores par unité et par jour. Une plage de
+dates et un seuil de réussite se résolvent ensuite par des sommes de
+cellules (tranche des jours par recherche dichotomique, `np.bincount` par
+unité), sans relire les lignes brutes.
+
+Le seuil est exact pour un seuil entier (celui du QSpinBox) : score >= seuil
+équivaut à floor(score) >= seuil. Un score manquant compte dans les
+tentatives mais jamais comme réussite, comme la comparaison d'origine.
+"""
+import numpy as np
+import pandas as pd
+
+
+# Cases de score : -1 (score manquant ou négatif), 0..100, 101 (au-delà de 100)
+MIN_BUCKET = -1
+MAX_BUCKET = 101
+
+
+def score_buckets(scores):
+    values = pd.to_numeric(scores, errors="coerce").to_numpy(dtype=float)
+    buckets = np.floor(np.nan_to_num(values, nan=MIN_BUCKET))
+    return np.clip(buckets, MIN_BUCKET, MAX_BUCKET).astype(np.int16)
+
+
+class KPICube:
+    """Cellules triées par jour ; `query` donne le tableau par région et unité de `KPIWindow.update_view`."""
+
+    def __init__(self, units, regions, day, unit_index, bucket, rows, attempts):
+        # units / regions : une entrée par unité, dans l'ordre de groupby(["Region", "SDSU Unit"])
+        self.units = units
+        self.regions = regions
+        self.day = day
+        self.unit_index = unit_index
+        self.bucket = bucket
+        self.rows = rows
+        self.attempts = attempts
+
+    @classmethod
+    def from_frame(cls, df, unit_column="SDSU Unit", region_column="Region", date_column="Date",
+                   score_column="Percent Score", attempts_column="Attempts"):
+        """Agrège un DataFrame préparé par `KPIWindow.prepare_data` (une ligne par tentative)."""
+        # Lignes sans unité ou sans date : écartées par groupby et par le filtre de dates d'origine
+        days = pd.to_datetime(df[date_column], errors="coerce").dt.normalize()
+        keep = df[unit_column].notna().to_numpy() & days.notna().to_numpy()
+        frame = pd.DataFrame({
+            "region": df[region_column].to_numpy()[keep],
+            "unit": df[unit_column].to_numpy()[keep],
+            "day": days.to_numpy()[keep].astype("datetime64[D]"),
+            "bucket": score_buckets(df[score_column])[keep],
+            "attempts": pd.to_numeric(df[attempts_column], errors="coerce").fillna(0).to_numpy()[keep],
+        })
+        cells = frame.groupby(["region", "unit", "day", "bucket"], sort=True).agg(
+            rows=("attempts", "size"), attempts=("attempts", "sum")
+        ).reset_index()
+
+        groups = cells[["region", "unit"]].drop_duplicates().reset_index(drop=True)
+        unit_index = pd.MultiIndex.from_frame(groups).get_indexer(pd.MultiIndex.from_frame(cells[["region", "unit"]]))
+        order = np.argsort(cells["day"].to_numpy(), kind="stable")
+        return cls(
+            groups["unit"].to_numpy(), groups["region"].to_numpy(),
+            cells["day"].to_numpy()[order], unit_index[order].astype(np.int32),
+            cells["bucket"].to_numpy()[order], cells["rows"].to_numpy()[order].astype(np.int64),
+            cells["attempts"].to_numpy()[order],
+        )
+
+    def __len__(self):
+        return len(self.day)
+
+    def date_bounds(self):
+        """Premier et dernier jour du cube (None si vide)."""
+        if not len(self.day):
+            return None, None
+        return pd.Timestamp(self.day[0]).date(), pd.Timestamp(self.day[-1]).date()
+
+    def _slice(self, start, end):
+        first = 0 if start is None else np.searchsorted(self.day, np.datetime64(pd.Timestamp(start).date(), "D"),
+                                                        "left")
+        last = len(self.day) if end is None else np.searchsorted(self.day,
+                                                                 np.datetime64(pd.Timestamp(end).date(), "D"),
+                                                                 "right")
+        return slice(first, last)
+
+    def query(self, start=None, end=None, success_threshold=70):
+        """Tentatives et réussites par (Region, SDSU Unit) sur les jours [start, end], bornes incluses."""
+        cells = self._slice(start, end)
+        unit_index = self.unit_index[cells]
+        rows = self.rows[cells]
+        size = len(self.units)
+        counts = np.bincount(unit_index, weights=rows, minlength=size)
+        attempts = np.bincount(unit_index, weights=self.attempts[cells], minlength=size)
+        successes = np.bincount(unit_index, weights=rows * (self.bucket[cells] >= success_threshold), minlength=size)
+        # Comme groupby : seules les unités ayant au moins une tentative dans la plage
+        present = counts > 0
+        return pd.DataFrame({
+            "Region": self.regions[present],
+            "SDSU Unit": self.units[present],
+            "Attempts": attempts[present].astype(np.int64),
+            "Successes": successes[present].astype(np.int64),
+        })
+
+    def histogram(self, start=None, end=None):
+        """Distribution des scores (lignes par case de MIN_BUCKET à MAX_BUCKET) sur la plage de jours."""
+        cells = self._slice(start, end)
+        return np.bincount(self.bucket[cells] - MIN_BUCKET, weights=self.rows[cells],
+                           minlength=MAX_BUCKET - MIN_BUCKET + 1).astype(np.int64)
@@ -0,0 +1,184 @@
+"""Calcul des vues du dashboard KPI (test_kpi.py) hors du thread de l'interface.
+
+`KPIWindow` regroupe les changements de filtres rapprochés (debounce) puis
+confie le dernier état à `KPIWorker` : agrégation depuis le cube, figures
+Plotly et leur JSON sont produits dans ce thread, l'interface ne fait plus
+que les transmettre aux graphiques. Une demande remplacée par une plus récente est abandonnée
+au prochain point de contrôle et son résultat n'est jamais émis.
+"""
+import time
+import logging
+import threading
+from collections import namedtuple
+
+import plotly.express as px
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+KPIRequest = namedtuple("KPIRequest", ["generation", "start", "end", "success_threshold"])
+
+# Vue calculée : tableaux (DataFrame), figures Plotly et JSON de chaque figure (clés "region", "unit", "pie")
+KPIView = namedtuple("KPIView", ["request", "grouped", "region_summary", "table", "figures", "json", "seconds"])
+
+TABLE_COLUMNS = [
+    "Region", " Unit", "Attempts", "Successes", "Success Rate per Unit (%)", "Success Rate by Region (%)"
+]
+
+
+class StaleRequest(Exception):
+    """La demande en cours a été remplacée par une plus récente."""
+
+
+def build_tables(cube, start, end, success_threshold):
+    """Tableau par unité et résumé par région pour une plage de dates et un seuil de réussite."""
+    # Attempts and successes by region and SDSU Unit, summed from the cube cells
+    grouped = cube.query(start, end, success_threshold)
+
+    # Calculate success rate per SDSU Unit (local)
+    grouped['Success Rate per Unit (%)'] = (grouped['Successes'] / grouped['Attempts'] * 100).round(1)
+
+    # Group data by region to get total attempts and successes
+    region_summary = grouped.groupby("Region").agg({
+        "Attempts": "sum",
+        "Successes": "sum"
+    }).reset_index()
+
+    # Calculate success rate per region
+    region_summary['Success Rate by Region (%)'] = (
+        region_summary['Successes'] / region_summary['Attempts'] * 100
+    ).round(1)
+
+    # Merge to add success rate by region to the original DataFrame
+    grouped = grouped.merge(region_summary[['Region', 'Success Rate by Region (%)']], on='Region', how='left')
+
+    # Prepare the table for display
+    table = grouped.rename(columns={"SDSU Unit": " Unit"})[TABLE_COLUMNS]
+    return grouped, region_summary, table
+
+
+def _centered_title(fig, text):
+    # Center and bold the title
+    fig.update_layout(
+        title=dict(
+            text=text,
+            x=0.5,  # Center horizontally
+            xanchor='center',  # Center relative to the X axis
+            font=dict(size=18, family='Arial', weight='bold')  # Bold font
+        )
+    )
+    return fig
+
+
+def build_figures(grouped, region_summary, check=None):
+    """Les trois graphiques du dashboard ; `check()` est appelé entre deux figures (annulation)."""
+    check = check or (lambda: None)
+    figures = {}
+
+    # Success rate by region graph
+    figures["region"] = _centered_title(px.bar(
+        region_summary,
+        x="Region",
+        y="Success Rate by Region (%)",
+        title="Success Rate by Region (%)",
+        color="Success Rate by Region (%)",
+        color_continuous_scale=px.colors.sequential.Viridis
+    ), "Success Rate by Region (%)")
+    check()
+
+    # Success rate by SDSU Unit graph
+    fig_unit = px.bar(
+        grouped,
+        x="SDSU Unit",
+        y="Success Rate per Unit (%)",
+        title="Success Rate by SDSU Unit (%)",
+        color="Success Rate per Unit (%)",
+        color_continuous_scale=px.colors.sequential.Plasma
+    )
+    fig_unit.update_yaxes(range=[0, 100])
+    figures["unit"] = _centered_title(fig_unit, "Success Rate by SDSU Unit (%)")
+    check()
+
+    # Pie chart based on the overall success rate
+    region_summary_for_pie = region_summary.copy()
+
+    # If the overall success rate is 0, replace with None to avoid showing it
+    region_summary_for_pie.loc[region_summary_for_pie['Success Rate by Region (%)'] == 0, 'Success Rate by Region (%)'] = None
+
+    figures["pie"] = _centered_title(px.pie(
+        region_summary_for_pie,
+        values="Success Rate by Region (%)",  # Uses the overall success rate for each region
+        names="Region",  # Region names
+        title="Distribution of Success Rates by Region",
+        color_discrete_sequence=px.colors.qualitative.Bold  # Choose color palette
+    ), "Distribution of Success Rates by Region")
+    return figures
+
+
+class KPIWorker(QThread):
+    """Thread de calcul du dashboard : ne traite que la dernière demande reçue."""
+    computed = pyqtSignal(object)   # KPIView de la demande la plus récente
+    failed = pyqtSignal(str)
+
+    def __init__(self, cube, parent=None):
+        super().__init__(parent)
+        self.cube = cube
+        self.generation = 0
+        self.cancelled = 0
+        self._pending = None
+        self._stopping = False
+        self._wake = threading.Condition()
+
+    def request(self, start, end, success_threshold):
+        """Demande une vue ; toute demande plus ancienne, en attente ou en cours, devient obsolète."""
+        with self._wake:
+            self.generation += 1
+            self._pending = KPIRequest(self.generation, start, end, success_threshold)
+            self._wake.notify()
+        return self.generation
+
+    def stale(self, request):
+        return self._stopping or request.generation != self.generation
+
+    def stop(self):
+        with self._wake:
+            self._stopping = True
+            self._wake.notify()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self._wake:
+                self._wake.wait_for(lambda: self._pending is not None or self._stopping)
+                if self._stopping:
+                    return
+                request, self._pending = self._pending, None
+            try:
+                view = self.compute(request)
+            except StaleRequest:
+                self.cancelled += 1
+                continue
+            except Exception as e:
+                logging.error(f"KPI computation failed: {e}")
+                self.failed.emit(str(e))
+                continue
+            # Dernier contrôle : une demande arrivée pendant le calcul rend ce résultat inutile
+            if not self.stale(request):
+                self.computed.emit(view)
+            else:
+                self.cancelled += 1
+
+    def compute(self, request):
+        def check():
+            if self.stale(request):
+                raise StaleRequest()
+
+        started = time.perf_counter()
+        grouped, region_summary, table = build_tables(self.cube, request.start, request.end,
+                                                      request.success_threshold)
+        check()
+        figures = build_figures(grouped, region_summary, check)
+        payload = {}
+        for name, fig in figures.items():
+            check()
+            payload[name] = fig.to_json()
+        return KPIView(request, grouped, region_summary, table, figures, payload, time.perf_counter() - started)
@@ -0,0 +1,200 @@
+import os
+import re
+import sys
+import json
+import getpass
+import logging
+import mimetypes
+import threading
+from collections import namedtuple
+from email.message import EmailMessage
+from urllib.parse import unquote
+
+
+# Propriété MAPI du Content-ID : l'image jointe s'affiche dans le corps du mail (cid:)
+PR_ATTACH_CONTENT_ID = "http://schemas.microsoft.com/mapi/proptag/0x3712001F"
+
+# Les signatures Outlook sont enregistrées dans la page de code ANSI de Windows
+SIGNATURE_ENCODING = "mbcs" if sys.platform == "win32" else "cp1252"
+
+# Corps des mails, par identifiant de modèle (enregistré dans l'outbox avec ses paramètres)
+CERTIFICATE_TEMPLATE = "certificate"
+MAIL_TEMPLATES = {
+    CERTIFICATE_TEMPLATE: """
+                    Dears,
+
+                    I am pleased to share with you your {formation_title}  certificate. Please find attached your certificate.
+
+                    Best regards
+                    """,
+}
+
+SignatureImage = namedtuple("SignatureImage", ["path", "cid", "data", "mime_type"])
+
+# html : signature dont les images pointent vers leur cid
+Signature = namedtuple("Signature", ["path", "html", "images"])
+
+
+def default_signature_dir():
+    appdata = os.environ.get("APPDATA")
+    return os.path.join(appdata, "Microsoft", "Signatures") if appdata else None
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def load_signature(folder, username):
+    """Signature HTML Outlook de l'utilisateur (fichier .htm dont le nom contient `username`), ou None."""
+    if not folder or not os.path.isdir(folder):
+        logging.error(f"Outlook signature folder not found: {folder}")
+        return None
+    candidates = sorted(
+        name for name in os.listdir(folder)
+        if username in name and name.lower().endswith((".htm", ".html")) and os.path.isfile(os.path.join(folder, name))
+    )
+    if not candidates:
+        logging.error(f"No signature found for username '{username}'.")
+        return None
+
+    path = os.path.join(folder, candidates[0])
+    with open(path, "r", encoding=SIGNATURE_ENCODING, errors="replace") as f:
+        html = f.read()
+
+    images = []
+    for src in dict.fromkeys(re.findall(r'<img[^>]+src="([^"]+)"', html)):
+        img_path = os.path.join(folder, *unquote(src).replace("\\", "/").split("/"))
+        if not os.path.exists(img_path):
+            logging.warning(f"Signature image not found: {img_path}")
+            continue
+        cid = os.path.basename(src)  # Identifiant de l'image dans le mail
+        html = html.replace(f'src="{src}"', f'src="cid:{cid}"')
+        with open(img_path, "rb") as f:
+            data = f.read()
+        mime_type = mimetypes.guess_type(img_path)[0] or "application/octet-stream"
+        images.append(SignatureImage(img_path, cid, data, mime_type))
+    return Signature(path, html, tuple(images))
+
+
+class SignatureCache:
+    """Signature Outlook lue une fois par run, relue seulement si un fichier a changé (date de modification).
+
+    Sont surveillés : le dossier des signatures (signature ajoutée ou renommée),
+    le fichier HTML retenu et ses images.
+    """
+
+    def __init__(self, folder=None, username=None):
+        self.folder = folder if folder is not None else default_signature_dir()
+        self.username = username or getpass.getuser()
+        self.loads = 0
+        self._signature = None
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _current_stamp(self, signature):
+        paths = [self.folder] if self.folder else []
+        if signature is not None:
+            paths.append(signature.path)
+            paths.extend(image.path for image in signature.images)
+        return tuple((path, _mtime(path)) for path in paths)
+
+    def get(self):
+        with self._lock:
+            if self._stamp is not None and self._stamp == self._current_stamp(self._signature):
+                return self._signature
+            try:
+                self._signature = load_signature(self.folder, self.username)
+            except Exception as e:
+                logging.error(f"Error reading signature: {e}")
+                self._signature = None
+            self._stamp = self._current_stamp(self._signature)
+            self.loads += 1
+            return self._signature
+
+
+class MailSkeleton:
+    """Partie commune à tous les mails d'un run : corps HTML avec signature, copie et images inline.
+
+    Chaque mail ne change que le destinataire, le sujet et le certificat joint.
+    `to_mime` produit le message MIME complet (utilisable sans Outlook),
+    `apply_to` remplit un MailItem Outlook.
+    """
+
+    def __init__(self, body_text, signature=None, cc=None, sender=None):
+        self.body_text = body_text
+        self.signature = signature
+        self.cc = cc
+        self.sender = sender
+        signature_html = signature.html if signature is not None else ""
+        self.html = f"<html><body>{body_text.replace(chr(10), '<br>')}<br><br>{signature_html}</body></html>"
+        self.images = signature.images if signature is not None else ()
+        self._related = self._build_related()
+
+    def _build_related(self):
+        part = EmailMessage()
+        part.set_content(self.html, subtype="html")
+        for image in self.images:
+            maintype, subtype = image.mime_type.split("/", 1)
+            part.add_related(image.data, maintype, subtype, cid=f"<{image.cid}>",
+                             filename=os.path.basename(image.path))
+        return part
+
+    def to_mime(self, to, subject, attachment=None):
+        message = EmailMessage()
+        if self.sender:
+            message["From"] = self.sender
+        message["To"] = to
+        if self.cc:
+            message["Cc"] = self.cc
+        message["Subject"] = subject
+        message["MIME-Version"] = "1.0"
+        message["Content-Type"] = "multipart/mixed"
+        # Corps et images construits une fois, partagés par tous les messages
+        message.attach(self._related)
+        if attachment:
+            with open(attachment, "rb") as f:
+                data = f.read()
+            maintype, subtype = (mimetypes.guess_type(attachment)[0] or "application/octet-stream").split("/", 1)
+            message.add_attachment(data, maintype, subtype, filename=os.path.basename(attachment))
+        return message
+
+    def apply_to(self, mail, to, subject, attachment=None):
+        mail.To = to
+        mail.Subject = subject
+        if self.cc:
+            mail.CC = self.cc
+        mail.HTMLBody = self.html
+        for image in self.images:
+            inline = mail.Attachments.Add(image.path)
+            inline.PropertyAccessor.SetProperty(PR_ATTACH_CONTENT_ID, image.cid)
+        if attachment:
+            mail.Attachments.Add(attachment)
+        return mail
+
+
+def render_body(template_id, params):
+    return MAIL_TEMPLATES[template_id].format(**params)
+
+
+class MailComposer:
+    """Squelettes des mails d'un run, un par (modèle de corps, paramètres, copie).
+
+    Construits à la première demande et reconstruits seulement si la signature a changé.
+    """
+
+    def __init__(self, signatures=None):
+        self.signatures = signatures or SignatureCache()
+        self._skeletons = {}
+        self._lock = threading.Lock()
+
+    def skeleton(self, template_id, params, cc=None):
+        signature = self.signatures.get()
+        key = (template_id, json.dumps(params, sort_keys=True), cc)
+        with self._lock:
+            skeleton = self._skeletons.get(key)
+            if skeleton is None or skeleton.signature is not signature:
+                skeleton = self._skeletons[key] = MailSkeleton(render_body(template_id, params), signature, cc)
+        return skeleton
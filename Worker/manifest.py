@@ -0,0 +1,121 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+
+from Worker.excel_cache import file_hash
+
+
+MANIFEST_NAME = "certificates_manifest.sqlite"
+
+# Étapes franchies par un certificat, dans l'ordre
+STATES = ("filled", "converted", "mailed")
+
+# Champ recalculé à chaque run : ne doit pas provoquer de régénération
+VOLATILE_FIELDS = ("{{DATE_EDITION}}",)
+
+
+def fields_hash(replacements):
+    fields = {k: str(v) for k, v in replacements.items() if k not in VOLATILE_FIELDS}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class RunManifest:
+    """Suivi durable (SQLite dans le dossier de sortie) de chaque certificat d'un run.
+
+    Clé : participant (SSO et nom, le PDF étant nommé d'après le nom), titre et date de la formation.
+    Chaque entrée garde l'étape atteinte (STATES), les chemins produits, l'empreinte
+    des champs rendus et le SHA-256 du PDF. Un nouveau run sur le même dossier
+    reprend là où le précédent s'est arrêté : PDF déjà produit et inchangé ->
+    seulement l'envoi du mail, mail déjà envoyé -> rien à faire.
+    """
+
+    def __init__(self, output_folder, filename=MANIFEST_NAME):
+        self.path = os.path.join(output_folder, filename)
+        self._lock = threading.Lock()
+        # Partagée par les threads du pipeline (accès protégés par le verrou)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS certificates (
+                participant TEXT NOT NULL,
+                title TEXT NOT NULL,
+                training_date TEXT NOT NULL,
+                state TEXT NOT NULL,
+                nom TEXT,
+                email TEXT,
+                pdf_path TEXT,
+                fields_hash TEXT,
+                pdf_hash TEXT,
+                updated_at TEXT,
+                PRIMARY KEY (participant, title, training_date)
+            )
+        """)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def key(job):
+        replacements = job.replacements
+        participant = f"{replacements.get('{{SSO}}', '')}|{job.nom}"
+        return participant, replacements.get("{{FORMATION}}", ""), replacements.get("{{DATE_FORMATION}}", "")
+
+    def entry(self, job):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state, pdf_path, fields_hash, pdf_hash FROM certificates "
+                "WHERE participant = ? AND title = ? AND training_date = ?", self.key(job)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("state", "pdf_path", "fields_hash", "pdf_hash"), row))
+
+    def resume_state(self, job):
+        """Étape déjà acquise pour ce job ("converted" ou "mailed"), None s'il faut le (re)générer.
+
+        Un PDF manquant, modifié ou produit avec d'autres champs est régénéré.
+        """
+        entry = self.entry(job)
+        if entry is None or entry["state"] not in ("converted", "mailed"):
+            return None
+        if entry["fields_hash"] != fields_hash(job.replacements) or entry["pdf_path"] != job.pdf_path:
+            return None
+        if not os.path.exists(job.pdf_path) or file_hash(job.pdf_path) != entry["pdf_hash"]:
+            return None
+        return entry["state"]
+
+    def mark(self, job, state):
+        if state not in STATES:
+            raise ValueError(f"Unknown manifest state: {state}")
+        if state == "mailed":
+            self.mark_mailed(self.key(job))
+            return
+        pdf_hash = file_hash(job.pdf_path) if state == "converted" and os.path.exists(job.pdf_path) else None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO certificates VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self.key(job) + (state, job.nom, job.email, job.pdf_path,
+                                 fields_hash(job.replacements), pdf_hash,
+                                 datetime.now().isoformat(timespec="seconds"))
+            )
+            self._db.commit()
+
+    def mark_mailed(self, key):
+        """Certificat envoyé, par clé (`key(job)`) : utilisé aussi par le rejeu de l'outbox, sans job."""
+        with self._lock:
+            # Le PDF envoyé est celui enregistré à la conversion
+            self._db.execute(
+                "UPDATE certificates SET state = ?, updated_at = ? "
+                "WHERE participant = ? AND title = ? AND training_date = ?",
+                ("mailed", datetime.now().isoformat(timespec="seconds")) + tuple(key)
+            )
+            self._db.commit()
+
+    def counts(self):
+        with self._lock:
+            return dict(self._db.execute("SELECT state, COUNT(*) FROM certificates GROUP BY state").fetchall())
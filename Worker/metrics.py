@@ -0,0 +1,247 @@
+"""Mesures d'un run : durée de chaque étape, débit glissant et avancement (ETA).
+
+Étapes mesurées (STAGES) : lecture de l'Excel, filtrage, remplissage du
+modèle, enregistrement du deck dans le scratch, conversion PDF et envoi du
+mail. Chaque mesure garde la durée par certificat (un lot de n certificats
+compte n fois sa durée / n) ; les percentiles portent sur les `reservoir`
+dernières mesures et le débit sur les `window` dernières secondes.
+"""
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+
+STAGES = ("read", "filter", "fill", "save", "convert", "mail")
+
+# Intervalle minimal entre deux publications de l'avancement (signaux Qt, sortie console)
+DEFAULT_PUBLISH_INTERVAL = 0.5
+
+
+def percentile(values, fraction):
+    """Percentile par rang le plus proche d'une liste triée."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))]
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "-"
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes} min {seconds:02d} s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} h {minutes:02d} min"
+
+
+def format_progress(stats):
+    """Ligne d'avancement d'un événement `stats` : faits / total (~ estimé), débit et ETA."""
+    total = f"~{stats['total']}" if stats["estimated"] else str(stats["total"])
+    return (f"{stats['done']}/{total} certificates ({stats['percent']}%) · {stats['per_minute']:.1f}/min · "
+            f"ETA {format_duration(stats['eta'])}")
+
+
+class _Rolling:
+    """Éléments terminés pendant les `window` dernières secondes (depuis `origin` en début de run)."""
+
+    def __init__(self, window, clock, origin):
+        self.window = window
+        self.clock = clock
+        self.origin = origin
+        self.events = deque()
+        self.count = 0
+
+    def add(self, items):
+        now = self.clock()
+        self.events.append((now, items))
+        self.count += items
+        self._expire(now)
+
+    def _expire(self, now):
+        while self.events and self.events[0][0] < now - self.window:
+            self.count -= self.events.popleft()[1]
+
+    def per_second(self):
+        now = self.clock()
+        self._expire(now)
+        # En début de run la fenêtre n'est pas pleine : débit sur le temps écoulé depuis le départ
+        span = min(self.window, max(now - self.origin, 1e-3))
+        return self.count / span
+
+
+class RunMetrics:
+    """Durées par étape, partagées par tous les threads du run (verrou).
+
+    `keep_samples` : les mesures sont aussi gardées telles quelles pour être
+    renvoyées (`drain`) au process principal et fusionnées (`merge`) dans ses
+    mesures (mode multi-process).
+    """
+
+    def __init__(self, window=60.0, reservoir=2048, keep_samples=False, clock=time.perf_counter):
+        self.window = window
+        self.reservoir = reservoir
+        self.keep_samples = keep_samples
+        self.clock = clock
+        self.started = clock()
+        self.stages = {}
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def _stage(self, stage):
+        entry = self.stages.get(stage)
+        if entry is None:
+            entry = self.stages[stage] = {
+                "calls": 0, "items": 0, "total": 0.0,
+                "durations": deque(maxlen=self.reservoir), "rolling": _Rolling(self.window, self.clock, self.started),
+            }
+        return entry
+
+    def record(self, stage, seconds, items=1):
+        items = max(1, items)
+        with self._lock:
+            entry = self._stage(stage)
+            entry["calls"] += 1
+            entry["items"] += items
+            entry["total"] += seconds
+            entry["durations"].append(seconds / items)
+            entry["rolling"].add(items)
+            if self.keep_samples:
+                self.samples.append((stage, seconds, items))
+
+    @contextmanager
+    def measure(self, stage, items=1):
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.record(stage, self.clock() - started, items)
+
+    def timed(self, stage, iterable, size=None):
+        """Itère sur `iterable` en mesurant chaque élément produit (`size(élément)` certificats ou lignes)."""
+        iterator = iter(iterable)
+        while True:
+            started = self.clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.record(stage, self.clock() - started, size(item) if size else 1)
+            yield item
+
+    def drain(self):
+        with self._lock:
+            samples, self.samples = self.samples, []
+        return samples
+
+    def merge(self, samples):
+        for stage, seconds, items in samples:
+            self.record(stage, seconds, items)
+
+    def stage_stats(self):
+        """{étape: calls, items, total, mean, p50, p90, p99 (secondes par élément), per_minute (glissant)}."""
+        stats = {}
+        with self._lock:
+            for stage in sorted(self.stages, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES)):
+                entry = self.stages[stage]
+                durations = sorted(entry["durations"])
+                stats[stage] = {
+                    "calls": entry["calls"],
+                    "items": entry["items"],
+                    "total": entry["total"],
+                    "mean": entry["total"] / entry["items"],
+                    "p50": percentile(durations, 0.50),
+                    "p90": percentile(durations, 0.90),
+                    "p99": percentile(durations, 0.99),
+                    "per_minute": entry["rolling"].per_second() * 60,
+                }
+        return stats
+
+    def report(self):
+        """Une ligne par étape, pour le journal et la ligne de commande."""
+        lines = []
+        for stage, s in self.stage_stats().items():
+            lines.append(f"{stage:<8} {s['items']:>6} items  total {s['total']:8.2f}s  "
+                         f"p50 {s['p50'] * 1e3:8.1f} ms  p90 {s['p90'] * 1e3:8.1f} ms  p99 {s['p99'] * 1e3:8.1f} ms  "
+                         f"{s['per_minute']:8.1f}/min")
+        return lines
+
+
+class ProgressTracker:
+    """Avancement en certificats, pas en lignes : les lignes rejetées ne comptent pas.
+
+    Tant que la lecture n'est pas finie, le total est estimé à partir de la
+    part de lignes éligibles déjà observée et du nombre de lignes annoncé par
+    le classeur ; il est exact ensuite. `due()` limite la fréquence des
+    publications (au plus une toutes les `interval` secondes).
+    """
+
+    def __init__(self, total_rows=None, window=60.0, interval=DEFAULT_PUBLISH_INTERVAL, clock=time.perf_counter):
+        self.total_rows = total_rows
+        self.interval = interval
+        self.clock = clock
+        self.rows_seen = 0
+        self.eligible = 0
+        self.done = 0
+        self.reading = True
+        self.started = clock()
+        self._rolling = _Rolling(window, clock, self.started)
+        self._published = None
+        self._lock = threading.Lock()
+
+    def add_rows(self, rows, eligible):
+        with self._lock:
+            self.rows_seen += rows
+            self.eligible += eligible
+
+    def reading_done(self):
+        with self._lock:
+            self.reading = False
+
+    def complete(self, count=1):
+        with self._lock:
+            self.done += count
+            self._rolling.add(count)
+
+    def total(self):
+        if not self.reading or not self.rows_seen or not self.total_rows:
+            return self.eligible
+        remaining_rows = max(0, self.total_rows - self.rows_seen)
+        return self.eligible + int(round(remaining_rows * self.eligible / self.rows_seen))
+
+    def due(self, force=False):
+        """Vrai si une publication est permise maintenant (et la compte comme faite)."""
+        now = self.clock()
+        with self._lock:
+            if not force and self._published is not None and now - self._published < self.interval:
+                return False
+            self._published = now
+            return True
+
+    def snapshot(self):
+        with self._lock:
+            total = max(self.total(), self.done)
+            rate = self._rolling.per_second()
+            remaining = total - self.done
+            if total:
+                percent = 100 if not self.reading and not remaining else min(99, self.done * 100 // total)
+            else:
+                percent = 0 if self.reading else 100
+            return {
+                "done": self.done,
+                "total": total,
+                "estimated": self.reading,
+                "percent": percent,
+                "per_minute": rate * 60,
+                "eta": remaining / rate if rate > 0 else (0.0 if not remaining and not self.reading else None),
+                "elapsed": self.clock() - self.started,
+            }
+
+
+def progress_stats(tracker, metrics):
+    """Contenu de l'événement `stats` : avancement, débit, ETA et durées par étape."""
+    return dict(tracker.snapshot(), stages=metrics.stage_stats())
@@ -0,0 +1,428 @@
+import io
+import os
+import logging
+from functools import lru_cache
+from collections import namedtuple
+
+from lxml import etree
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Emu
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.lib.utils import ImageReader
+
+from Worker.template import PLACEHOLDERS
+from Worker.placeholders import PlaceholderEngine
+
+
+NS = {
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "p": "http://schemas.openxmlformats.org/presentationml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+}
+
+DEFAULT_FONT_SIZE = 18.0
+DEFAULT_INSETS = (91440, 45720, 91440, 45720)  # gauche, haut, droite, bas (EMU)
+CONDENSED_SCALE = 0.5  # Helvetica resserrée pour remplacer une police condensée absente
+IMAGE_DPI = 300  # les images du modèle sont ré-échantillonnées une fois à cette résolution
+WINDOWS_FONTS_DIR = os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts")
+
+# Éléments de mise en page extraits une fois du modèle
+ImageItem = namedtuple("ImageItem", ["image", "x", "y", "width", "height"])
+LineItem = namedtuple("LineItem", ["x1", "y1", "x2", "y2", "width", "color"])
+RunStyle = namedtuple("RunStyle", ["text", "font", "size", "bold", "italic", "color", "caps"])
+ParagraphLayout = namedtuple(
+    "ParagraphLayout", ["align", "line_spacing", "line_height", "space_after", "runs", "dynamic"]
+)
+TextBox = namedtuple("TextBox", ["x", "y", "width", "height", "insets", "anchor", "paragraphs"])
+
+
+def _pt(emu):
+    return Emu(int(emu)).pt
+
+
+@lru_cache(maxsize=None)
+def _xpath(path):
+    return etree.XPath(path, namespaces=NS)
+
+
+def _first(element, path):
+    if element is None:
+        return None
+    found = _xpath(path)(element)
+    return found[0] if found else None
+
+
+class TemplateLayout:
+    """Géométrie, polices et couleurs du modèle PPTX, extraites une seule fois.
+
+    Toutes les coordonnées sont en points PDF, origine en haut à gauche
+    (comme dans PowerPoint) ; le renderer inverse l'axe Y au dessin.
+    """
+
+    def __init__(self, template_path, placeholders=PLACEHOLDERS):
+        self.placeholders = tuple(placeholders)
+        self.engine = PlaceholderEngine(self.placeholders)
+        prs = Presentation(template_path)
+        slide = prs.slides[0]
+        if len(prs.slides) > 1:
+            logging.warning(f"Native renderer only draws the first slide of {template_path}")
+        # Balises découpées en plusieurs runs réunies dans le premier run
+        self.engine.normalize_element(slide._element)
+
+        self.page_width = _pt(prs.slide_width)
+        self.page_height = _pt(prs.slide_height)
+
+        layout = slide.slide_layout
+        master = layout.slide_master
+        self._theme = self._load_theme(master)
+        self._clr_map = self._color_map(slide, layout, master)
+        self._minor_font = self._theme_font(master, "minorFont")
+        self._major_font = self._theme_font(master, "majorFont")
+        self._master = master
+        self._layout = layout
+
+        self.background = self._background(slide, layout, master)
+        self.images = []
+        self.lines = []
+        if layout._element.get("showMasterSp") != "0":
+            self._collect_decorations(master)
+        self._collect_decorations(layout)
+        self._collect_decorations(slide)
+        self.text_boxes = [self._text_box(shape) for shape in slide.shapes if shape.has_text_frame]
+
+    # --- Thème et couleurs ---
+
+    def _load_theme(self, master):
+        for rel in master.part.rels.values():
+            if rel.reltype.endswith("/theme"):
+                return etree.fromstring(rel.target_part.blob)
+        return None
+
+    def _theme_font(self, master, kind):
+        latin = _first(self._theme, f".//a:fontScheme/a:{kind}/a:latin")
+        return latin.get("typeface") if latin is not None else "Helvetica"
+
+    def _color_map(self, slide, layout, master):
+        for part in (slide, layout):
+            override = _first(part._element, "p:clrMapOvr/a:overrideClrMapping")
+            if override is not None:
+                return dict(override.attrib)
+        clr_map = _first(master._element, "p:clrMap")
+        return dict(clr_map.attrib) if clr_map is not None else {}
+
+    def resolve_color(self, fill):
+        """Couleur hexadécimale d'un élément a:solidFill (srgbClr ou schemeClr)."""
+        if fill is None:
+            return None
+        srgb = _first(fill, "a:srgbClr")
+        if srgb is not None:
+            return srgb.get("val")
+        scheme = _first(fill, "a:schemeClr")
+        if scheme is None:
+            return None
+        name = self._clr_map.get(scheme.get("val"), scheme.get("val"))
+        color = _first(self._theme, f".//a:clrScheme/a:{name}")
+        if color is None:
+            return None
+        srgb = _first(color, "a:srgbClr")
+        if srgb is not None:
+            return srgb.get("val")
+        system = _first(color, "a:sysClr")
+        return system.get("lastClr") if system is not None else None
+
+    def _background(self, *parts):
+        for part in parts:
+            bg = _first(part._element, "p:cSld/p:bg/p:bgPr")
+            if bg is None:
+                continue
+            color = self.resolve_color(_first(bg, "a:solidFill"))
+            if color:
+                return color
+        return "FFFFFF"
+
+    # --- Décors statiques (images, traits) ---
+
+    def _collect_decorations(self, part):
+        for pic in _xpath("p:cSld/p:spTree/p:pic")(part._element):
+            blip = _first(pic, "p:blipFill/a:blip")
+            geometry = self._xfrm(pic)
+            if blip is None or geometry is None:
+                continue
+            image_part = part.part.related_part(blip.get(f"{{{NS['r']}}}embed"))
+            self.images.append(ImageItem(self._load_image(image_part.blob, geometry), *geometry))
+
+        for cxn in _xpath("p:cSld/p:spTree/p:cxnSp")(part._element):
+            geometry = self._xfrm(cxn)
+            ln = _first(cxn, "p:spPr/a:ln")
+            if geometry is None or ln is None:
+                continue
+            x, y, width, height = geometry
+            color = self.resolve_color(_first(ln, "a:solidFill")) or "000000"
+            self.lines.append(LineItem(x, y, x + width, y + height, _pt(ln.get("w", 12700)), color))
+
+    def _load_image(self, blob, geometry):
+        image = Image.open(io.BytesIO(blob))
+        width, height = geometry[2], geometry[3]
+        target = (max(1, int(width / 72 * IMAGE_DPI)), max(1, int(height / 72 * IMAGE_DPI)))
+        if image.width > target[0] and image.height > target[1]:
+            image = image.resize(target, Image.LANCZOS)
+        return ImageReader(image)
+
+    def _xfrm(self, element):
+        off = _first(element, "p:spPr/a:xfrm/a:off")
+        ext = _first(element, "p:spPr/a:xfrm/a:ext")
+        if off is None or ext is None:
+            return None
+        return _pt(off.get("x")), _pt(off.get("y")), _pt(ext.get("cx")), _pt(ext.get("cy"))
+
+    # --- Zones de texte ---
+
+    def _style_chain(self, shape):
+        """Listes de styles consultées dans l'ordre PowerPoint : forme, layout, master."""
+        chain = [_first(shape._element, "p:txBody/a:lstStyle")]
+        ph_type = None
+        if shape.is_placeholder:
+            ph_type = shape.placeholder_format.type
+            try:
+                layout_ph = self._layout.placeholders.get(idx=shape.placeholder_format.idx)
+                if layout_ph is None:
+                    for candidate in self._layout.placeholders:
+                        if candidate.placeholder_format.type == ph_type:
+                            layout_ph = candidate
+                            break
+            except Exception:
+                layout_ph = None
+            if layout_ph is not None:
+                chain.append(_first(layout_ph._element, "p:txBody/a:lstStyle"))
+            ph_name = shape._element.ph.get("type", "body")
+            master_ph = _first(self._master._element, f"p:cSld/p:spTree/p:sp[p:nvSpPr/p:nvPr/p:ph[@type='{ph_name}']]")
+            chain.append(_first(master_ph, "p:txBody/a:lstStyle"))
+
+        kind = "otherStyle"
+        if ph_type is not None:
+            name = str(ph_type).split(" ")[0].upper()
+            kind = "titleStyle" if "TITLE" in name and "SUB" not in name else "bodyStyle"
+        chain.append(_first(self._master._element, f"p:txStyles/p:{kind}"))
+        return [style for style in chain if style is not None]
+
+    def _lookup(self, chain, level, path, attribute=None):
+        for style in chain:
+            found = _first(style, f"a:lvl{level}pPr/{path}" if path else f"a:lvl{level}pPr")
+            if found is None:
+                continue
+            if attribute is None:
+                return found
+            if found.get(attribute) is not None:
+                return found.get(attribute)
+        return None
+
+    def _text_box(self, shape):
+        body_pr = _first(shape._element, "p:txBody/a:bodyPr")
+        insets = tuple(
+            _pt(body_pr.get(name, default)) if body_pr is not None else _pt(default)
+            for name, default in zip(("lIns", "tIns", "rIns", "bIns"), DEFAULT_INSETS)
+        )
+        chain = self._style_chain(shape)
+        anchor = (body_pr.get("anchor") if body_pr is not None else None) or "t"
+
+        paragraphs = []
+        for paragraph in shape.text_frame.paragraphs:
+            p_pr = _first(paragraph._p, "a:pPr")
+            level = int(p_pr.get("lvl", 0)) + 1 if p_pr is not None else 1
+            align = (p_pr.get("algn") if p_pr is not None else None) or self._lookup(chain, level, "", "algn") or "l"
+
+            # Interligne : pourcentage (spcPct) ou hauteur exacte en points (spcPts)
+            spacing = _first(p_pr, "a:lnSpc") if p_pr is not None else None
+            if spacing is None:
+                spacing = self._lookup(chain, level, "a:lnSpc")
+            percent = _first(spacing, "a:spcPct")
+            exact = _first(spacing, "a:spcPts")
+            line_spacing = int(percent.get("val")) / 100000 if percent is not None else 1.0
+            line_height = int(exact.get("val")) / 100 if exact is not None else None
+
+            after = _first(p_pr, "a:spcAft/a:spcPts") if p_pr is not None else None
+            if after is None:
+                after = self._lookup(chain, level, "a:spcAft/a:spcPts")
+            space_after = int(after.get("val")) / 100 if after is not None else 0.0
+
+            runs = [self._run_style(run, chain, level) for run in paragraph.runs]
+            # Paragraphe "dynamique" : contient au moins une balise à remplacer
+            dynamic = any(token in run.text for run in runs for token in self.placeholders)
+            paragraphs.append(ParagraphLayout(align, line_spacing, line_height, space_after, runs, dynamic))
+
+        return TextBox(_pt(shape.left), _pt(shape.top), _pt(shape.width), _pt(shape.height),
+                       insets, anchor, paragraphs)
+
+    def _run_style(self, run, chain, level):
+        r_pr = _first(run._r, "a:rPr")
+
+        def attribute(name):
+            if r_pr is not None and r_pr.get(name) is not None:
+                return r_pr.get(name)
+            return self._lookup(chain, level, "a:defRPr", name)
+
+        size = attribute("sz")
+        fill = _first(r_pr, "a:solidFill") if r_pr is not None else None
+        if fill is None:
+            fill = self._lookup(chain, level, "a:defRPr/a:solidFill")
+        latin = _first(r_pr, "a:latin") if r_pr is not None else None
+        if latin is None:
+            latin = self._lookup(chain, level, "a:defRPr/a:latin")
+        font = latin.get("typeface") if latin is not None else "+mn-lt"
+        if font == "+mn-lt":
+            font = self._minor_font
+        elif font == "+mj-lt":
+            font = self._major_font
+
+        return RunStyle(
+            text=run.text,
+            font=font,
+            size=int(size) / 100 if size else DEFAULT_FONT_SIZE,
+            bold=attribute("b") in ("1", "true"),
+            italic=attribute("i") in ("1", "true"),
+            color=self.resolve_color(fill) or "000000",
+            caps=attribute("cap") == "all",
+        )
+
+
+class NativeRenderer:
+    """Dessine chaque certificat directement en PDF (reportlab), sans PowerPoint.
+
+    `fonts` : dictionnaire {typeface PowerPoint: (ttf normal, ttf gras)} ; à défaut
+    les polices sont cherchées dans le dossier Fonts de Windows, puis Helvetica.
+    """
+
+    def __init__(self, template_path, fonts=None):
+        self.layout = TemplateLayout(template_path)
+        self.fonts = dict(fonts or {})
+        self._registered = {}
+
+    def _font(self, typeface, bold, italic):
+        """Retourne (police reportlab, échelle horizontale).
+
+        Sans TTF disponible, Helvetica est utilisée, resserrée pour les polices condensées.
+        """
+        key = (typeface, bold)
+        if key not in self._registered:
+            regular, bold_path = self.fonts.get(typeface, (None, None))
+            if regular is None:
+                candidate = os.path.join(WINDOWS_FONTS_DIR, typeface.replace(" ", "") + ".ttf")
+                regular = candidate if os.path.exists(candidate) else None
+            path = bold_path if bold and bold_path else regular
+            name = None
+            if path and os.path.exists(path):
+                name = f"{typeface}-{'Bold' if bold else 'Regular'}"
+                try:
+                    pdfmetrics.registerFont(TTFont(name, path))
+                except Exception as e:
+                    logging.warning(f"Cannot register font {path}: {e}")
+                    name = None
+            self._registered[key] = name
+        name = self._registered[key]
+        if name:
+            return name, 1.0
+        scale = CONDENSED_SCALE if any(w in typeface for w in ("Condensed", "Narrow")) else 1.0
+        bold = bold or any(w in typeface for w in ("Bold", "Black", "Heavy"))
+        if bold and italic:
+            return "Helvetica-BoldOblique", scale
+        if bold:
+            return "Helvetica-Bold", scale
+        return ("Helvetica-Oblique" if italic else "Helvetica"), scale
+
+    def _words(self, paragraph, replacements):
+        """Découpe les runs d'un paragraphe en mots (texte, police, taille, couleur)."""
+        words = []
+        for run in paragraph.runs:
+            text = self.layout.engine.pattern.sub(lambda m: str(replacements.get(m.group(0), "")), run.text)
+            if run.caps:
+                text = text.upper()
+            font, scale = self._font(run.font, run.bold, run.italic)
+            pieces = text.split(" ")
+            for index, piece in enumerate(pieces):
+                # Espace après le mot sauf en fin de run (le run suivant continue le mot)
+                words.append((piece, font, scale, run.size, run.color, index < len(pieces) - 1))
+        return words
+
+    def _lines(self, words, max_width):
+        lines, current, width = [], [], 0.0
+        for text, font, scale, size, color, trailing_space in words:
+            space = pdfmetrics.stringWidth(" ", font, size) * scale if trailing_space else 0.0
+            word_width = pdfmetrics.stringWidth(text, font, size) * scale
+            if current and text and width + word_width > max_width:
+                lines.append((current, width))
+                current, width = [], 0.0
+            current.append((text, font, scale, size, color, word_width, space))
+            width += word_width + space
+        if current:
+            lines.append((current, width))
+        return lines
+
+    def _draw_text_box(self, c, box, replacements, layer):
+        left, top, right, bottom = box.insets
+        max_width = box.width - left - right
+        blocks = []
+        for paragraph in box.paragraphs:
+            size = max((run.size for run in paragraph.runs), default=DEFAULT_FONT_SIZE)
+            lines = self._lines(self._words(paragraph, replacements), max_width) if paragraph.runs else []
+            line_height = paragraph.line_height or size * 1.2 * paragraph.line_spacing
+            blocks.append((paragraph, lines or [([], 0.0)], line_height))
+
+        total = sum(len(lines) * height + p.space_after for p, lines, height in blocks)
+        inner = box.height - top - bottom
+        y = box.y + top
+        if box.anchor == "ctr":
+            y += (inner - total) / 2
+        elif box.anchor == "b":
+            y += inner - total
+
+        for paragraph, lines, line_height in blocks:
+            if (layer == "static" and paragraph.dynamic) or (layer == "dynamic" and not paragraph.dynamic):
+                # La hauteur du paragraphe reste réservée pour placer les suivants
+                y += len(lines) * line_height + paragraph.space_after
+                continue
+            for items, width in lines:
+                x = box.x + left
+                if paragraph.align == "ctr":
+                    x += (max_width - width) / 2
+                elif paragraph.align == "r":
+                    x += max_width - width
+                baseline = self.layout.page_height - (y + line_height * 0.8)
+                for text, font, scale, size, color, word_width, space in items:
+                    text_object = c.beginText(x, baseline)
+                    text_object.setFont(font, size)
+                    text_object.setHorizScale(scale * 100)
+                    text_object.setFillColor(f"#{color}")
+                    text_object.textOut(text)
+                    c.drawText(text_object)
+                    x += word_width + space
+                y += line_height
+            y += paragraph.space_after
+
+    def render(self, replacements, pdf_path, layer="all"):
+        """Dessine le certificat dans `pdf_path` (chemin ou fichier binaire).
+
+        `layer` : "all", "static" (fond, images et texte fixe, sans les paragraphes
+        à balises) ou "dynamic" (uniquement les paragraphes à balises, fond transparent).
+        """
+        layout = self.layout
+        c = canvas.Canvas(pdf_path, pagesize=(layout.page_width, layout.page_height))
+        if layer != "dynamic":
+            c.setFillColor(f"#{layout.background}")
+            c.rect(0, 0, layout.page_width, layout.page_height, stroke=0, fill=1)
+
+            for image in layout.images:
+                c.drawImage(image.image, image.x, layout.page_height - image.y - image.height,
+                            image.width, image.height, mask="auto")
+            for line in layout.lines:
+                c.setStrokeColor(f"#{line.color}")
+                c.setLineWidth(line.width)
+                c.line(line.x1, layout.page_height - line.y1, line.x2, layout.page_height - line.y2)
+
+        for box in layout.text_boxes:
+            self._draw_text_box(c, box, replacements, layer)
+
+        c.showPage()
+        c.save()
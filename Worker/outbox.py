@@ -0,0 +1,349 @@
+"""Outbox durable des mails de certificats (SQLite dans le dossier de sortie).
+
+Usage :
+    python -m Worker.outbox list <dossier de sortie>
+    python -m Worker.outbox replay <dossier de sortie> [--run RUN_ID] [--concurrency 2] [--rate 0]
+
+Le worker n'envoie plus les mails directement : il les inscrit dans l'outbox,
+puis un thread de vidage (`OutboxDrain`) les confie par lots au dispatcher.
+Une entrée est marquée "sending" avant l'envoi et "sent" seulement après :
+un run interrompu laisse ses entrées en "pending"/"sending", renvoyées au
+run suivant ou par `replay` (au moins une fois). La clé d'idempotence
+(destinataire, sujet, modèle, paramètres et SHA-256 du PDF) empêche
+d'inscrire deux fois le même certificat : un mail déjà envoyé ne repart pas.
+`replay` renvoie les échecs d'un run à partir des PDF existants, sans les régénérer.
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+from Worker.excel_cache import file_hash
+from Worker.dispatcher import MailDispatcher, MailRequest
+
+
+OUTBOX_NAME = "certificates_outbox.sqlite"
+
+# Étapes d'une entrée de l'outbox
+OUTBOX_STATES = ("pending", "sending", "sent", "failed")
+
+COLUMNS = ("id", "idempotency_key", "run_id", "recipient", "cc", "subject", "template_id", "params",
+           "attachment", "context", "state", "attempts", "last_error", "created_at", "updated_at", "sent_at")
+
+
+def new_run_id():
+    return datetime.now().strftime("%Y%m%d-%H%M%S-") + os.urandom(2).hex()
+
+
+def idempotency_key(recipient, subject, template_id, params, attachment):
+    digest = file_hash(attachment) if attachment and os.path.exists(attachment) else ""
+    payload = json.dumps([recipient, subject, template_id, params, digest], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class Outbox:
+    """File de mails persistante, partagée entre threads (verrou) et process (transactions SQLite)."""
+
+    def __init__(self, output_folder, filename=OUTBOX_NAME):
+        self.path = os.path.join(output_folder, filename)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                run_id TEXT NOT NULL,
+                recipient TEXT NOT NULL,
+                cc TEXT,
+                subject TEXT NOT NULL,
+                template_id TEXT NOT NULL,
+                params TEXT NOT NULL,
+                attachment TEXT,
+                context TEXT,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                sent_at TEXT
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_run_state ON outbox (run_id, state)")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def _entry(row):
+        entry = dict(zip(COLUMNS, row))
+        entry["params"] = json.loads(entry["params"])
+        entry["context"] = json.loads(entry["context"]) if entry["context"] else None
+        return entry
+
+    def enqueue(self, run_id, recipient, subject, template_id, params, attachment, cc=None, context=None):
+        """Inscrit un mail. Retourne "queued", "sent" (déjà envoyé) ou "duplicate" (déjà en file pour ce run).
+
+        Une entrée existante en échec, ou laissée en file par un autre run (interrompu),
+        est rattachée à `run_id` et remise en attente.
+        """
+        key = idempotency_key(recipient, subject, template_id, params, attachment)
+        now = _now()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO outbox (idempotency_key, run_id, recipient, cc, subject, template_id, params, "
+                "attachment, context, state, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?) "
+                "ON CONFLICT (idempotency_key) DO UPDATE SET run_id = excluded.run_id, state = 'pending', "
+                "context = excluded.context, updated_at = excluded.updated_at "
+                "WHERE state = 'failed' OR (state != 'sent' AND run_id != excluded.run_id)",
+                (key, run_id, recipient, cc, subject, template_id, json.dumps(params, sort_keys=True),
+                 attachment, json.dumps(context) if context is not None else None, now, now)
+            )
+            if self._db.execute("SELECT changes()").fetchone()[0]:
+                return "queued"
+            state = self._db.execute("SELECT state FROM outbox WHERE idempotency_key = ?", (key,)).fetchone()[0]
+        return "sent" if state == "sent" else "duplicate"
+
+    def claim(self, limit, run_id=None):
+        """Réserve (état "sending") jusqu'à `limit` entrées en attente, les plus anciennes d'abord."""
+        query = "SELECT * FROM outbox WHERE state = 'pending'" + (" AND run_id = ?" if run_id else "")
+        query += " ORDER BY id LIMIT ?"
+        with self._lock:
+            # Transaction exclusive : deux process ne réservent pas la même entrée
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(query, ((run_id,) if run_id else ()) + (limit,)).fetchall()
+                ids = [row[0] for row in rows]
+                self._db.executemany(
+                    "UPDATE outbox SET state = 'sending', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    [(_now(), entry_id) for entry_id in ids]
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return [self._entry(row) for row in rows]
+
+    def mark_sent(self, entry_id):
+        now = _now()
+        with self._lock:
+            self._db.execute("UPDATE outbox SET state = 'sent', last_error = NULL, updated_at = ?, sent_at = ? "
+                             "WHERE id = ?", (now, now, entry_id))
+
+    def mark_failed(self, entry_id, error):
+        with self._lock:
+            self._db.execute("UPDATE outbox SET state = 'failed', last_error = ?, updated_at = ? WHERE id = ?",
+                             (str(error), _now(), entry_id))
+
+    def requeue(self, run_id=None, states=("failed", "sending")):
+        """Remet en attente les échecs (et les envois interrompus) d'un run, ou de tous. Retourne le nombre."""
+        marks = ", ".join("?" for _ in states)
+        query = f"UPDATE outbox SET state = 'pending', updated_at = ? WHERE state IN ({marks})"
+        params = (_now(),) + tuple(states)
+        if run_id:
+            query += " AND run_id = ?"
+            params += (run_id,)
+        with self._lock:
+            return self._db.execute(query, params).rowcount
+
+    def runs(self):
+        """{run_id: {état: nombre}}, du plus ancien au plus récent."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT run_id, state, COUNT(*) FROM outbox GROUP BY run_id, state ORDER BY MIN(id)"
+            ).fetchall()
+        runs = {}
+        for run_id, state, count in rows:
+            runs.setdefault(run_id, {})[state] = count
+        return runs
+
+    def failures(self, run_id=None):
+        query = "SELECT * FROM outbox WHERE state = 'failed'" + (" AND run_id = ?" if run_id else "") + " ORDER BY id"
+        with self._lock:
+            rows = self._db.execute(query, (run_id,) if run_id else ()).fetchall()
+        return [self._entry(row) for row in rows]
+
+
+class OutboxDrain:
+    """Thread qui vide l'outbox par lots de `batch_size` vers le dispatcher et y reporte le résultat.
+
+    `composer` (MailComposer) reconstruit le squelette de chaque entrée à partir
+    de son modèle ; `on_status` reçoit ensuite les statuts du dispatcher avec,
+    comme contexte de la requête, l'entrée de l'outbox. Avec `close_dispatcher`
+    False (dispatcher partagé), `close()` attend les envois de cette outbox
+    sans arrêter le dispatcher.
+    """
+
+    def __init__(self, outbox, dispatcher, composer, run_id=None, batch_size=20, poll_interval=0.5, on_status=None,
+                 close_dispatcher=True):
+        self.outbox = outbox
+        self.dispatcher = dispatcher
+        self.composer = composer
+        self.run_id = run_id
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.on_status = on_status
+        self.close_dispatcher = close_dispatcher
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        # Envois confiés au dispatcher sans statut final
+        self._in_flight = 0
+        self._idle = threading.Condition()
+
+    def start(self):
+        if self._thread is None:
+            self.dispatcher.start()
+            self._thread = threading.Thread(target=self._run, name="outbox-drain", daemon=True)
+            self._thread.start()
+        return self
+
+    def wake(self):
+        """Signale de nouvelles entrées (évite d'attendre le prochain passage)."""
+        self._wake.set()
+
+    def close(self):
+        """Vide les entrées en attente, attend la fin des envois puis s'arrête."""
+        if self._thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        if self.close_dispatcher:
+            self.dispatcher.close()
+        else:
+            with self._idle:
+                self._idle.wait_for(lambda: self._in_flight == 0)
+
+    def _run(self):
+        while True:
+            try:
+                batch = self.outbox.claim(self.batch_size, self.run_id)
+            except Exception as e:
+                logging.error(f"Outbox read error: {e}")
+                batch = []
+            for entry in batch:
+                self._submit(entry)
+            if batch:
+                continue
+            if self._stopping.is_set():
+                break
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _submit(self, entry):
+        request = None
+        try:
+            if entry["attachment"] and not os.path.exists(entry["attachment"]):
+                raise FileNotFoundError(f"Attachment not found: {entry['attachment']}")
+            skeleton = self.composer.skeleton(entry["template_id"], entry["params"], entry["cc"])
+            request = MailRequest(entry["recipient"], entry["subject"], skeleton, entry["attachment"], entry)
+        except Exception as e:
+            self.outbox.mark_failed(entry["id"], e)
+            self._forward(MailRequest(entry["recipient"], entry["subject"], None, entry["attachment"], entry),
+                          "failed", 0, e, None)
+            return
+        with self._idle:
+            self._in_flight += 1
+        self.dispatcher.submit(request, self._status)
+
+    def _status(self, request, status, attempt, error=None, delay=None):
+        entry = request.context
+        try:
+            if status == "sent":
+                self.outbox.mark_sent(entry["id"])
+            elif status == "failed":
+                self.outbox.mark_failed(entry["id"], error)
+            self._forward(request, status, attempt, error, delay)
+        finally:
+            if status in ("sent", "failed"):
+                with self._idle:
+                    self._in_flight -= 1
+                    self._idle.notify_all()
+
+    def _forward(self, request, status, attempt, error, delay):
+        if self.on_status is not None:
+            self.on_status(request, status, attempt, error, delay)
+
+
+def replay(output_folder, run_id=None, concurrency=2, rate_per_minute=None, transport=None):
+    """Renvoie les mails en échec (ou interrompus) d'un run, ou de tous les runs, avec les PDF existants.
+
+    Retourne (envoyés, échecs).
+    """
+    from Worker.mail import MailComposer
+    from Worker.manifest import MANIFEST_NAME, RunManifest
+    from Worker.transports import transport_from_env
+
+    outbox = Outbox(output_folder)
+    manifest_path = os.path.join(output_folder, MANIFEST_NAME)
+    manifest = RunManifest(output_folder) if os.path.exists(manifest_path) else None
+    transport = transport or transport_from_env()
+    requeued = outbox.requeue(run_id)
+    logging.info(f"Outbox replay in {output_folder} (run {run_id or 'all'}): {requeued} mails requeued")
+
+    def status(request, state, attempt, error, delay):
+        entry = request.context
+        if state == "sent" and manifest is not None and entry.get("context"):
+            manifest.mark_mailed(entry["context"]["manifest_key"])
+        if state in ("sent", "failed"):
+            print(f"{state:>6}  {entry['recipient']}" + (f"  ({error})" if error else ""))
+
+    dispatcher = MailDispatcher(transport, concurrency, rate_per_minute)
+    drain = OutboxDrain(outbox, dispatcher, MailComposer(), run_id, on_status=status)
+    try:
+        drain.start()
+        drain.close()
+    finally:
+        transport.close()
+        if manifest is not None:
+            manifest.close()
+        outbox.close()
+    return dispatcher.sent, dispatcher.failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or replay the certificate mail outbox.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list")
+    list_parser.add_argument("output_folder")
+    replay_parser = commands.add_parser("replay", help="resend failed mails without regenerating PDFs")
+    replay_parser.add_argument("output_folder")
+    replay_parser.add_argument("--run", help="run id (all runs if omitted)")
+    replay_parser.add_argument("--concurrency", type=int, default=2)
+    replay_parser.add_argument("--rate", type=float, default=0, help="messages per minute (0 = unlimited)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(os.path.join(args.output_folder, OUTBOX_NAME)):
+        print(f"No outbox in {args.output_folder}")
+        return 1
+
+    if args.command == "list":
+        outbox = Outbox(args.output_folder)
+        for run_id, counts in outbox.runs().items():
+            print(f"{run_id}  " + ", ".join(f"{state} {counts.get(state, 0)}" for state in OUTBOX_STATES))
+        for entry in outbox.failures():
+            print(f"  failed  {entry['run_id']}  {entry['recipient']}: {entry['last_error']}")
+        outbox.close()
+        return 0
+
+    started = time.perf_counter()
+    sent, failed = replay(args.output_folder, args.run, args.concurrency, args.rate or None)
+    print(f"{sent} sent, {failed} failed in {time.perf_counter() - started:.1f}s")
+    return 0 if not failed else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
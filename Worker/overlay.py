@@ -0,0 +1,79 @@
+import io
+import os
+import logging
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject
+
+from Worker.template import CompiledTemplate
+from Worker.native_renderer import NativeRenderer
+
+
+class OverlayStamper:
+    """Certificats produits par tamponnage d'un calque texte sur un fond pré-rendu.
+
+    Le fond (logo, cadres, signatures, texte fixe) est rendu une seule fois par
+    run, paragraphes à balises vidés. Chaque certificat ne dessine que ces
+    paragraphes (nom, SSO, dates, titre) et les superpose à la page de fond.
+    """
+
+    def __init__(self, template_path, background_pdf, fonts=None):
+        self.renderer = NativeRenderer(template_path, fonts)
+        with open(background_pdf, "rb") as f:
+            self.background = PdfReader(io.BytesIO(f.read())).pages[0]
+
+        # Le calque est dessiné à la taille de la slide ; mise à l'échelle si le fond diffère
+        layout = self.renderer.layout
+        box = self.background.mediabox
+        self.matrix = ArrayObject(FloatObject(v) for v in (
+            float(box.width) / layout.page_width, 0, 0, float(box.height) / layout.page_height,
+            float(box.left), float(box.bottom)
+        ))
+
+    @classmethod
+    def from_template(cls, template_path, work_folder, converter=None, fonts=None):
+        """Rend le fond une fois : via `converter` (PowerPoint) si fourni, sinon en natif."""
+        background_pdf = os.path.join(work_folder, "background.pdf")
+        if converter is not None:
+            converter.convert_bytes(CompiledTemplate(template_path).render_blank(), background_pdf)
+        else:
+            NativeRenderer(template_path, fonts).render({}, background_pdf, layer="static")
+        logging.info(f"Certificate background rendered: {background_pdf}")
+        return cls(template_path, background_pdf, fonts)
+
+    def render(self, replacements, pdf_path):
+        overlay = io.BytesIO()
+        self.renderer.render(replacements, overlay, layer="dynamic")
+        overlay_page = PdfReader(overlay).pages[0]
+
+        writer = PdfWriter()
+        page = writer.add_page(self.background)
+
+        # Le calque devient un Form XObject : le contenu du fond n'est ni relu ni réécrit,
+        # et ses noms de ressources (polices, images) ne peuvent pas entrer en conflit.
+        form = DecodedStreamObject()
+        form.set_data(overlay_page.get_contents().get_data())
+        form.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Form"),
+            NameObject("/BBox"): ArrayObject(FloatObject(v) for v in overlay_page.mediabox),
+            NameObject("/Matrix"): self.matrix,
+            NameObject("/Resources"): overlay_page["/Resources"].clone(writer),
+        })
+        form_ref = writer._add_object(form)
+
+        resources = page.setdefault(NameObject("/Resources"), DictionaryObject())
+        xobjects = resources.setdefault(NameObject("/XObject"), DictionaryObject())
+        xobjects.get_object()[NameObject("/CertOverlay")] = form_ref
+
+        before, after = DecodedStreamObject(), DecodedStreamObject()
+        before.set_data(b"q\n")
+        after.set_data(b"Q\nq /CertOverlay Do Q\n")
+        contents = page.raw_get("/Contents") if "/Contents" in page else ArrayObject()
+        streams = list(contents.get_object()) if isinstance(contents.get_object(), ArrayObject) else [contents]
+        page[NameObject("/Contents")] = ArrayObject(
+            [writer._add_object(before)] + streams + [writer._add_object(after)]
+        )
+
+        with open(pdf_path, "wb") as f:
+            writer.write(f)
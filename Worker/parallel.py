@@ -0,0 +1,146 @@
+import logging
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+
+from Worker.generation import CertificateGenerator
+from Worker.metrics import RunMetrics
+
+
+# Générateurs propres à chaque process du pool, un par modèle, avec une seule session de conversion
+_settings = None
+_generators = {}
+_init_error = None
+# Durées mesurées dans le process, renvoyées avec chaque tranche au process principal
+_metrics = RunMetrics(keep_samples=True)
+
+
+def _open_generator(template_path):
+    converter = next(iter(_generators.values())).converter if _generators else None
+    settings = dict(_settings, template_path=template_path)
+    if converter is not None:
+        settings["converter"] = converter
+    generator = CertificateGenerator(**settings).open()
+    generator.metrics = _metrics
+    # Fermeture de la session PowerPoint à l'arrêt du process
+    Finalize(generator, generator.close, exitpriority=10)
+    _generators[template_path] = generator
+    return generator
+
+
+def _init_worker(settings):
+    global _settings, _init_error
+    _settings = settings
+    try:
+        _open_generator(settings["template_path"])
+    except Exception as e:
+        _init_error = e
+
+
+def _generate_chunk(jobs, template_path=None):
+    if _init_error is not None:
+        raise _init_error
+    template_path = template_path or _settings["template_path"]
+    # Mode batch : un autre modèle est chargé une fois par process puis réutilisé
+    generator = _generators.get(template_path) or _open_generator(template_path)
+    return list(generator.generate_all(jobs)), _metrics.drain()
+
+
+def _generate_tagged(task):
+    key, template_path, jobs = task
+    return (key,) + _generate_chunk(jobs, template_path)
+
+
+# Taille maximale des tranches hors mode batch
+MAX_CHUNK_SIZE = 10
+
+
+def default_chunk_size(job_count, workers, batch_size=1):
+    if batch_size > 1:
+        return batch_size
+    # Petites tranches pour garder une progression régulière et équilibrer la charge
+    return max(1, min(MAX_CHUNK_SIZE, job_count // (workers * 4)))
+
+
+def generate_parallel(jobs, settings, workers, chunk_size=None, metrics=None, passthrough=None, max_pending=None):
+    """Répartit les jobs sur un pool de `workers` process et produit les JobResult dans l'ordre des jobs.
+
+    `jobs` peut être un itérateur (lecture en flux) : il est lu par tranches au
+    fil de la génération, avec au plus `max_pending` tranches soumises au pool
+    et pas encore rendues (deux par process par défaut).
+    `settings` : arguments de CertificateGenerator (doivent être picklables).
+    `metrics` : RunMetrics qui reçoit les durées mesurées dans les process.
+    `passthrough(job)` : JobResult d'un job à ne pas générer (ex. repris), produit dès sa lecture, ou None.
+    """
+    jobs = iter(jobs)
+    max_pending = max_pending or workers * 2
+    # Taille des tranches d'après les premiers jobs : le fichier entier s'il est petit, tranches maximales sinon
+    head = list(itertools.islice(jobs, workers * 4 * MAX_CHUNK_SIZE))
+    chunk_size = chunk_size or default_chunk_size(len(head), workers, settings.get("batch_size", 1))
+
+    pool = None
+    pending = deque()
+    certificates = chunks = 0
+
+    def submit(chunk):
+        nonlocal pool, certificates, chunks
+        # Pool démarré à la première tranche : aucun process si tous les jobs sont repris
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(settings,))
+        pending.append(pool.submit(_generate_chunk, chunk))
+        certificates += len(chunk)
+        chunks += 1
+
+    def collect():
+        results, samples = pending.popleft().result()
+        if metrics is not None:
+            metrics.merge(samples)
+        return results
+
+    try:
+        chunk = []
+        for job in itertools.chain(head, jobs):
+            result = passthrough(job) if passthrough is not None else None
+            if result is not None:
+                yield result
+                continue
+            chunk.append(job)
+            if len(chunk) == chunk_size:
+                submit(chunk)
+                chunk = []
+                if len(pending) >= max_pending:
+                    yield from collect()
+        if chunk:
+            submit(chunk)
+        while pending:
+            yield from collect()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    if chunks:
+        logging.info(f"Parallel generation: {certificates} certificates, {chunks} chunks, {workers} processes")
+
+
+def generate_tagged(tasks, settings, workers, chunk_size=None, metrics=None):
+    """Un seul pool pour des jobs de plusieurs modèles (mode batch) : produit (clé, JobResult) dans l'ordre.
+
+    `tasks` : liste de (clé, chemin du modèle, jobs). Les tranches sont soumises
+    dans l'ordre des tâches ; chaque process charge un modèle à sa première
+    tranche et garde une seule session de conversion pour tous.
+    """
+    job_count = sum(len(jobs) for _, _, jobs in tasks)
+    if not job_count:
+        return
+    chunk_size = chunk_size or default_chunk_size(job_count, workers, settings.get("batch_size", 1))
+    chunks = [(key, template_path, jobs[start:start + chunk_size])
+              for key, template_path, jobs in tasks for start in range(0, len(jobs), chunk_size)]
+    logging.info(f"Parallel generation: {job_count} certificates from {len(tasks)} campaigns, {len(chunks)} chunks, "
+                 f"{workers} processes")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(settings,)) as pool:
+        for key, results, samples in pool.map(_generate_tagged, chunks):
+            if metrics is not None:
+                metrics.merge(samples)
+            for result in results:
+                yield key, result
@@ -0,0 +1,106 @@
+"""Comparaison d'un certificat généré avec un PDF de référence (ex. ceux de sortie/).
+
+Usage :
+    python -m Worker.pdf_compare <pdf ou dossier généré> <pdf ou dossier de référence>
+
+Deux mesures :
+- texte : similarité des mots extraits (ignorée si la référence n'a pas de couche texte) ;
+- pixels : écart moyen entre les deux pages rendues en niveaux de gris (PyMuPDF requis).
+
+Sans aucune des deux mesures (référence sans texte et PyMuPDF absent), la
+comparaison n'est pas mesurée ("N/A") et compte comme un échec.
+"""
+import os
+import re
+import sys
+import argparse
+from collections import Counter
+
+from pypdf import PdfReader
+
+
+def extract_words(pdf_path):
+    words = []
+    for page in PdfReader(pdf_path).pages:
+        words.extend(re.findall(r"\w+", (page.extract_text() or "").lower()))
+    return words
+
+
+def text_similarity(pdf_path, reference_path):
+    """Ratio 0..1 de mots communs (ordre ignoré), None si la référence n'a pas de texte extractible."""
+    reference = Counter(extract_words(reference_path))
+    if not reference:
+        return None
+    words = Counter(extract_words(pdf_path))
+    common = sum((words & reference).values())
+    return 2 * common / (sum(words.values()) + sum(reference.values()))
+
+
+def pixel_difference(pdf_path, reference_path, dpi=50):
+    """Écart moyen 0..1 entre les premières pages rendues, None sans PyMuPDF."""
+    try:
+        import pymupdf
+    except ImportError:
+        return None
+
+    def render(path, size=None):
+        page = pymupdf.open(path)[0]
+        if size is None:
+            pixmap = page.get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY)
+        else:
+            matrix = pymupdf.Matrix(size[0] / page.rect.width, size[1] / page.rect.height)
+            pixmap = page.get_pixmap(matrix=matrix, colorspace=pymupdf.csGRAY)
+        return pixmap
+
+    reference = render(reference_path)
+    pixmap = render(pdf_path, (reference.width, reference.height))
+    width, height = min(pixmap.width, reference.width), min(pixmap.height, reference.height)
+    a, b = pixmap.samples, reference.samples
+    total = 0
+    for y in range(height):
+        row_a, row_b = y * pixmap.stride, y * reference.stride
+        total += sum(abs(a[row_a + x] - b[row_b + x]) for x in range(width))
+    return total / (255 * width * height)
+
+
+def compare(pdf_path, reference_path, max_pixel_difference=0.05, min_text_similarity=0.9):
+    text = text_similarity(pdf_path, reference_path)
+    pixels = pixel_difference(pdf_path, reference_path)
+    measured = text is not None or pixels is not None
+    passed = measured and (text is None or text >= min_text_similarity) and (
+        pixels is None or pixels <= max_pixel_difference
+    )
+    return {"pdf": pdf_path, "reference": reference_path, "text": text, "pixels": pixels, "measured": measured,
+            "passed": passed}
+
+
+def _pairs(generated, reference):
+    if os.path.isdir(generated) and os.path.isdir(reference):
+        for name in sorted(os.listdir(reference)):
+            if name.lower().endswith(".pdf") and os.path.exists(os.path.join(generated, name)):
+                yield os.path.join(generated, name), os.path.join(reference, name)
+    else:
+        yield generated, reference
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare generated certificates with reference PDFs.")
+    parser.add_argument("generated")
+    parser.add_argument("reference")
+    parser.add_argument("--max-pixel-difference", type=float, default=0.05)
+    parser.add_argument("--min-text-similarity", type=float, default=0.9)
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for pdf_path, reference_path in _pairs(args.generated, args.reference):
+        result = compare(pdf_path, reference_path, args.max_pixel_difference, args.min_text_similarity)
+        status = "OK  " if result["passed"] else "FAIL" if result["measured"] else "N/A "
+        text = "n/a" if result["text"] is None else f"{result['text']:.3f}"
+        pixels = "n/a" if result["pixels"] is None else f"{result['pixels']:.4f}"
+        print(f"{status} {os.path.basename(pdf_path)}  text={text}  pixels={pixels}")
+        failures += not result["passed"]
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
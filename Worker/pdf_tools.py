@@ -0,0 +1,25 @@
+from pypdf import PdfReader, PdfWriter
+
+
+def split_pdf(pdf_path, output_paths, pages_per_document=1):
+    """Découpe un PDF fusionné en un fichier par participant.
+
+    `output_paths` est dans l'ordre des slides du deck fusionné ; chaque
+    participant occupe `pages_per_document` pages consécutives.
+    Retourne la liste des fichiers écrits.
+    """
+    reader = PdfReader(pdf_path)
+    expected = len(output_paths) * pages_per_document
+    if len(reader.pages) != expected:
+        raise ValueError(f"{pdf_path} has {len(reader.pages)} pages, expected {expected}")
+
+    written = []
+    for index, output_path in enumerate(output_paths):
+        writer = PdfWriter()
+        start = index * pages_per_document
+        for page in reader.pages[start:start + pages_per_document]:
+            writer.add_page(page)
+        with open(output_path, "wb") as f:
+            writer.write(f)
+        written.append(output_path)
+    return written
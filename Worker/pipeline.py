@@ -0,0 +1,141 @@
+import queue
+import logging
+import threading
+
+
+# Marqueur de fin de flux transmis d'une étape à la suivante
+_DONE = object()
+
+
+class Stage:
+    """Une étape du pipeline : `workers` threads qui lisent la file d'entrée (bornée)."""
+
+    def __init__(self, name, handler, workers=1, queue_size=16, thread_init=None, thread_exit=None):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread_init = thread_init
+        self.thread_exit = thread_exit
+        self.processed = 0
+        self.running = 0
+
+
+class Pipeline:
+    """Étapes producteur/consommateur reliées par des files bornées.
+
+    La source (itérable) est consommée dans le thread appelant et alimente la
+    première étape ; chaque étape transmet le résultat de son `handler` à la
+    suivante (None = rien à transmettre). Une file pleine bloque l'étape qui
+    l'alimente (backpressure), donc une étape lente ne fait pas grossir la
+    mémoire. La première erreur d'un handler arrête tout le pipeline et est
+    relevée par `run()`.
+    """
+
+    def __init__(self, poll_interval=0.1):
+        self.stages = []
+        self.poll_interval = poll_interval
+        self.error = None
+        self._aborted = threading.Event()
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, handler, workers=1, queue_size=16, thread_init=None, thread_exit=None):
+        self.stages.append(Stage(name, handler, workers, queue_size, thread_init, thread_exit))
+        return self
+
+    def queue_depths(self):
+        """Nombre d'éléments en attente devant chaque étape (monitoring)."""
+        return {stage.name: stage.queue.qsize() for stage in self.stages}
+
+    def abort(self):
+        self._aborted.set()
+
+    @property
+    def aborted(self):
+        return self._aborted.is_set()
+
+    def run(self, source):
+        if not self.stages:
+            raise ValueError("Pipeline has no stage")
+
+        threads = []
+        for position, stage in enumerate(self.stages):
+            output = self.stages[position + 1] if position + 1 < len(self.stages) else None
+            stage.running = stage.workers
+            for number in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work, args=(stage, output), name=f"{stage.name}-{number + 1}", daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        first = self.stages[0]
+        try:
+            for item in source:
+                if not self._put(first.queue, item):
+                    break
+        except Exception as e:
+            self._fail(first, e)
+        finally:
+            for _ in range(first.workers):
+                self._put(first.queue, _DONE)
+
+        for thread in threads:
+            thread.join()
+
+        if self.error is not None:
+            raise self.error
+
+    def _work(self, stage, output):
+        try:
+            if stage.thread_init:
+                stage.thread_init()
+            while True:
+                item = self._get(stage.queue)
+                if item is _DONE:
+                    break
+                result = stage.handler(item)
+                with self._lock:
+                    stage.processed += 1
+                if output is not None and result is not None:
+                    if not self._put(output.queue, result):
+                        break
+        except Exception as e:
+            self._fail(stage, e)
+        finally:
+            if stage.thread_exit:
+                try:
+                    stage.thread_exit()
+                except Exception as e:
+                    logging.warning(f"Pipeline stage '{stage.name}' cleanup error: {e}")
+            with self._lock:
+                stage.running -= 1
+                last = stage.running == 0
+            # Le dernier thread de l'étape signale la fin du flux à l'étape suivante
+            if last and output is not None:
+                for _ in range(output.workers):
+                    self._put(output.queue, _DONE)
+
+    def _fail(self, stage, error):
+        with self._lock:
+            if self.error is None:
+                self.error = error
+                logging.error(f"Pipeline stage '{stage.name}' failed: {error}")
+        self.abort()
+
+    def _get(self, q):
+        while not self.aborted:
+            try:
+                return q.get(timeout=self.poll_interval)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _put(self, q, item):
+        while not self.aborted:
+            try:
+                q.put(item, timeout=self.poll_interval)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,119 @@
+import re
+from xml.sax.saxutils import escape
+
+
+NS_A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+A_P = f"{{{NS_A}}}p"
+A_R = f"{{{NS_A}}}r"
+A_T = f"{{{NS_A}}}t"
+
+# Toute balise de la forme {{...}}, connue ou non (pour signaler les balises inconnues du modèle)
+TOKEN_PATTERN = re.compile(r"\{\{[A-Za-z0-9_ ]+\}\}")
+
+
+class PlaceholderEngine:
+    """Remplacement des balises en une seule passe, avec un motif compilé pour toutes les balises.
+
+    PowerPoint découpe parfois une balise en plusieurs runs (`{{NO` + `M}}`) ;
+    `merge_runs` regroupe les fragments dans le premier run (dont la mise en
+    forme est conservée) avant le remplacement. Le travail se fait sur les
+    éléments `a:p` du XML, donc aussi dans les tableaux, les groupes et les notes.
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tuple(tokens)
+        # Balises les plus longues d'abord (une balise préfixe d'une autre ne doit pas gagner)
+        alternatives = sorted(self.tokens, key=len, reverse=True)
+        self.pattern = re.compile("|".join(re.escape(token) for token in alternatives)) if alternatives else None
+
+    def merge_runs(self, paragraph):
+        """Réunit dans un seul run chaque balise répartie sur plusieurs runs consécutifs.
+
+        Retourne (balises trouvées dans le paragraphe, nombre de balises réunies).
+        """
+        found, merged = [], 0
+        for group in self._run_groups(paragraph):
+            texts = [t.text or "" for _, t in group]
+            matches = list(TOKEN_PATTERN.finditer("".join(texts)))
+            found.extend(match.group(0) for match in matches)
+
+            offsets, lengths, position = [], [len(text) for text in texts], 0
+            for length in lengths:
+                offsets.append(position)
+                position += length
+
+            emptied = set()
+            # De la dernière à la première : les positions des balises précédentes restent valables
+            for match in reversed(matches):
+                first = self._run_at(offsets, lengths, match.start())
+                last = self._run_at(offsets, lengths, match.end() - 1)
+                if first == last:
+                    continue
+                merged += 1
+                texts[first] = texts[first][:match.start() - offsets[first]] + match.group(0)
+                for index in range(first + 1, last):
+                    texts[index] = ""
+                    emptied.add(index)
+                texts[last] = texts[last][match.end() - offsets[last]:]
+                if not texts[last]:
+                    emptied.add(last)
+
+            if emptied or merged:
+                for index, (run, t) in enumerate(group):
+                    if index in emptied and not texts[index]:
+                        paragraph.remove(run)
+                    else:
+                        t.text = texts[index]
+        return found, merged
+
+    def substitute(self, paragraph, replacements):
+        self.merge_runs(paragraph)
+        for run in paragraph.iterchildren(A_R):
+            t = run.find(A_T)
+            if t is not None and t.text and self.pattern is not None:
+                t.text = self.pattern.sub(lambda m: str(replacements.get(m.group(0), "")), t.text)
+
+    def substitute_element(self, root, replacements):
+        """Remplace les balises dans tous les paragraphes sous `root` (slide, notes, forme...)."""
+        for paragraph in list(root.iter(A_P)):
+            self.substitute(paragraph, replacements)
+
+    def normalize_element(self, root):
+        """Réunit les balises découpées sous `root`. Retourne (balises trouvées, nombre de balises réunies)."""
+        found, merged = [], 0
+        for paragraph in list(root.iter(A_P)):
+            tokens, count = self.merge_runs(paragraph)
+            found.extend(tokens)
+            merged += count
+        return found, merged
+
+    def fill(self, xml, replacements):
+        """Remplacement direct dans le XML d'une partie déjà normalisée (valeurs échappées pour XML)."""
+        if self.pattern is None:
+            return xml
+        return self.pattern.sub(lambda m: escape(str(replacements.get(m.group(0), ""))), xml)
+
+    @staticmethod
+    def _run_groups(paragraph):
+        """Suites de runs consécutifs (un saut de ligne ou un champ interrompt une balise)."""
+        groups, current = [], []
+        for child in paragraph:
+            if child.tag == A_R:
+                t = child.find(A_T)
+                if t is not None:
+                    current.append((child, t))
+                    continue
+            if current:
+                groups.append(current)
+                current = []
+        if current:
+            groups.append(current)
+        return groups
+
+    @staticmethod
+    def _run_at(offsets, lengths, position):
+        """Index du run qui contient le caractère `position` du texte du groupe."""
+        for index, (offset, length) in enumerate(zip(offsets, lengths)):
+            if offset <= position < offset + length:
+                return index
+        return len(offsets) - 1
@@ -0,0 +1,270 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import warnings
+import tracemalloc
+from collections import namedtuple
+
+import pandas as pd
+
+
+# Colonnes de l'export Forms utilisées par le worker
+COL_DATE, COL_NAME, COL_SCORE, COL_SSO, COL_EMAIL = 0, 1, 3, 7, 8
+USED_COLUMNS = (COL_DATE, COL_NAME, COL_SCORE, COL_SSO, COL_EMAIL)
+
+# Ligne 1 : en-têtes de l'export, ligne 2 : en-tête lu par pandas (skiprows=1) -> données à partir de la ligne 3
+FIRST_DATA_ROW = 3
+
+# Variante du cache Excel contenant le roster typé (à changer si parse_roster évolue)
+ROSTER_CACHE_VARIANT = "roster-v2"
+
+# Participant éligible (row : index de la ligne dans le DataFrame, ligne Excel = row + 2)
+Participant = namedtuple("Participant", ["row", "nom", "sso", "email", "date_formation", "formation_date", "score"])
+
+# Ligne écartée : reason parmi REJECT_REASONS, message journalisé au niveau `level`
+RejectedRow = namedtuple("RejectedRow", ["row", "nom", "reason", "level", "message"])
+
+REJECT_REASONS = ("invalid_date", "out_of_period", "invalid_score", "score_below_min")
+
+
+def parse_dates(column):
+    """Dates de formation (NaT si illisibles), en quelques opérations sur la colonne.
+
+    Le format est déduit de la colonne ; seules les valeurs qui ne le suivent pas
+    sont relues une par une.
+    """
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column
+    with warnings.catch_warnings():
+        # Format non déductible (petit bloc, formats mélangés) : les valeurs sont relues ci-dessous
+        warnings.simplefilter("ignore", UserWarning)
+        dates = pd.to_datetime(column, errors="coerce")
+    retry = dates.isna() & column.notna()
+    if retry.any():
+        dates[retry] = pd.to_datetime(column[retry].astype(str), errors="coerce", format="mixed")
+    return dates
+
+
+def _sso_text(value):
+    if pd.isna(value):
+        return ""
+    return str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+
+
+def normalize_sso(column):
+    """SSO en texte : vide si absent, sans '.0' pour les identifiants lus comme des nombres."""
+    if pd.api.types.is_float_dtype(column):
+        text = column.astype(object).where(column.notna(), "").astype(str)
+        whole = column.notna() & (column % 1 == 0)
+        text[whole] = column[whole].astype("int64").astype(str)
+        return text
+    return column.map(_sso_text)
+
+
+def parse_roster(df):
+    """Colonnes utiles d'un export (ou d'un bloc) converties en types : date, nom, score, sso, email.
+
+    Date illisible -> NaT, score illisible -> NaN ; l'index (numéro de ligne) est conservé.
+    C'est cette forme typée qui est mise en cache (voir Worker/excel_cache.py).
+    """
+    emails = df.iloc[:, COL_EMAIL]
+    return pd.DataFrame({
+        "date": parse_dates(df.iloc[:, COL_DATE]),
+        "nom": df.iloc[:, COL_NAME].astype(str),
+        "score": pd.to_numeric(df.iloc[:, COL_SCORE], errors="coerce").astype(float),
+        "sso": normalize_sso(df.iloc[:, COL_SSO]),
+        "email": emails.astype(object).where(emails.notna(), "").astype(str),
+    }, index=df.index)
+
+
+def select_participants(roster, score_min=80, date_start=None, date_end=None):
+    """Sépare les participants éligibles des lignes écartées d'un roster typé, sans boucle sur les lignes.
+
+    Les critères sont appliqués dans l'ordre historique du worker : date lisible,
+    date dans la période, score lisible, score minimum. Retourne
+    (liste de Participant, liste de RejectedRow), chacune dans l'ordre du fichier.
+    """
+    dates, scores, names = roster["date"], roster["score"], roster["nom"]
+    days = dates.dt.normalize()
+    # Ligne citée dans les messages : index + 2, ou colonne "line" fournie par le roster (historique multi-exports)
+    lines = roster["line"] if "line" in roster else pd.Series(roster.index + 2, index=roster.index)
+
+    invalid_date = dates.isna()
+    out_of_period = pd.Series(False, index=roster.index)
+    if date_start:
+        out_of_period |= days < pd.Timestamp(date_start)
+    if date_end:
+        out_of_period |= days > pd.Timestamp(date_end)
+    out_of_period &= ~invalid_date
+    remaining = ~invalid_date & ~out_of_period
+    invalid_score = remaining & scores.isna()
+    below_min = remaining & ~invalid_score & (scores < score_min)
+    eligible = remaining & ~invalid_score & ~below_min
+
+    rejected = []
+    for reason, mask, level, template in (
+        ("invalid_date", invalid_date, logging.WARNING, "Row {row}: invalid training date, certificate ignored."),
+        ("out_of_period", out_of_period, logging.DEBUG, "Row {row}: training date {day} outside the selected period."),
+        ("invalid_score", invalid_score, logging.WARNING, "Row {row}: invalid score, certificate ignored."),
+        ("score_below_min", below_min, logging.INFO, "{nom} not certified (score {score} < {score_min})"),
+    ):
+        for index, line, nom, day, score in zip(roster.index[mask.to_numpy()], lines[mask], names[mask],
+                                                days[mask].dt.date, scores[mask]):
+            message = template.format(row=line, nom=nom, day=day, score=score, score_min=score_min)
+            rejected.append(RejectedRow(index, nom, reason, level, message))
+    rejected.sort(key=lambda r: r.row)
+
+    selected = roster[eligible]
+    participants = [
+        Participant(*values) for values in zip(
+            selected.index,
+            selected["nom"],
+            selected["sso"],
+            selected["email"],
+            selected["date"].dt.strftime("%d/%m/%Y"),
+            selected["date"].dt.date,
+            selected["score"],
+        )
+    ]
+    return participants, rejected
+
+
+def filter_roster(df, score_min=80, date_start=None, date_end=None):
+    """Participants éligibles et lignes écartées d'un export brut (voir select_participants)."""
+    return select_participants(parse_roster(df), score_min, date_start, date_end)
+
+
+class RosterReader:
+    """Lecture en flux d'un export Excel, par blocs typés (parse_roster) de `chunk_size` lignes.
+
+    Les .xlsx sont lus avec openpyxl en lecture seule : seules les colonnes
+    utilisées par le worker (USED_COLUMNS) sont conservées, les lignes gardent
+    l'index de `pd.read_excel(path, skiprows=1)`, donc la mémoire reste stable
+    quelle que soit la taille du fichier et le filtrage commence dès le premier
+    bloc. Les autres formats sont lus d'un bloc avec pandas.
+
+    Avec un `cache` (ExcelCache), un fichier déjà lu et inchangé est relu depuis
+    le cache, et le roster typé est mis en cache à la fin d'une lecture complète.
+    """
+
+    def __init__(self, excel_path, chunk_size=500, cache=None):
+        self.excel_path = excel_path
+        self.chunk_size = chunk_size
+        self.cache = cache
+        # Nombre de lignes annoncé par le classeur (None si inconnu avant la fin de la lecture)
+        self.total_rows = None
+        self.rows_read = 0
+        self.from_cache = False
+
+    def __iter__(self):
+        if self.cache is not None:
+            roster = self.cache.get(self.excel_path, ROSTER_CACHE_VARIANT)
+            if roster is not None:
+                self.from_cache = True
+                self.total_rows = self.rows_read = len(roster)
+                for start in range(0, len(roster), self.chunk_size):
+                    yield roster.iloc[start:start + self.chunk_size]
+                return
+
+        parsed = []
+        for chunk in self._read_chunks():
+            roster = parse_roster(chunk)
+            if self.cache is not None:
+                parsed.append(roster)
+            yield roster
+        if self.cache is not None:
+            roster = pd.concat(parsed) if parsed else parse_roster(self._frame([]))
+            self.cache.put(self.excel_path, ROSTER_CACHE_VARIANT, roster)
+
+    def _read_chunks(self):
+        if os.path.splitext(self.excel_path)[1].lower() not in (".xlsx", ".xlsm"):
+            df = pd.read_excel(self.excel_path, skiprows=1)
+            self.total_rows = self.rows_read = len(df)
+            yield df
+            return
+
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(self.excel_path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            if sheet.max_row:
+                self.total_rows = max(0, sheet.max_row - FIRST_DATA_ROW + 1)
+            width = COL_EMAIL + 1
+            rows, blank_rows = [], 0
+            for values in sheet.iter_rows(min_row=FIRST_DATA_ROW, max_col=width, values_only=True):
+                values = tuple(values) + (None,) * (width - len(values))
+                if all(value is None for value in values):
+                    # Lignes vides conservées seulement si des données suivent (comme pandas)
+                    blank_rows += 1
+                    continue
+                if blank_rows:
+                    rows.extend([(None,) * width] * blank_rows)
+                    blank_rows = 0
+                rows.append(values)
+                if len(rows) >= self.chunk_size:
+                    yield self._frame(rows)
+                    rows = []
+            if rows:
+                yield self._frame(rows)
+        finally:
+            workbook.close()
+        self.total_rows = self.rows_read
+
+    def _frame(self, rows):
+        start = self.rows_read
+        self.rows_read += len(rows)
+        columns = {
+            position: [row[position] for row in rows] if position in USED_COLUMNS else [None] * len(rows)
+            for position in range(COL_EMAIL + 1)
+        }
+        # Noms en objets, cellule vide -> NaN, comme la colonne entière lue par pandas : un bloc où ils sont tous
+        # numériques (ligne de total) ou vides ne doit pas devenir float ("84.0") ni donner "None"
+        index = pd.RangeIndex(start, self.rows_read)
+        columns[COL_NAME] = pd.Series([float("nan") if value is None else value for value in columns[COL_NAME]],
+                                      index=index, dtype=object)
+        return pd.DataFrame(columns, index=index)
+
+
+def main(argv=None):
+    """Mesure de la lecture en flux : délai avant le premier participant éligible, durée totale, pic mémoire."""
+    parser = argparse.ArgumentParser(description="Measure streaming roster ingestion.")
+    parser.add_argument("excel")
+    parser.add_argument("--score-min", type=float, default=80)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--trace-memory", action="store_true", help="measure peak memory (much slower)")
+    parser.add_argument("--cache", action="store_true", help="read through the parsed Excel cache")
+    args = parser.parse_args(argv)
+
+    if args.trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    first = None
+    eligible = rejected = 0
+    cache = None
+    if args.cache:
+        from Worker.excel_cache import ExcelCache
+        cache = ExcelCache()
+    reader = RosterReader(args.excel, args.chunk_size, cache)
+    for chunk in reader:
+        participants, rows = select_participants(chunk, args.score_min)
+        if participants and first is None:
+            first = time.perf_counter() - started
+        eligible += len(participants)
+        rejected += len(rows)
+    total = time.perf_counter() - started
+
+    first_text = "n/a" if first is None else f"{first:.3f}s"
+    print(f"{reader.rows_read} rows, {eligible} eligible, {rejected} rejected"
+          + (" (from cache)" if reader.from_cache else ""))
+    print(f"first eligible participant after {first_text}, total {total:.3f}s")
+    if args.trace_memory:
+        print(f"peak memory {tracemalloc.get_traced_memory()[1] / 1e6:.1f} MB")
+        tracemalloc.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+import io
+import re
+import logging
+import zipfile
+import posixpath
+from collections import namedtuple
+
+from lxml import etree
+from pptx import Presentation
+
+from Worker.placeholders import A_P, A_R, A_T, TOKEN_PATTERN, PlaceholderEngine
+
+
+PLACEHOLDERS = ("{{NOM}}", "{{SSO}}", "{{FORMATION}}", "{{DATE_FORMATION}}", "{{DATE_EDITION}}")
+
+CONTENT_TYPES = "[Content_Types].xml"
+PRESENTATION = "ppt/presentation.xml"
+PRESENTATION_RELS = "ppt/_rels/presentation.xml.rels"
+SLIDE_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/slide"
+NOTES_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/notesSlide"
+SLIDE_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.slide+xml"
+
+# Emplacement exact d'une balise dans le modèle
+# (paragraph_index : rang du paragraphe dans la partie, tableaux et groupes compris)
+PlaceholderLocation = namedtuple(
+    "PlaceholderLocation",
+    ["token", "part_name", "slide_index", "paragraph_index", "run_index"]
+)
+
+
+def rels_path(part_name):
+    folder, name = posixpath.split(part_name)
+    return posixpath.join(folder, "_rels", name + ".rels")
+
+
+def _relationship_pattern(rel_type):
+    return re.compile(r'<Relationship\b[^>]*\bType="' + re.escape(rel_type) + r'"[^>]*/>')
+
+
+class CompiledTemplate:
+    """Modèle PPTX chargé une seule fois par run.
+
+    Le modèle est analysé au chargement pour repérer chaque balise, puis
+    découpé en deux : une archive de base avec toutes les parties qui ne
+    changent jamais (déjà compressées) et le XML des slides contenant des
+    balises. Chaque certificat est une copie en mémoire de l'archive de base
+    à laquelle on ajoute uniquement les slides réécrites.
+    """
+
+    def __init__(self, template_path, placeholders=PLACEHOLDERS):
+        self.template_path = template_path
+        self.placeholders = tuple(placeholders)
+        self.engine = PlaceholderEngine(self.placeholders)
+
+        with open(template_path, "rb") as f:
+            data = f.read()
+
+        self._load_parts(data)
+
+        base = io.BytesIO()
+        with zipfile.ZipFile(io.BytesIO(data)) as src, zipfile.ZipFile(base, "w") as dst:
+            for info in src.infolist():
+                if info.filename not in self.parts:
+                    dst.writestr(info, src.read(info), compress_type=info.compress_type)
+        self.base = base.getvalue()
+        self._data = data
+        self._batch_base = None
+
+    def _load_parts(self, data):
+        """Analyse des slides et de leurs notes, une fois au chargement.
+
+        Les balises découpées en plusieurs runs sont réunies, puis les balises
+        manquantes ou inconnues sont signalées ici plutôt qu'à chaque certificat.
+        """
+        prs = Presentation(io.BytesIO(data))
+        self.slide_parts = []
+        part_slides = []
+        for slide_index, slide in enumerate(prs.slides):
+            part_name = slide.part.partname.lstrip("/")
+            self.slide_parts.append(part_name)
+            part_slides.append((part_name, slide_index))
+            if slide.has_notes_slide:
+                part_slides.append((slide.notes_slide.part.partname.lstrip("/"), slide_index))
+
+        self.locations = []
+        self.parts = {}
+        self.part_xml = {}
+        found, merged = set(), 0
+        with zipfile.ZipFile(io.BytesIO(data)) as src:
+            for part_name, slide_index in part_slides:
+                info = src.getinfo(part_name)
+                root = etree.fromstring(src.read(info))
+                tokens, count = self.engine.normalize_element(root)
+                found.update(tokens)
+                merged += count
+                for paragraph_index, paragraph in enumerate(root.iter(A_P)):
+                    for run_index, run in enumerate(paragraph.iterchildren(A_R)):
+                        text = run.findtext(A_T) or ""
+                        for token in TOKEN_PATTERN.findall(text):
+                            if token in self.placeholders:
+                                self.locations.append(PlaceholderLocation(
+                                    token, part_name, slide_index, paragraph_index, run_index
+                                ))
+                                self.parts.setdefault(part_name, set()).add(token)
+                if part_name in self.parts:
+                    xml = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+                    self.part_xml[part_name] = (info, xml.decode("utf-8"))
+
+        self.missing_tokens = [t for t in self.placeholders if t not in found]
+        self.unknown_tokens = sorted(found - set(self.placeholders))
+        if self.missing_tokens:
+            logging.warning(f"Placeholders not found in template {self.template_path}: {', '.join(self.missing_tokens)}")
+        if self.unknown_tokens:
+            logging.warning(f"Unknown placeholders in template {self.template_path} (left as is): "
+                            f"{', '.join(self.unknown_tokens)}")
+        if merged:
+            logging.info(f"{merged} placeholders split across runs merged in template {self.template_path}")
+
+    def fill_part(self, part_name, replacements):
+        return self.engine.fill(self.part_xml[part_name][1], replacements).encode("utf-8")
+
+    def render(self, replacements):
+        """Retourne le contenu (bytes) du PPTX rempli avec `replacements`."""
+        buffer = io.BytesIO(self.base)
+        with zipfile.ZipFile(buffer, "a") as z:
+            for part_name in self.parts:
+                info = self.part_xml[part_name][0]
+                z.writestr(info, self.fill_part(part_name, replacements), compress_type=info.compress_type)
+        return buffer.getvalue()
+
+    def save(self, replacements, pptx_path):
+        with open(pptx_path, "wb") as f:
+            f.write(self.render(replacements))
+
+    def render_blank(self):
+        """PPTX du modèle sans le texte des paragraphes à balises (fond pour le mode overlay)."""
+        def blank(match):
+            paragraph = match.group(0)
+            if not any(token in paragraph for token in self.placeholders):
+                return paragraph
+            return re.sub(r"<a:(r|fld)\b.*?</a:\1>|<a:br\b[^>]*/>", "", paragraph, flags=re.S)
+
+        buffer = io.BytesIO(self.base)
+        with zipfile.ZipFile(buffer, "a") as z:
+            for part_name in self.parts:
+                info, xml = self.part_xml[part_name]
+                xml = re.sub(r"<a:p(?:\s[^>]*)?>.*?</a:p>", blank, xml, flags=re.S)
+                z.writestr(info, xml.encode("utf-8"), compress_type=info.compress_type)
+        return buffer.getvalue()
+
+    def save_blank(self, pptx_path):
+        with open(pptx_path, "wb") as f:
+            f.write(self.render_blank())
+
+    def _load_batch_base(self):
+        """Archive sans les slides ni les parties qui les listent (construite une fois)."""
+        if self._batch_base is None:
+            rewritten = {CONTENT_TYPES, PRESENTATION, PRESENTATION_RELS}
+            rewritten.update(self.slide_parts)
+            rewritten.update(rels_path(p) for p in self.slide_parts)
+
+            base = io.BytesIO()
+            self._batch_parts = {}
+            with zipfile.ZipFile(io.BytesIO(self._data)) as src, zipfile.ZipFile(base, "w") as dst:
+                for info in src.infolist():
+                    if info.filename in rewritten:
+                        self._batch_parts[info.filename] = src.read(info)
+                    else:
+                        dst.writestr(info, src.read(info), compress_type=info.compress_type)
+            self._batch_base = base.getvalue()
+        return self._batch_base
+
+    def render_batch(self, replacements_list):
+        """Retourne un seul PPTX contenant les slides remplies de chaque participant, dans l'ordre.
+
+        Chaque participant occupe `len(self.slide_parts)` slides consécutives.
+        """
+        buffer = io.BytesIO(self._load_batch_base())
+        parts = self._batch_parts
+        sld_ids, relationships, overrides = [], [], []
+        number = 0
+
+        with zipfile.ZipFile(buffer, "a", zipfile.ZIP_DEFLATED) as z:
+            for replacements in replacements_list:
+                for part_name in self.slide_parts:
+                    number += 1
+                    new_part = f"ppt/slides/slide{number}.xml"
+                    if part_name in self.parts:
+                        z.writestr(new_part, self.fill_part(part_name, replacements))
+                    else:
+                        z.writestr(new_part, parts[part_name])
+
+                    slide_rels = parts.get(rels_path(part_name))
+                    if slide_rels is not None:
+                        # Les notes pointent vers la slide d'origine : non recopiées
+                        slide_rels = _relationship_pattern(NOTES_REL_TYPE).sub("", slide_rels.decode("utf-8"))
+                        z.writestr(rels_path(new_part), slide_rels.encode("utf-8"))
+
+                    rel_id = f"rIdCert{number}"
+                    sld_ids.append(f'<p:sldId id="{255 + number}" r:id="{rel_id}"/>')
+                    relationships.append(
+                        f'<Relationship Id="{rel_id}" Type="{SLIDE_REL_TYPE}" Target="slides/slide{number}.xml"/>'
+                    )
+                    overrides.append(f'<Override PartName="/{new_part}" ContentType="{SLIDE_CONTENT_TYPE}"/>')
+
+            presentation = parts[PRESENTATION].decode("utf-8")
+            presentation = re.sub(
+                r"<p:sldIdLst>.*?</p:sldIdLst>", lambda m: "<p:sldIdLst>" + "".join(sld_ids) + "</p:sldIdLst>",
+                presentation, flags=re.S
+            )
+            z.writestr(PRESENTATION, presentation.encode("utf-8"))
+
+            rels = _relationship_pattern(SLIDE_REL_TYPE).sub("", parts[PRESENTATION_RELS].decode("utf-8"))
+            rels = rels.replace("</Relationships>", "".join(relationships) + "</Relationships>")
+            z.writestr(PRESENTATION_RELS, rels.encode("utf-8"))
+
+            content_types = re.sub(
+                r'<Override PartName="/ppt/slides/[^"/]+"[^>]*/>', "", parts[CONTENT_TYPES].decode("utf-8")
+            )
+            content_types = content_types.replace("</Types>", "".join(overrides) + "</Types>")
+            z.writestr(CONTENT_TYPES, content_types.encode("utf-8"))
+
+        return buffer.getvalue()
+
+    def save_batch(self, replacements_list, pptx_path):
+        with open(pptx_path, "wb") as f:
+            f.write(self.render_batch(replacements_list))
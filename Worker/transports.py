@@ -0,0 +1,224 @@
+import os
+import ssl
+import queue
+import smtplib
+import logging
+import threading
+
+
+class MailTransport:
+    """Envoi des mails d'un run : la session (Outlook, connexions SMTP) est ouverte
+    à la demande, réutilisée pour tous les messages et fermée une fois par `close()`.
+
+    Un envoi en échec sur une erreur passagère (`transient`) est retenté
+    `retries` fois après réinitialisation de la session. Les sous-classes
+    implémentent `_send` et, si besoin, `open`, `close` et `_reset`.
+    `shared` : une même instance peut servir plusieurs threads d'envoi ;
+    sinon `spawn()` en crée une par thread.
+    """
+
+    shared = False
+
+    def __init__(self, retries=1):
+        self.retries = retries
+        self.sent = 0
+        self._count_lock = threading.Lock()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def spawn(self):
+        """Transport pour un autre thread d'envoi (le même s'il est partagé)."""
+        return self
+
+    def transient(self, error):
+        return True
+
+    def send(self, skeleton, to, subject, attachment=None):
+        """Envoie le mail construit à partir de `skeleton` (voir Worker/mail.py). Lève l'erreur en cas d'échec."""
+        attempt = 0
+        while True:
+            try:
+                self._send(skeleton, to, subject, attachment)
+                break
+            except Exception as e:
+                if attempt >= self.retries or not self.transient(e):
+                    raise
+                attempt += 1
+                logging.warning(f"Sending to {to} failed (attempt {attempt}), reconnecting: {e}")
+                self._reset()
+        with self._count_lock:
+            self.sent += 1
+
+    def _reset(self):
+        self.close()
+
+    def _send(self, skeleton, to, subject, attachment):
+        raise NotImplementedError
+
+
+# Erreurs COM passagères (Outlook occupé, redémarré ou injoignable) : envoi retenté après reconnexion
+TRANSIENT_COM_ERRORS = (
+    -2147418111,  # RPC_E_CALL_REJECTED
+    -2147417846,  # RPC_E_SERVERCALL_RETRYLATER
+    -2147023174,  # RPC_S_SERVER_UNAVAILABLE
+    -2147023170,  # RPC_S_CALL_FAILED
+    -2146959355,  # CO_E_SERVER_EXEC_FAILURE
+)
+
+
+class OutlookTransport(MailTransport):
+    """Outlook desktop (COM) : un seul objet Dispatch par thread d'envoi, réutilisé pour tout le run."""
+
+    def __init__(self, retries=1):
+        super().__init__(retries)
+        self.outlook = None
+
+    def spawn(self):
+        return OutlookTransport(self.retries)
+
+    def open(self):
+        if self.outlook is None:
+            try:
+                import pythoncom
+                # COM doit être initialisé dans chaque thread qui pilote Outlook
+                pythoncom.CoInitialize()
+            except ImportError:
+                pass
+            import win32com.client as win32
+            self.outlook = win32.Dispatch("outlook.application")
+
+    def close(self):
+        self.outlook = None
+
+    def transient(self, error):
+        return getattr(error, "hresult", None) in TRANSIENT_COM_ERRORS
+
+    def _send(self, skeleton, to, subject, attachment):
+        self.open()
+        mail = self.outlook.CreateItem(0)
+        skeleton.apply_to(mail, to, subject, attachment)
+        mail.Send()
+
+
+class SmtpTransport(MailTransport):
+    """Serveur SMTP : pool de `pool_size` connexions authentifiées, partagé par les threads d'envoi.
+
+    Chaque connexion envoie jusqu'à `max_messages` mails puis est renouvelée
+    (limite par session de la plupart des serveurs) ; une connexion en erreur
+    est abandonnée et l'envoi retenté sur une nouvelle.
+    """
+
+    shared = True
+
+    def __init__(self, host, port=25, username=None, password=None, sender=None, starttls=False, use_ssl=False,
+                 pool_size=2, max_messages=100, timeout=30, retries=1):
+        super().__init__(retries)
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender or username
+        self.starttls = starttls
+        self.use_ssl = use_ssl
+        self.pool_size = max(1, pool_size)
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=ssl.create_default_context())
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls(context=ssl.create_default_context())
+            if self.username:
+                server.login(self.username, self.password or "")
+        except Exception:
+            self._quit(server)
+            raise
+        server.messages_sent = 0
+        with self._lock:
+            self.connections_opened += 1
+        return server
+
+    @staticmethod
+    def _quit(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def close(self):
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def _reset(self):
+        # La connexion en erreur est déjà abandonnée, les autres restent valables
+        pass
+
+    def transient(self, error):
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return False
+        if isinstance(error, smtplib.SMTPResponseException):
+            return 400 <= error.smtp_code < 500
+        if isinstance(error, smtplib.SMTPServerDisconnected):
+            return True
+        if isinstance(error, smtplib.SMTPException):
+            return False
+        return isinstance(error, OSError)
+
+    def _send(self, skeleton, to, subject, attachment):
+        message = skeleton.to_mime(to, subject, attachment)
+        if self.sender and "From" not in message:
+            message["From"] = self.sender
+        with self._slots:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                server = self._connect()
+            try:
+                server.send_message(message)
+            except Exception:
+                self._quit(server)
+                raise
+            server.messages_sent += 1
+            if self.max_messages and server.messages_sent >= self.max_messages:
+                self._quit(server)
+            else:
+                self._idle.put(server)
+
+
+def transport_from_env():
+    """SMTP si CERT_SMTP_HOST est défini (CERT_SMTP_PORT, _USER, _PASSWORD, _SENDER, _STARTTLS, _POOL), sinon Outlook."""
+    host = os.environ.get("CERT_SMTP_HOST")
+    if not host:
+        return OutlookTransport()
+    return SmtpTransport(
+        host,
+        port=int(os.environ.get("CERT_SMTP_PORT", 25)),
+        username=os.environ.get("CERT_SMTP_USER"),
+        password=os.environ.get("CERT_SMTP_PASSWORD"),
+        sender=os.environ.get("CERT_SMTP_SENDER"),
+        starttls=os.environ.get("CERT_SMTP_STARTTLS", "0").lower() in ("1", "true", "yes"),
+        pool_size=int(os.environ.get("CERT_SMTP_POOL", 2)),
+    )
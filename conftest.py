@@ -0,0 +1,2 @@
+# Scripts manuels (interface Qt, Windows) : lancés à la main, pas par pytest
+collect_ignore = ["test_kpi.py", "test_login.py", "test_mail.py", "signature_test.py"]
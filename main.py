@@ -1,5 +1,6 @@
 import sys
 import os
+import multiprocessing
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QStackedWidget, QDesktopWidget,
     QLabel, QSpacerItem, QSizePolicy
@@ -75,6 +76,8 @@ class MainWindow(QWidget):
 
 
 if __name__ == "__main__":
+    # Requis pour le pool de génération dans l'exécutable PyInstaller
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
 
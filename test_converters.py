@@ -0,0 +1,86 @@
+"""Tests de la session de conversion partagée (PdfConverter) avec FakeConverter."""
+import os
+
+import pytest
+from pypdf import PdfReader
+
+from Worker.converters import FakeConverter
+from Worker.engine import CertificateEngine
+from Worker.template import CompiledTemplate
+from test_generation import PARTICIPANTS, TEMPLATE, write_export
+
+
+class TracingConverter(FakeConverter):
+    """FakeConverter qui note chaque démarrage et arrêt de l'application."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.events = []
+
+    def _start(self):
+        self.events.append("start")
+
+    def _stop(self):
+        self.events.append("stop")
+
+
+@pytest.fixture
+def deck(tmp_path):
+    path = str(tmp_path / "deck.pptx")
+    CompiledTemplate(TEMPLATE).save({"{{NOM}}": "Martin, Alice"}, path)
+    return path
+
+
+def convert(converter, deck, tmp_path, count):
+    for i in range(count):
+        converter.convert(deck, str(tmp_path / f"cert{i}.pdf"))
+
+
+def test_session_restarted_after_max_conversions(deck, tmp_path):
+    converter = TracingConverter(max_conversions=2)
+    with converter:
+        convert(converter, deck, tmp_path, 5)
+    assert converter.conversions == 5
+    assert converter.sessions_started == 3
+    assert converter.events == ["start", "stop"] * 3
+    assert not converter.started
+
+
+def test_crash_restarts_session_and_retries_once(deck, tmp_path):
+    converter = TracingConverter(fail_on=[2])
+    with converter:
+        convert(converter, deck, tmp_path, 3)
+    # Appel 2 planté : session fermée puis rouverte, le même deck est reconverti (appel 3)
+    assert converter.calls == 4
+    assert converter.conversions == 3
+    assert converter.sessions_started == 2
+    assert converter.events == ["start", "stop", "start", "stop"]
+    assert [pdf for _, pdf in converter.converted] == [str(tmp_path / f"cert{i}.pdf") for i in range(3)]
+    assert "Martin, Alice" in PdfReader(tmp_path / "cert1.pdf").pages[0].extract_text()
+
+
+def test_crash_raised_after_retry(deck, tmp_path):
+    converter = TracingConverter(fail_on=[1, 2])
+    with converter:
+        with pytest.raises(RuntimeError):
+            converter.convert(deck, str(tmp_path / "cert.pdf"))
+        assert not converter.started
+    assert converter.calls == 2
+    assert converter.conversions == 0
+    assert not os.path.exists(tmp_path / "cert.pdf")
+
+
+def test_session_closed_when_run_ends(tmp_path):
+    excel_path = str(tmp_path / "FORM_1.xlsx")
+    write_export(excel_path, PARTICIPANTS)
+    converter = TracingConverter()
+
+    engine = CertificateEngine(TEMPLATE, excel_path, "Safety Basics", str(tmp_path / "out"), converter=converter,
+                               render_backend="powerpoint", excel_cache=False, resume=False, send_mail=False)
+    engine.run()
+
+    assert engine.error is None
+    # Une seule session pour tout le run, fermée une fois à la fin
+    assert converter.conversions == 3
+    assert converter.events == ["start", "stop"]
+    assert not converter.started
@@ -0,0 +1,97 @@
+"""Tests du dispatcher asynchrone des mails : reprises avec délai exponentiel et limite de débit (Worker/dispatcher.py)."""
+import time
+import smtplib
+import threading
+
+from Worker.dispatcher import MailDispatcher, MailRequest
+from Worker.transports import MailTransport
+
+
+class FlakyTransport(MailTransport):
+    """Transport partagé dont les `failures` premiers envois de chaque destinataire échouent avec `error`."""
+
+    shared = True
+
+    def __init__(self, failures=0, error=None):
+        super().__init__(retries=0)
+        self.failures = failures
+        self.error = error or smtplib.SMTPResponseException(451, b"Try again later")
+        self.calls = {}
+        self.sent_at = []
+        self._lock = threading.Lock()
+
+    def transient(self, error):
+        return isinstance(error, smtplib.SMTPResponseException) and 400 <= error.smtp_code < 500
+
+    def _send(self, skeleton, to, subject, attachment):
+        with self._lock:
+            self.calls[to] = self.calls.get(to, 0) + 1
+            if self.calls[to] <= self.failures:
+                raise self.error
+            self.sent_at.append(time.monotonic())
+
+
+class StatusLog:
+    def __init__(self):
+        self.statuses = []
+        self._lock = threading.Lock()
+
+    def __call__(self, request, status, attempt, error, delay):
+        with self._lock:
+            self.statuses.append((request.to, status, attempt, delay))
+
+
+def dispatch(transport, recipients, **kwargs):
+    log = StatusLog()
+    with MailDispatcher(transport, on_status=log, **kwargs) as dispatcher:
+        for to in recipients:
+            dispatcher.submit(MailRequest(to, "Certificate", None, None, None))
+    return dispatcher, log
+
+
+def test_transient_failures_retried_with_backoff():
+    transport = FlakyTransport(failures=2)
+    dispatcher, log = dispatch(transport, ["alice@example.com"], retries=3, backoff=0.01, max_backoff=0.015)
+
+    assert [(status, attempt) for _, status, attempt, _ in log.statuses] == [
+        ("sending", 0), ("retrying", 1), ("sending", 1), ("retrying", 2), ("sending", 2), ("sent", 2),
+    ]
+    assert transport.calls == {"alice@example.com": 3}
+    assert (dispatcher.sent, dispatcher.failed, dispatcher.retried) == (1, 0, 2)
+    # Délai doublé à chaque tentative, borné par max_backoff, tiré entre 50 % et 100 %
+    first, second = [delay for _, status, _, delay in log.statuses if status == "retrying"]
+    assert 0.005 <= first <= 0.01
+    assert 0.0075 <= second <= 0.015
+
+
+def test_failed_after_retries_exhausted():
+    transport = FlakyTransport(failures=5)
+    dispatcher, log = dispatch(transport, ["alice@example.com"], retries=2, backoff=0.001)
+
+    assert transport.calls == {"alice@example.com": 3}
+    assert log.statuses[-1][1:3] == ("failed", 2)
+    assert (dispatcher.sent, dispatcher.failed, dispatcher.retried) == (0, 1, 2)
+
+
+def test_permanent_error_not_retried():
+    transport = FlakyTransport(failures=1, error=smtplib.SMTPRecipientsRefused({"bob@example.com": (550, b"")}))
+    dispatcher, log = dispatch(transport, ["bob@example.com"], retries=3, backoff=0.001)
+
+    assert transport.calls == {"bob@example.com": 1}
+    assert [status for _, status, _, _ in log.statuses] == ["sending", "failed"]
+    assert (dispatcher.sent, dispatcher.failed, dispatcher.retried) == (0, 1, 0)
+
+
+def test_token_bucket_limits_throughput():
+    transport = FlakyTransport()
+    recipients = [f"user{i}@example.com" for i in range(6)]
+    started = time.monotonic()
+    # 1200 mails par minute = un toutes les 50 ms, malgré trois envois simultanés
+    dispatcher, _ = dispatch(transport, recipients, concurrency=3, rate_per_minute=1200)
+    elapsed = time.monotonic() - started
+
+    assert dispatcher.sent == 6
+    # Premier jeton disponible tout de suite, les cinq suivants espacés de 50 ms
+    assert elapsed >= 0.24
+    assert transport.sent_at[-1] - transport.sent_at[0] >= 0.15
+
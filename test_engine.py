@@ -0,0 +1,84 @@
+"""Tests des événements du moteur : messages par ligne ou par mail regroupés (Worker/engine.py)."""
+from Worker.converters import FakeConverter
+from Worker.dispatcher import MailRequest
+from Worker.engine import CertificateEngine
+from Worker.metrics import ProgressTracker
+from test_generation import TEMPLATE, TITLE, write_export
+
+
+def make_engine(tmp_path, participants, interval, events):
+    excel_path = str(tmp_path / "FORM_1.xlsx")
+    write_export(excel_path, participants)
+    return CertificateEngine(TEMPLATE, excel_path, TITLE, str(tmp_path / "out"), converter=FakeConverter(),
+                             render_backend="powerpoint", excel_cache=False, resume=False, send_mail=False,
+                             progress=ProgressTracker(interval=interval),
+                             on_event=lambda event, value: events.append((event, value)))
+
+
+def progress_messages(events):
+    return [value for event, value in events if event == "progress"]
+
+
+def grouped(message):
+    """Nombre de messages représentés par un événement `progress`."""
+    return int(message.rsplit("(+", 1)[1].split()[0]) + 1 if message.endswith("more)") else 1
+
+
+def test_row_warnings_throttled(tmp_path):
+    participants = [(f"Participant {i}", 90, 100000000 + i, f"p{i}@example.com") for i in range(3)]
+    participants += [(f"No score {i}", "n/a", i, f"n{i}@example.com") for i in range(40)]
+    events = []
+    engine = make_engine(tmp_path, participants, 3600, events)
+    engine.run()
+    messages = progress_messages(events)
+
+    assert engine.error is None and engine.total_certificates == 3
+    # Début du run puis une seule publication : pas un événement par ligne rejetée
+    assert messages == ["🕒 Generating certificates...", "⚠️ Row 44: invalid score, certificate ignored. (+39 more)"]
+    assert sum(grouped(m) for m in messages[1:]) == 40
+
+
+def test_mail_statuses_throttled(tmp_path):
+    events = []
+    engine = make_engine(tmp_path, [], 3600, events)
+    for i in range(10):
+        request = MailRequest(f"user{i}@example.com", "Certificate", None, None, {"id": i})
+        engine.mail_status(request, "sending", 0)
+        engine.mail_status(request, "failed" if i == 9 else "sent", 0, error="550")
+
+    # Premier statut publié tout de suite, les suivants en attente de l'intervalle suivant
+    assert progress_messages(events) == ["✉️Certificate sent to user0@example.com"]
+    engine.close_run()
+    assert progress_messages(events)[1:] == ["❌Failed to send email to user9@example.com (+8 more)"]
+    assert (engine.mails_sent, engine.mails_failed) == (9, 1)
+
+
+def test_every_message_published_without_interval(tmp_path):
+    events = []
+    engine = make_engine(tmp_path, [], 0, events)
+    for i in range(3):
+        engine.mail_status(MailRequest(f"user{i}@example.com", "Certificate", None, None, {"id": i}), "sent", 0)
+    assert progress_messages(events) == [f"✉️Certificate sent to user{i}@example.com" for i in range(3)]
+
+
+def test_parallel_jobs_read_in_bounded_chunks(tmp_path):
+    participants = [(f"Participant {i}", 90, 100000000 + i, f"p{i}@example.com") for i in range(400)]
+    events = []
+    engine = make_engine(tmp_path, participants, 3600, events)
+    engine.workers = 2
+    read = []
+
+    def jobs():
+        for job in engine.open_run():
+            read.append(job.row)
+            yield job
+
+    results = engine.parallel_results(jobs())
+    first = next(results)
+    # Premiers jobs lus pour la taille des tranches, puis au plus deux tranches par process en attente
+    assert first[0].ok and len(read) <= 2 * 4 * 10 + 4 * 10 < 400
+    rest = [result for batch in results for result in batch]
+    engine.close_run()
+    assert len(read) == 400
+    assert [result.job.row for result in first + rest] == list(range(400))
+    assert engine.total_certificates == 400
@@ -0,0 +1,124 @@
+"""Tests du cache des exports Excel analysés : hits, invalidation, éviction LRU (Worker/excel_cache.py)."""
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from Worker.excel_cache import ENTRY_SUFFIX, ExcelCache, read_excel_cached
+from Worker.roster import ROSTER_CACHE_VARIANT, RosterReader
+from test_generation import PARTICIPANTS, write_export
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ExcelCache(str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = str(tmp_path / "FORM_1.xlsx")
+    write_export(path, PARTICIPANTS)
+    return path
+
+
+class CountingReader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, path):
+        self.calls += 1
+        return pd.read_excel(path, skiprows=1)
+
+
+def test_hit_after_put(cache, export):
+    assert cache.get(export, "full") is None
+    reader = CountingReader()
+    first = cache.load(export, reader)
+    second = cache.load(export, reader)
+
+    assert reader.calls == 1
+    pd.testing.assert_frame_equal(second, first)
+    assert len(cache.entries()) == 1
+
+
+def test_roster_reader_reads_cache_on_second_pass(cache, export):
+    first = RosterReader(export, chunk_size=2, cache=cache)
+    expected = pd.concat(list(first))
+    assert not first.from_cache
+
+    second = RosterReader(export, chunk_size=2, cache=cache)
+    chunks = list(second)
+    assert second.from_cache
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+    assert second.rows_read == second.total_rows == len(expected)
+    assert os.path.basename(cache.entries()[0][0]).endswith(f"-{ROSTER_CACHE_VARIANT}{ENTRY_SUFFIX}")
+
+
+def test_changed_file_misses(cache, export):
+    reader = CountingReader()
+    cache.load(export, reader)
+    digest = cache.fingerprint(export)
+
+    write_export(export, PARTICIPANTS[:2])
+    assert cache.fingerprint(export) != digest
+    assert cache.get(export, "full") is None
+    assert len(cache.load(export, reader)) == 2
+    assert reader.calls == 2
+
+
+def test_touched_file_still_hits(cache, export):
+    reader = CountingReader()
+    cache.load(export, reader)
+    # Date de modification changée, contenu identique : même SHA-256 après recalcul
+    stat = os.stat(export)
+    os.utime(export, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    cache.load(export, reader)
+    assert reader.calls == 1
+
+
+def test_invalidate(cache, export, tmp_path):
+    other = str(tmp_path / "FORM_2.xlsx")
+    write_export(other, PARTICIPANTS[:1])
+    cache.load(export, CountingReader())
+    read_excel_cached(export, cache, skiprows=1)
+    cache.load(other, CountingReader())
+
+    assert cache.invalidate(export) == 2
+    assert cache.get(export, "full") is None
+    assert cache.get(other, "full") is not None
+    assert cache.invalidate() == 1
+    assert cache.entries() == []
+
+
+def test_least_recently_used_entries_evicted(cache, tmp_path):
+    paths = []
+    for i in range(3):
+        path = str(tmp_path / f"FORM_{i}.xlsx")
+        write_export(path, [PARTICIPANTS[i]])
+        paths.append(path)
+        cache.load(path, CountingReader())
+    sizes = [os.path.getsize(cache._entry_path(cache.fingerprint(path), "full")) for path in paths]
+    assert len(cache.entries()) == 3
+
+    # Entrées utilisées dans l'ordre 1, 0, 2 ; puis une relecture de 1 la rend la plus récente
+    for age, i in ((300, 1), (200, 0), (100, 2)):
+        entry = cache._entry_path(cache.fingerprint(paths[i]), "full")
+        used = os.stat(entry).st_mtime - age
+        os.utime(entry, (used, used))
+    assert cache.get(paths[1], "full") is not None
+
+    cache.max_bytes = sizes[1] + sizes[2]
+    cache.evict()
+    assert cache.get(paths[0], "full") is None
+    assert cache.get(paths[1], "full") is not None
+    assert cache.get(paths[2], "full") is not None
+
+    # Entrée qui vient d'être écrite gardée, même seule au-delà de la limite
+    cache.max_bytes = 1
+    cache.load(paths[0], CountingReader())
+    assert [os.path.basename(entry) for entry, _, _ in cache.entries()] == [
+        f"{cache.fingerprint(paths[0])}-full{ENTRY_SUFFIX}",
+    ]
@@ -0,0 +1,73 @@
+"""Tests du mode batch : deck fusionné (CompiledTemplate.render_batch), une conversion, découpe par participant."""
+import os
+from datetime import datetime
+
+from openpyxl import Workbook
+from pypdf import PdfReader
+
+from Worker.converters import FakeConverter, write_text_pdf
+from Worker.engine import CertificateEngine
+from Worker.pdf_tools import split_pdf
+
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "template_certificat.pptx")
+TITLE = "Safety: Basics"
+
+PARTICIPANTS = [
+    # nom, score, sso, email
+    ("Martin, Alice", 95, 100000001, "alice.martin@example.com"),
+    ("Durand, Bob", 88, 100000002, "bob.durand@example.com"),
+    ("Nguyen/Chloe", 100, 100000003, "chloe.nguyen@example.com"),
+]
+
+
+def write_export(path, participants):
+    """Export Forms minimal : ligne 1 en-têtes, ligne 2 ignorée, participants à partir de la ligne 3."""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Start time", "Name", "Email", "Total points", "Quiz feedback", "Grade posted time",
+                  "Completion time", "SSO", "Email address"])
+    sheet.append([None] * 9)
+    for nom, score, sso, email in participants:
+        sheet.append([datetime(2025, 3, 17, 10, 30), nom, None, score, None, None, None, sso, email])
+    workbook.save(path)
+
+
+def page_texts(pdf_path):
+    return [page.extract_text() for page in PdfReader(pdf_path).pages]
+
+
+def test_batch_of_three_split_per_participant(tmp_path):
+    excel_path = str(tmp_path / "FORM_1.xlsx")
+    output = tmp_path / "out"
+    write_export(excel_path, PARTICIPANTS)
+    converter = FakeConverter()
+
+    engine = CertificateEngine(TEMPLATE, excel_path, TITLE, str(output), converter=converter, batch_size=3,
+                               render_backend="powerpoint", excel_cache=False, resume=False, send_mail=False)
+    engine.run()
+
+    assert engine.error is None
+    assert engine.total_certificates == 3
+    # Un seul deck converti pour les trois certificats
+    assert converter.conversions == 1
+
+    # "{titre} - {nom}.pdf", caractères interdits dans un nom de fichier retirés
+    expected = ["Safety Basics - Martin, Alice.pdf", "Safety Basics - Durand, Bob.pdf",
+                "Safety Basics - NguyenChloe.pdf"]
+    assert sorted(os.listdir(output)) == sorted(expected)
+    for name, (nom, *_) in zip(expected, PARTICIPANTS):
+        texts = page_texts(output / name)
+        assert len(texts) == 1
+        assert nom in texts[0]
+        assert TITLE in texts[0]
+
+
+def test_split_keeps_pages_of_each_participant_in_order(tmp_path):
+    batch_pdf = str(tmp_path / "batch.pdf")
+    write_text_pdf(batch_pdf, [f"{nom} page {page}" for nom in ("A", "B", "C") for page in (1, 2)])
+    outputs = [str(tmp_path / f"{nom}.pdf") for nom in ("A", "B", "C")]
+
+    assert split_pdf(batch_pdf, outputs, pages_per_document=2) == outputs
+    for nom, path in zip(("A", "B", "C"), outputs):
+        assert page_texts(path) == [f"{nom} page 1", f"{nom} page 2"]
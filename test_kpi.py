@@ -1,15 +1,25 @@
 import sys
 import os
+import argparse
 import pandas as pd
 from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QVBoxLayout, QWidget, QTableWidget, QTableWidgetItem,
+    QApplication, QMainWindow, QVBoxLayout, QWidget, QTableView,
     QLabel, QComboBox, QHBoxLayout, QSpinBox, QPushButton, QGridLayout, QDateEdit
 )
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QUrl
-import plotly.express as px
+from PyQt5.QtCore import Qt, QUrl, QTimer
 from PyQt5.QtWidgets import QHeaderView
 
+from Worker.history import HistoryStore
+from Worker.kpi_cube import KPICube
+from Worker.kpi_worker import KPIWorker
+from view.kpi_table_model import KPITableModel
+from view.plotly_view import PlotlyView
+
+# Pause (ms) après le dernier changement de filtre avant de recalculer la vue
+UPDATE_DEBOUNCE_MS = 250
+# Lignes examinées pour ajuster la largeur des colonnes (au lieu de toutes)
+TABLE_RESIZE_ROWS = 200
+
 class KPIWindow(QMainWindow):
     def __init__(self, df, parent=None):
         super().__init__(parent)
@@ -51,8 +61,20 @@ class KPIWindow(QMainWindow):
         df["Attempts"] = pd.to_numeric(df["No. of Attempts"], errors="coerce").fillna(0).astype(int) + 1
 
         self.df = df
+        # Agrégats région × unité × jour × score calculés une fois : les filtres ne relisent plus les lignes
+        self.cube = KPICube.from_frame(df)
 
     def init_ui(self):
+        # Calcul des vues hors du thread de l'interface ; le timer regroupe les changements de filtres
+        self.kpi_worker = KPIWorker(self.cube, self)
+        self.kpi_worker.computed.connect(self.apply_view)
+        self.kpi_worker.start()
+
+        self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setInterval(UPDATE_DEBOUNCE_MS)
+        self.update_timer.timeout.connect(self.update_view)
+
         widget = QWidget()
         self.setCentralWidget(widget)
 
@@ -65,19 +87,19 @@ class KPIWindow(QMainWindow):
         self.start_date.setDisplayFormat("yyyy-MM-dd")
         self.start_date.setDate(self.df["Date"].min().date())  # Initialize with the earliest date
         self.start_date.setCalendarPopup(True)  # Allows showing a calendar when clicking the field
-        self.start_date.dateChanged.connect(self.update_view)  # Connect to the date change
+        self.start_date.dateChanged.connect(self.schedule_update)  # Connect to the date change
 
         self.end_date = QDateEdit(self)
         self.end_date.setDisplayFormat("yyyy-MM-dd")
         self.end_date.setDate(self.df["Date"].max().date())  # Initialize with the most recent date
         self.end_date.setCalendarPopup(True)  # Allows showing a calendar when clicking the field
-        self.end_date.dateChanged.connect(self.update_view)  # Connect to the date change
+        self.end_date.dateChanged.connect(self.schedule_update)  # Connect to the date change
 
         self.success_threshold = QSpinBox()
         self.success_threshold.setRange(0, 100)
         self.success_threshold.setValue(70)
         self.success_threshold.setSuffix(" %")
-        self.success_threshold.valueChanged.connect(self.update_view)
+        self.success_threshold.valueChanged.connect(self.schedule_update)
 
         filter_layout.addWidget(QLabel("Filter by date:"))
         filter_layout.addWidget(self.start_date)
@@ -101,17 +123,24 @@ class KPIWindow(QMainWindow):
         grid = QGridLayout()
         main_layout.addLayout(grid)
 
-        self.table = QTableWidget()
+        # Model-backed table: cells are formatted only when shown, sorting is done by the model
+        self.table_model = KPITableModel(parent=self)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(0, Qt.AscendingOrder)  # Same order as before: region, then unit (stable sort)
+        self.table.horizontalHeader().setResizeContentsPrecision(TABLE_RESIZE_ROWS)
         self.table.setStyleSheet(""" ... """)  # Style remains unchanged
         grid.addWidget(self.table, 0, 0)
 
-        self.web_region = QWebEngineView()
+        # Each chart page (local plotly.js) is loaded once; updates only send the figure data
+        self.web_region = PlotlyView()
         grid.addWidget(self.web_region, 0, 1)
 
-        self.web_unit = QWebEngineView()
+        self.web_unit = PlotlyView()
         grid.addWidget(self.web_unit, 1, 0)
 
-        self.web_pie = QWebEngineView()
+        self.web_pie = PlotlyView()
         grid.addWidget(self.web_pie, 1, 1)
 
         self.update_view()
@@ -122,7 +151,8 @@ class KPIWindow(QMainWindow):
             print("❌ No data to export. Ensure the view is updated.")
             return
 
-        display_df = self.last_table_df  # Get the displayed DataFrame
+        # Rows in the order shown in the table (sort chosen in the header included)
+        display_df = self.table_model.frame()
 
         # Define the path for the CSV file
         filename_csv = r"C:\Users\260001889\Desktop\kpi_export.csv"  # Specify an absolute path
@@ -147,7 +177,7 @@ class KPIWindow(QMainWindow):
             html_pie = self.last_fig_pie.to_html(include_plotlyjs=False, full_html=False)
 
             # HTML for the pandas table
-            table_html = self.last_table_df.to_html(index=False, classes="data-table")
+            table_html = self.table_model.frame().to_html(index=False, classes="data-table")
 
             # Style for the HTML
             css = """
@@ -205,144 +235,68 @@ class KPIWindow(QMainWindow):
         except Exception as e:
             print("❌ Error in export_html:", e)
 
-    def update_view(self):
-        success_threshold = self.success_threshold.value()
-        df = self.df.copy()
+    def schedule_update(self):
+        # Changements rapprochés (défilement du QSpinBox, saisie d'une date) : un seul calcul après la pause
+        self.update_timer.start()
 
-        # Filter data by selected date range
+    def update_view(self):
+        # Filter data by selected date range (whole days, both bounds included)
         start_date = self.start_date.date().toPyDate()  # Use `date()` to get the date
         end_date = self.end_date.date().toPyDate()  # Use `date()` to get the date
 
-        # Convert dates to datetime64 for comparison with the "Date" column
-        start_date = pd.to_datetime(start_date)
-        end_date = pd.to_datetime(end_date)
-
-        # Apply the date filter
-        df = df[(df["Date"] >= start_date) & (df["Date"] <= end_date)]
-
-        # Group data by region and SDSU Unit
-        grouped = df.groupby(["Region", "SDSU Unit"]).agg(
-            Attempts=('Attempts', 'sum'),
-            Successes=('Percent Score', lambda x: (x >= success_threshold).sum())
-        ).reset_index()
+        # Aggregation and charts are computed by the worker; an older computation still running is dropped
+        self.update_timer.stop()
+        self.kpi_worker.request(start_date, end_date, self.success_threshold.value())
 
-        # Calculate success rate per SDSU Unit (local)
-        grouped['Success Rate per Unit (%)'] = (grouped['Successes'] / grouped['Attempts'] * 100).round(1)
-
-        # Group data by region to get total attempts and successes
-        region_summary = grouped.groupby("Region").agg({
-            "Attempts": "sum",
-            "Successes": "sum"
-        }).reset_index()
-
-        # Calculate success rate per region
-        region_summary['Success Rate by Region (%)'] = (
-            region_summary['Successes'] / region_summary['Attempts'] * 100
-        ).round(1)
-
-        # Merge to add success rate by region to the original DataFrame
-        grouped = grouped.merge(region_summary[['Region', 'Success Rate by Region (%)']], on='Region', how='left')
-
-        # Prepare the table for display
-        display_df = grouped.rename(columns={"SDSU Unit": " Unit"})[[ 
-            "Region", " Unit", "Attempts", "Successes", 
-            "Success Rate per Unit (%)", "Success Rate by Region (%)"
-        ]]
-
-        # Update the table
-        self.table.setRowCount(len(display_df))
-        self.table.setColumnCount(len(display_df.columns))
-        self.table.setHorizontalHeaderLabels(display_df.columns.tolist())
+    def apply_view(self, view):
+        # A more recent request was made meanwhile: its result will follow
+        if view.request.generation != self.kpi_worker.generation:
+            return
 
-        for i, row in display_df.iterrows():
-            for j, val in enumerate(row):
-                self.table.setItem(i, j, QTableWidgetItem(str(val)))
+        display_df = view.table
 
+        # Update the table: the model takes the new columns, the current sort is kept
+        self.table_model.set_frame(display_df)
         self.table.resizeColumnsToContents()
 
-        # Success rate by region graph
-        fig_region = px.bar(
-            region_summary,
-            x="Region",
-            y="Success Rate by Region (%)",
-            title="Success Rate by Region (%)",
-            color="Success Rate by Region (%)",
-            color_continuous_scale=px.colors.sequential.Viridis
-        )
-        # Center and bold the title
-        fig_region.update_layout(
-            title=dict(
-                text="Success Rate by Region (%)",
-                x=0.5,  # Center horizontally
-                xanchor='center',  # Center relative to the X axis
-                font=dict(size=18, family='Arial', weight='bold')  # Bold font
-            )
-        )
-        # Directly load the graph in QWebEngineView
-        self.web_region.setHtml(fig_region.to_html(include_plotlyjs="cdn"))
-
-        # Success rate by SDSU Unit graph
-        fig_unit = px.bar(
-            grouped,
-            x="SDSU Unit",
-            y="Success Rate per Unit (%)",
-            title="Success Rate by SDSU Unit (%)",
-            color="Success Rate per Unit (%)",
-            color_continuous_scale=px.colors.sequential.Plasma
-        )
-        fig_unit.update_yaxes(range=[0, 100])
-        # Center and bold the title
-        fig_unit.update_layout(
-            title=dict(
-                text="Success Rate by SDSU Unit (%)",
-                x=0.5,  # Center horizontally
-                xanchor='center',  # Center relative to the X axis
-                font=dict(size=18, family='Arial', weight='bold')  # Bold font
-            )
-        )
-        # Directly load the graph in QWebEngineView
-        self.web_unit.setHtml(fig_unit.to_html(include_plotlyjs="cdn"))
-
-        # Pie chart based on the overall success rate
-        region_summary_for_pie = region_summary.copy()
-
-        # If the overall success rate is 0, replace with None to avoid showing it
-        region_summary_for_pie.loc[region_summary_for_pie['Success Rate by Region (%)'] == 0, 'Success Rate by Region (%)'] = None
-
-        fig_pie = px.pie(
-            region_summary_for_pie,
-            values="Success Rate by Region (%)",  # Uses the overall success rate for each region
-            names="Region",  # Region names
-            title="Distribution of Success Rates by Region",
-            color_discrete_sequence=px.colors.qualitative.Bold  # Choose color palette
-        )
-        # Center and bold the title
-        fig_pie.update_layout(
-            title=dict(
-                text="Distribution of Success Rates by Region",
-                x=0.5,  # Center horizontally
-                xanchor='center',  # Center relative to the X axis
-                font=dict(size=18, family='Arial', weight='bold')  # Bold font
-            )
-        )
-
-        # Directly load the graph in QWebEngineView
-        self.web_pie.setHtml(fig_pie.to_html(include_plotlyjs="cdn"))
+        # Redraw the charts in place (Plotly.react) with the new figures
+        self.web_region.show_figure(view.json["region"])
+        self.web_unit.show_figure(view.json["unit"])
+        self.web_pie.show_figure(view.json["pie"])
 
         # Save graphs for export
-        self.last_fig_region = fig_region
-        self.last_fig_unit = fig_unit
-        self.last_fig_pie = fig_pie
-        self.last_table_df = grouped.rename(columns={"SDSU Unit": " Unit"})[[ 
-            "Region", " Unit", "Attempts", "Successes", "Success Rate per Unit (%)", "Success Rate by Region (%)"
-        ]] 
+        self.last_fig_region = view.figures["region"]
+        self.last_fig_unit = view.figures["unit"]
+        self.last_fig_pie = view.figures["pie"]
+        self.last_table_df = self.table_model.frame()
 
-if __name__ == "__main__":
-    excel_path = r"C:\Users\260001889\Downloads\FORM_2188484_1753176334450_07-22-2025_09_25_34f38_SDSU.xlsx"
-    if not os.path.exists(excel_path):
-        raise FileNotFoundError("⚠️ Excel file not found. Please check the path.")
+    def closeEvent(self, event):
+        self.update_timer.stop()
+        self.kpi_worker.stop()
+        super().closeEvent(event)
 
-    df = pd.read_excel(excel_path)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="KPI dashboard over the attempts history.")
+    parser.add_argument("exports", nargs="*", help="Forms exports or folders added to the history first "
+                                                   "(default: FORM.xlsx, Templates, FIleInstallation/Data)")
+    parser.add_argument("--history-dir", help="history folder (default: CERT_HISTORY_DIR)")
+    parser.add_argument("--training", nargs="+", help="form ids to include (default: all)")
+    parser.add_argument("--units", nargs="+", help="SDSU units to include (default: all)")
+    parser.add_argument("--date-start", help="first day (YYYY-MM-DD)")
+    parser.add_argument("--date-end", help="last day (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    # Nouveaux exports ajoutés une fois à l'historique ; ceux déjà ingérés ne sont pas relus
+    store = HistoryStore(args.history_dir)
+    root = os.path.dirname(os.path.abspath(__file__))
+    store.ingest_paths(args.exports or [
+        os.path.join(root, "FORM.xlsx"), os.path.join(root, "Templates"), os.path.join(root, "FIleInstallation", "Data")
+    ])
+
+    # Seules les partitions (formation, mois) et unités demandées sont lues
+    df = store.kpi_frame(args.training, args.date_start, args.date_end, args.units)
+    if df["Date Appeared"].isna().all():
+        raise SystemExit(f"⚠️ No dated attempts in the history ({store.root}).")
 
     app = QApplication(sys.argv)
     window = KPIWindow(df)
@@ -0,0 +1,80 @@
+"""Tests du cube KPI pré-agrégé contre le groupby d'origine du dashboard (Worker/kpi_cube.py)."""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from Worker.kpi_cube import MAX_BUCKET, MIN_BUCKET, KPICube
+
+
+def legacy_query(df, start, end, success_threshold):
+    """Ancien `KPIWindow.update_view` : filtre des lignes brutes puis groupby."""
+    df = df[(df["Date"] >= pd.to_datetime(start)) & (df["Date"] <= pd.to_datetime(end))]
+    return df.groupby(["Region", "SDSU Unit"]).agg(
+        Attempts=('Attempts', 'sum'),
+        Successes=('Percent Score', lambda x: (x >= success_threshold).sum())
+    ).reset_index()
+
+
+def attempts_frame(rows=3000, seed=0):
+    """Tentatives préparées comme par `prepare_data` : scores décimaux ou manquants, unités et dates manquantes."""
+    rng = np.random.default_rng(seed)
+    units = np.array(["GMM", "QAR", "PWR", "GRD", "HYD", None], dtype=object)
+    regions = {"GMM": "MENAT", "QAR": "MENAT", "PWR": "ERCIS", "GRD": "NAM", "HYD": "Unknown"}
+    scores = rng.integers(0, 1001, rows) / 10
+    scores[rng.random(rows) < 0.05] = np.nan
+    dates = pd.Series(pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 500, rows), unit="D"))
+    dates[rng.random(rows) < 0.02] = pd.NaT
+    df = pd.DataFrame({
+        "SDSU Unit": rng.choice(units, rows),
+        "Date": dates,
+        "Percent Score": scores,
+        "Attempts": rng.integers(1, 4, rows),
+    })
+    df["Region"] = df["SDSU Unit"].map(regions).fillna("Unknown")
+    return df
+
+
+@pytest.mark.parametrize("start, end", [
+    (date(2024, 1, 1), date(2025, 5, 15)),
+    (date(2024, 3, 10), date(2024, 3, 10)),
+    (date(2024, 6, 1), date(2024, 11, 30)),
+    (date(2026, 1, 1), date(2026, 12, 31)),
+])
+@pytest.mark.parametrize("threshold", [0, 70, 80, 100])
+def test_query_matches_legacy_groupby(start, end, threshold):
+    # Tentatives à minuit, comme la borne de fin de l'ancien filtre
+    df = attempts_frame()
+    expected = legacy_query(df, start, end, threshold)
+    result = KPICube.from_frame(df).query(start, end, threshold)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    assert result["Attempts"].sum() == expected["Attempts"].sum()
+
+
+def test_end_day_included_whole():
+    df = attempts_frame()
+    df["Date"] = df["Date"] + pd.Timedelta(hours=15)
+    start, end = date(2024, 2, 1), date(2024, 8, 31)
+    # L'ancien filtre comparait à minuit le jour de fin : le cube le prend en entier
+    expected = legacy_query(df, start, pd.Timestamp(end) + pd.Timedelta(days=1) - pd.Timedelta(1, "ns"), 80)
+    pd.testing.assert_frame_equal(KPICube.from_frame(df).query(start, end, 80), expected, check_dtype=False)
+
+
+def test_histogram_counts_scores_by_bucket():
+    df = attempts_frame()
+    start, end = date(2024, 4, 1), date(2024, 9, 30)
+    kept = df[df["SDSU Unit"].notna() & (df["Date"] >= pd.Timestamp(start)) & (df["Date"] <= pd.Timestamp(end))]
+    buckets = np.floor(kept["Percent Score"].fillna(MIN_BUCKET)).astype(int)
+    expected = np.bincount(buckets - MIN_BUCKET, minlength=MAX_BUCKET - MIN_BUCKET + 1)
+
+    histogram = KPICube.from_frame(df).histogram(start, end)
+    np.testing.assert_array_equal(histogram, expected)
+    assert histogram[0] == kept["Percent Score"].isna().sum()
+
+
+def test_empty_range():
+    cube = KPICube.from_frame(attempts_frame(rows=200))
+    assert cube.query(date(2030, 1, 1), date(2030, 12, 31), 80).empty
+    assert cube.histogram(date(2030, 1, 1), date(2030, 12, 31)).sum() == 0
+    assert cube.date_bounds()[0] >= date(2024, 1, 1)
@@ -0,0 +1,93 @@
+"""Tests de la reprise d'un run par le manifeste du dossier de sortie (Worker/manifest.py)."""
+import os
+
+from Worker.converters import FakeConverter
+from Worker.engine import CertificateEngine
+from Worker.generation import CertificateJob
+from Worker.manifest import RunManifest
+from test_generation import PARTICIPANTS, TEMPLATE, write_export
+
+
+TITLE = "Safety Basics"
+
+
+def run(excel_path, output):
+    """Run complet sans mail ; retourne les noms des PDF (re)générés par ce run."""
+    converter = FakeConverter()
+    engine = CertificateEngine(TEMPLATE, excel_path, TITLE, str(output), converter=converter,
+                               render_backend="powerpoint", excel_cache=False, send_mail=False)
+    engine.run()
+    assert engine.error is None
+    return sorted(os.path.basename(pdf) for _, pdf in converter.converted), engine.total_certificates
+
+
+def pdf(output, nom):
+    return output / f"{TITLE} - {nom}.pdf"
+
+
+def test_rerun_skips_finished_and_regenerates_changed(tmp_path):
+    excel_path = str(tmp_path / "FORM_1.xlsx")
+    output = tmp_path / "out"
+    write_export(excel_path, PARTICIPANTS)
+    all_pdfs = sorted(pdf(output, nom).name for nom in ("Martin, Alice", "Durand, Bob", "NguyenChloe"))
+
+    assert run(excel_path, output) == (all_pdfs, 3)
+    # Rien de changé : aucun PDF régénéré, les trois certificats sont repris
+    assert run(excel_path, output) == ([], 3)
+
+    # PDF supprimé
+    os.remove(pdf(output, "Martin, Alice"))
+    assert run(excel_path, output) == ([pdf(output, "Martin, Alice").name], 3)
+
+    # PDF modifié après coup
+    with open(pdf(output, "Durand, Bob"), "ab") as f:
+        f.write(b"% edited")
+    assert run(excel_path, output) == ([pdf(output, "Durand, Bob").name], 3)
+
+    # Champ rendu modifié dans l'export (SSO corrigé)
+    changed = [PARTICIPANTS[0], PARTICIPANTS[1], PARTICIPANTS[2][:2] + (100000099,) + PARTICIPANTS[2][3:]]
+    write_export(excel_path, changed)
+    assert run(excel_path, output) == ([pdf(output, "NguyenChloe").name], 3)
+    assert run(excel_path, output) == ([], 3)
+
+
+def test_mailed_certificate_not_generated_again(tmp_path):
+    excel_path = str(tmp_path / "FORM_1.xlsx")
+    output = tmp_path / "out"
+    write_export(excel_path, PARTICIPANTS[:2])
+    run(excel_path, output)
+
+    manifest = RunManifest(str(output))
+    replacements = {"{{NOM}}": "Martin, Alice", "{{SSO}}": "100000001", "{{FORMATION}}": TITLE,
+                    "{{DATE_FORMATION}}": "17/03/2025", "{{DATE_EDITION}}": "1st January 2025"}
+    job = CertificateJob(0, "Martin, Alice", "alice.martin@example.com", replacements,
+                         str(pdf(output, "Martin, Alice").resolve()))
+    assert manifest.resume_state(job) == "converted"
+    manifest.mark(job, "mailed")
+    manifest.close()
+
+    # Le certificat envoyé n'est ni régénéré ni compté, l'autre est repris
+    assert run(excel_path, output) == ([], 1)
+
+
+def test_resume_state_compares_fields_except_edition_date(tmp_path):
+    path = tmp_path / "cert.pdf"
+    path.write_bytes(b"%PDF-1.4 cert")
+    replacements = {"{{NOM}}": "Martin, Alice", "{{SSO}}": "100000001", "{{FORMATION}}": TITLE,
+                    "{{DATE_FORMATION}}": "17/03/2025", "{{DATE_EDITION}}": "1st January 2025"}
+    manifest = RunManifest(str(tmp_path))
+    manifest.mark(CertificateJob(0, "Martin, Alice", "", replacements, str(path)), "converted")
+
+    def state(**changes):
+        fields = dict(replacements, **changes)
+        return manifest.resume_state(CertificateJob(0, "Martin, Alice", "", fields, str(path)))
+
+    assert state() == "converted"
+    # Date d'édition recalculée à chaque run : sans effet
+    assert state(**{"{{DATE_EDITION}}": "18th October 2026"}) == "converted"
+    # Champ supplémentaire du modèle : même participant, champs différents
+    assert state(**{"{{SCORE}}": "95"}) is None
+    # Étape "filled" seulement (conversion interrompue) : à régénérer
+    manifest.mark(CertificateJob(0, "Martin, Alice", "", replacements, str(path)), "filled")
+    assert state() is None
+    manifest.close()
@@ -0,0 +1,127 @@
+"""Tests de l'outbox SQLite des mails (Worker/outbox.py)."""
+import pytest
+
+from Worker.outbox import Outbox, replay
+from Worker.transports import MailTransport
+
+
+PARAMS = {"formation_title": "Safety Basics"}
+
+
+class RecordingTransport(MailTransport):
+    """Transport sans réseau : garde (destinataire, sujet, pièce jointe) de chaque envoi."""
+
+    def __init__(self):
+        super().__init__(retries=0)
+        self.messages = []
+
+    def _send(self, skeleton, to, subject, attachment):
+        self.messages.append((to, subject, attachment))
+
+
+@pytest.fixture
+def certificate(tmp_path):
+    path = tmp_path / "Safety Basics - Martin, Alice.pdf"
+    path.write_bytes(b"%PDF-1.4 Martin")
+    return str(path)
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = Outbox(str(tmp_path))
+    yield outbox
+    outbox.close()
+
+
+def enqueue(outbox, run_id, attachment, recipient="alice@example.com"):
+    return outbox.enqueue(run_id, recipient, "March 2025, Safety Basics - Training Certificate", "certificate",
+                          PARAMS, attachment, cc="training@example.com", context={"manifest_key": [0, "x"]})
+
+
+def test_same_message_enqueued_once(outbox, certificate):
+    assert enqueue(outbox, "run-1", certificate) == "queued"
+    assert enqueue(outbox, "run-1", certificate) == "duplicate"
+    assert outbox.runs() == {"run-1": {"pending": 1}}
+
+    # Déjà envoyé : n'est pas réinscrit, même par un autre run
+    [entry] = outbox.claim(10)
+    outbox.mark_sent(entry["id"])
+    assert enqueue(outbox, "run-2", certificate) == "sent"
+    assert outbox.runs() == {"run-1": {"sent": 1}}
+
+
+def test_changed_certificate_is_a_new_message(outbox, certificate):
+    assert enqueue(outbox, "run-1", certificate) == "queued"
+    with open(certificate, "wb") as f:
+        f.write(b"%PDF-1.4 Martin, regenerated")
+    assert enqueue(outbox, "run-1", certificate) == "queued"
+    assert outbox.runs() == {"run-1": {"pending": 2}}
+
+
+def test_failed_or_abandoned_entry_taken_over(outbox, certificate):
+    enqueue(outbox, "run-1", certificate)
+    # Laissée en file par un run interrompu : rattachée au nouveau run
+    assert enqueue(outbox, "run-2", certificate) == "queued"
+    assert outbox.runs() == {"run-2": {"pending": 1}}
+
+    [entry] = outbox.claim(10)
+    outbox.mark_failed(entry["id"], "451 Try again later")
+    assert enqueue(outbox, "run-2", certificate) == "queued"
+    [entry] = outbox.claim(10)
+    # Entrée lue avant d'être réservée : une tentative déjà comptée
+    assert entry["attempts"] == 1
+    assert entry["params"] == PARAMS
+
+
+def test_claim_reserves_entries_once(outbox, tmp_path):
+    for i in range(3):
+        path = tmp_path / f"cert{i}.pdf"
+        path.write_bytes(f"%PDF-1.4 {i}".encode())
+        enqueue(outbox, "run-1", str(path), f"user{i}@example.com")
+
+    first = outbox.claim(2, "run-1")
+    assert [e["recipient"] for e in first] == ["user0@example.com", "user1@example.com"]
+    assert all(e["state"] == "pending" and e["attempts"] == 0 for e in first)  # valeurs lues avant réservation
+    assert [e["recipient"] for e in outbox.claim(10, "run-1")] == ["user2@example.com"]
+    assert outbox.claim(10, "run-1") == []
+    assert outbox.runs() == {"run-1": {"sending": 3}}
+
+
+def test_replay_after_crash(tmp_path, certificate):
+    outbox = Outbox(str(tmp_path))
+    enqueue(outbox, "run-1", certificate)
+    outbox.claim(10)
+    # Plantage pendant l'envoi : l'entrée reste "sending"
+    outbox.close()
+
+    transport = RecordingTransport()
+    assert replay(str(tmp_path), "run-1", transport=transport) == (1, 0)
+    assert transport.messages == [
+        ("alice@example.com", "March 2025, Safety Basics - Training Certificate", certificate),
+    ]
+
+    outbox = Outbox(str(tmp_path))
+    assert outbox.runs() == {"run-1": {"sent": 1}}
+    # Un second replay ne renvoie rien
+    outbox.close()
+    assert replay(str(tmp_path), "run-1", transport=RecordingTransport()) == (0, 0)
+
+
+def test_requeue_counts_failures(outbox, tmp_path):
+    for i in range(4):
+        path = tmp_path / f"cert{i}.pdf"
+        path.write_bytes(f"%PDF-1.4 {i}".encode())
+        enqueue(outbox, "run-1" if i < 3 else "run-2", str(path), f"user{i}@example.com")
+    entries = outbox.claim(10)
+    outbox.mark_failed(entries[0]["id"], "550 Mailbox unavailable")
+    outbox.mark_failed(entries[1]["id"], "timeout")
+    outbox.mark_sent(entries[2]["id"])
+    # entries[3] (run-2) reste "sending"
+    assert [e["last_error"] for e in outbox.failures("run-1")] == ["550 Mailbox unavailable", "timeout"]
+
+    assert outbox.requeue("run-1", states=("failed",)) == 2
+    assert outbox.runs() == {"run-1": {"pending": 2, "sent": 1}, "run-2": {"sending": 1}}
+    assert outbox.requeue("run-1") == 0
+    assert outbox.requeue() == 1
+    assert outbox.runs() == {"run-1": {"pending": 2, "sent": 1}, "run-2": {"pending": 1}}
+    assert [e["recipient"] for e in outbox.failures()] == []
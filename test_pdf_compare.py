@@ -0,0 +1,29 @@
+"""Tests de la comparaison avec les certificats de référence (Worker/pdf_compare.py)."""
+import os
+
+from Worker import pdf_compare
+from Worker.converters import write_text_pdf
+
+
+REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sortie", "DS - ASMAE EL AZZOUZI.pdf")
+
+
+def test_reference_without_text_and_without_pymupdf_is_not_measured(monkeypatch):
+    monkeypatch.setattr(pdf_compare, "pixel_difference", lambda pdf_path, reference_path: None)
+    result = pdf_compare.compare(REFERENCE, REFERENCE)
+    assert result["text"] is None
+    assert not result["measured"]
+    assert not result["passed"]
+    assert pdf_compare.main([REFERENCE, REFERENCE]) == 1
+
+
+def test_text_similarity_decides_without_pymupdf(monkeypatch, tmp_path):
+    monkeypatch.setattr(pdf_compare, "pixel_difference", lambda pdf_path, reference_path: None)
+    reference, same, other = (str(tmp_path / name) for name in ("reference.pdf", "same.pdf", "other.pdf"))
+    write_text_pdf(reference, ["Training Certificate Martin Alice"])
+    write_text_pdf(same, ["Training Certificate Martin Alice"])
+    write_text_pdf(other, ["Something else entirely"])
+
+    assert pdf_compare.compare(same, reference)["passed"]
+    result = pdf_compare.compare(other, reference)
+    assert result["measured"] and not result["passed"]
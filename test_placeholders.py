@@ -0,0 +1,90 @@
+"""Tests des balises découpées en plusieurs runs (Worker/placeholders.py)."""
+import io
+
+from lxml import etree
+from pptx import Presentation
+from pptx.util import Pt
+
+from Worker.placeholders import A_R, A_T, NS_A, PlaceholderEngine
+from Worker.template import PLACEHOLDERS, CompiledTemplate
+
+
+# "M. {{NOM}} ({{SSO}})" : {{NOM}} réparti sur trois runs de mises en forme différentes
+PARAGRAPH = f"""<a:p xmlns:a="{NS_A}">
+<a:r><a:rPr lang="fr-FR" sz="2400" b="1"/><a:t>M. {{{{NO</a:t></a:r>
+<a:r><a:rPr lang="fr-FR" i="1"/><a:t>M</a:t></a:r>
+<a:r><a:rPr lang="fr-FR"/><a:t>}}}} (</a:t></a:r>
+<a:r><a:rPr lang="fr-FR" sz="1200"/><a:t>{{{{SSO}}}})</a:t></a:r>
+</a:p>"""
+
+REPLACEMENTS = {"{{NOM}}": "Martin, Alice", "{{SSO}}": "100000001"}
+
+
+def paragraph_text(paragraph):
+    return "".join(run.findtext(A_T) or "" for run in paragraph.iterchildren(A_R))
+
+
+def test_split_placeholder_merged_into_first_run():
+    engine = PlaceholderEngine(PLACEHOLDERS)
+    paragraph = etree.fromstring(PARAGRAPH)
+
+    found, merged = engine.merge_runs(paragraph)
+
+    assert found == ["{{NOM}}", "{{SSO}}"]
+    assert merged == 1
+    runs = list(paragraph.iterchildren(A_R))
+    # Le run du milieu ne contenait qu'un fragment de la balise : supprimé
+    assert [run.findtext(A_T) for run in runs] == ["M. {{NOM}}", " (", "{{SSO}})"]
+    assert runs[0].find(f"{{{NS_A}}}rPr").attrib == {"lang": "fr-FR", "sz": "2400", "b": "1"}
+
+
+def test_fill_after_merge_keeps_first_run_formatting():
+    engine = PlaceholderEngine(PLACEHOLDERS)
+    root = etree.fromstring(PARAGRAPH)
+    engine.normalize_element(root)
+
+    filled = etree.fromstring(engine.fill(etree.tostring(root, encoding="unicode"), REPLACEMENTS).encode("utf-8"))
+
+    assert paragraph_text(filled) == "M. Martin, Alice (100000001)"
+    first = next(filled.iterchildren(A_R))
+    assert first.findtext(A_T) == "M. Martin, Alice"
+    assert first.find(f"{{{NS_A}}}rPr").get("b") == "1"
+    assert first.find(f"{{{NS_A}}}rPr").get("sz") == "2400"
+
+
+def test_substitute_element_in_one_pass():
+    engine = PlaceholderEngine(REPLACEMENTS)
+    root = etree.fromstring(PARAGRAPH)
+    engine.substitute_element(root, REPLACEMENTS)
+    assert paragraph_text(root) == "M. Martin, Alice (100000001)"
+
+
+def test_line_break_interrupts_placeholder():
+    engine = PlaceholderEngine(PLACEHOLDERS)
+    paragraph = etree.fromstring(
+        f'<a:p xmlns:a="{NS_A}"><a:r><a:t>{{{{NO</a:t></a:r><a:br/><a:r><a:t>M}}}}</a:t></a:r></a:p>'
+    )
+    assert engine.merge_runs(paragraph) == ([], 0)
+    assert [t.text for t in paragraph.iter(A_T)] == ["{{NO", "M}}"]
+
+
+def test_compiled_template_fills_split_placeholder(tmp_path):
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    paragraph = slide.shapes.add_textbox(0, 0, 5000000, 1000000).text_frame.paragraphs[0]
+    for text, bold in (("M. {{NO", True), ("M", False), ("}} - {{SSO}}", False)):
+        run = paragraph.add_run()
+        run.text = text
+        run.font.bold = bold
+        run.font.size = Pt(24)
+    path = str(tmp_path / "split.pptx")
+    prs.save(path)
+
+    template = CompiledTemplate(path)
+    filled = Presentation(io.BytesIO(template.render(REPLACEMENTS)))
+
+    runs = filled.slides[0].shapes[0].text_frame.paragraphs[0].runs
+    assert "".join(run.text for run in runs) == "M. Martin, Alice - 100000001"
+    assert runs[0].text == "M. Martin, Alice"
+    assert runs[0].font.bold
+    assert runs[0].font.size == Pt(24)
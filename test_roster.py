@@ -0,0 +1,202 @@
+"""Tests de la lecture en flux et du filtrage des participants (Worker/roster.py)."""
+import os
+import glob
+import logging
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from Worker.roster import RosterReader, parse_roster, select_participants
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def export_frame(rows):
+    """Export tel que lu par `pd.read_excel(path, skiprows=1)` : date, nom, -, score, -, -, -, sso, email."""
+    return pd.DataFrame(
+        [[day, nom, None, score, None, None, None, sso, email] for day, nom, score, sso, email in rows],
+        columns=["Start time", "Name", "Email", "Total points", "Quiz", "Grade", "Completion", "SSO", "Email address"],
+    )
+
+
+def legacy_filter(df, score_min=80, date_start=None, date_end=None):
+    """Boucle ligne à ligne du worker avant la version vectorisée (messages INFO et plus, participants retenus)."""
+    participants, messages = [], []
+    for index, row in df.iterrows():
+        try:
+            formation_date = pd.to_datetime(str(row.iloc[0])).date()
+        except Exception:
+            messages.append(f"Row {index + 2}: invalid training date, certificate ignored.")
+            continue
+        if date_start and formation_date < date_start:
+            continue
+        if date_end and formation_date > date_end:
+            continue
+        try:
+            score = float(row.iloc[3])
+        except Exception:
+            messages.append(f"Row {index + 2}: invalid score, certificate ignored.")
+            continue
+        if score < score_min:
+            messages.append(f"{row.iloc[1]} not certified (score {score} < {score_min})")
+            continue
+        sso_raw = row.iloc[7]
+        if pd.isna(sso_raw):
+            sso = ""
+        else:
+            sso = str(int(sso_raw)) if isinstance(sso_raw, float) and sso_raw.is_integer() else str(sso_raw)
+        participants.append((index, str(row.iloc[1]), sso, str(row.iloc[8]),
+                             pd.to_datetime(str(row.iloc[0])).strftime("%d/%m/%Y"), formation_date, score))
+    return participants, messages
+
+
+SMALL_EXPORT = [
+    (datetime(2025, 3, 17, 10, 30), "Martin, Alice", 95, 100000001.0, "alice@example.com"),
+    ("not a date", "Durand, Bob", 90, 100000002.0, "bob@example.com"),
+    (datetime(2025, 3, 18, 9, 0), "Nguyen, Chloe", "n/a", 100000003.0, "chloe@example.com"),
+    (datetime(2025, 3, 18, 11, 0), "Petit, David", 60, 100000004.0, "david@example.com"),
+    (datetime(2024, 12, 2, 14, 0), "Roux, Emma", 100, 100000005.0, "emma@example.com"),
+    (datetime(2025, 4, 1, 8, 0), "Blanc, Farid", 85, "A12345", "farid@example.com"),
+    (datetime(2025, 3, 19, 16, 45), "Moreau, Gina", 80, 100000007.0, "gina@example.com"),
+]
+
+
+def messages_at_info(rejected):
+    return [row.message for row in rejected if row.level >= logging.INFO]
+
+
+def test_same_result_as_legacy_loop():
+    df = export_frame(SMALL_EXPORT)
+    for period in ((None, None), (date(2025, 1, 1), date(2025, 3, 31)), (date(2025, 3, 18), None)):
+        participants, rejected = select_participants(parse_roster(df), 80, *period)
+        legacy_participants, legacy_messages = legacy_filter(df, 80, *period)
+        assert [tuple(p) for p in participants] == legacy_participants
+        assert messages_at_info(rejected) == legacy_messages
+
+
+def test_rejection_reasons_in_order():
+    df = export_frame([
+        (None, "Empty date", 90, 1.0, "a@example.com"),               # date illisible, avant tout le reste
+        (datetime(2024, 1, 5), "Too early", None, 2.0, "b@example.com"),  # hors période, même sans score
+        (datetime(2025, 3, 17), "No score", None, 3.0, "c@example.com"),
+        (datetime(2025, 3, 17), "Low score", 40, 4.0, "d@example.com"),
+        (datetime(2025, 3, 17), "Certified", 100, 5.0, "e@example.com"),
+        ("garbage", "Bad date and score", "x", 6.0, "f@example.com"),
+    ])
+
+    participants, rejected = select_participants(parse_roster(df), 80, date(2025, 1, 1), date(2025, 12, 31))
+
+    assert [p.nom for p in participants] == ["Certified"]
+    assert [(r.row, r.reason) for r in rejected] == [
+        (0, "invalid_date"), (1, "out_of_period"), (2, "invalid_score"), (3, "score_below_min"), (5, "invalid_date"),
+    ]
+    assert [r.level for r in rejected] == [logging.WARNING, logging.DEBUG, logging.WARNING, logging.INFO,
+                                           logging.WARNING]
+
+
+def test_empty_score_rejected_as_invalid():
+    # La boucle d'origine certifiait un score vide (float(NaN) ne lève pas) : il est désormais écarté
+    df = export_frame([(datetime(2025, 3, 17), "No score", None, 1.0, "a@example.com")])
+    participants, rejected = select_participants(parse_roster(df))
+    assert participants == []
+    assert [(r.reason, r.message) for r in rejected] == [
+        ("invalid_score", "Row 2: invalid score, certificate ignored."),
+    ]
+
+
+def test_messages_cite_excel_rows():
+    df = export_frame(SMALL_EXPORT)
+    # Bloc du milieu d'une lecture en flux : l'index garde le numéro de ligne du fichier
+    chunk = parse_roster(df).iloc[1:4]
+    _, rejected = select_participants(chunk)
+    assert [r.message for r in rejected] == [
+        "Row 3: invalid training date, certificate ignored.",
+        "Row 4: invalid score, certificate ignored.",
+        "Petit, David not certified (score 60.0 < 80)",
+    ]
+
+
+def test_messages_cite_line_column():
+    roster = parse_roster(export_frame(SMALL_EXPORT[:3])).reset_index(drop=True)
+    roster["line"] = ["FORM_1.xlsx:12", "FORM_2.xlsx:3", "FORM_2.xlsx:4"]
+    participants, rejected = select_participants(roster)
+    assert [p.row for p in participants] == [0]
+    assert [r.message for r in rejected] == [
+        "Row FORM_2.xlsx:3: invalid training date, certificate ignored.",
+        "Row FORM_2.xlsx:4: invalid score, certificate ignored.",
+    ]
+
+
+def write_rows(path, rows):
+    """Classeur au format de l'export Forms (lignes 1 et 2 d'en-tête) ; None = ligne vide."""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Start time", "Name", "Email", "Total points", "Quiz", "Grade", "Completion", "SSO", "Email address"])
+    sheet.append(["Header read by pandas"] + [None] * 8)
+    for number, row in enumerate(rows, start=3):
+        if row is None:
+            continue
+        day, nom, score, sso, email = row
+        for column, value in zip((1, 2, 4, 8, 9), (day, nom, score, sso, email)):
+            sheet.cell(number, column, value)
+        sheet.cell(number, 3, "ignored column")
+    workbook.save(path)
+
+
+STREAMED_ROWS = SMALL_EXPORT[:3] + [None, None] + SMALL_EXPORT[3:] + [None] + SMALL_EXPORT[:2] + [None, None]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 500])
+def test_streamed_chunks_match_read_excel(tmp_path, chunk_size):
+    path = str(tmp_path / "FORM_1.xlsx")
+    write_rows(path, STREAMED_ROWS)
+    expected = parse_roster(pd.read_excel(path, skiprows=1))
+
+    reader = RosterReader(path, chunk_size=chunk_size)
+    chunks = list(reader)
+
+    if chunk_size < len(STREAMED_ROWS):
+        assert len(chunks) > 1
+    streamed = pd.concat(chunks)
+    # Lignes vides du milieu gardées (même index que pandas), lignes vides finales ignorées
+    assert len(streamed) == len(STREAMED_ROWS) - 2
+    pd.testing.assert_frame_equal(streamed, expected, check_index_type=False)
+    assert reader.rows_read == reader.total_rows == len(expected)
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(HERE, "Templates", "*.xlsx")))[:3])
+def test_sample_exports_match_read_excel(path):
+    expected = parse_roster(pd.read_excel(path, skiprows=1))
+    streamed = pd.concat(list(RosterReader(path, chunk_size=7)))
+    pd.testing.assert_frame_equal(streamed, expected, check_index_type=False)
+
+
+def test_messages_from_streamed_chunks_cite_file_rows(tmp_path):
+    path = str(tmp_path / "FORM_1.xlsx")
+    write_rows(path, STREAMED_ROWS)
+    messages = []
+    for chunk in RosterReader(path, chunk_size=2):
+        messages.extend(r.message for r in select_participants(chunk)[1] if r.level >= logging.WARNING)
+    # Numéros index + 2 comme la boucle d'origine sur `read_excel(skiprows=1)`, quel que soit le bloc ;
+    # lignes vides du milieu signalées (date illisible), lignes vides finales ignorées
+    assert messages == [
+        "Row 3: invalid training date, certificate ignored.",
+        "Row 4: invalid score, certificate ignored.",
+        "Row 5: invalid training date, certificate ignored.",
+        "Row 6: invalid training date, certificate ignored.",
+        "Row 11: invalid training date, certificate ignored.",
+        "Row 13: invalid training date, certificate ignored.",
+    ]
+
+
+def test_numeric_or_blank_name_alone_in_chunk(tmp_path):
+    # Ligne de total (nom numérique) et nom vide isolés dans leur bloc : mêmes textes que la colonne entière
+    path = str(tmp_path / "FORM_1.xlsx")
+    write_rows(path, SMALL_EXPORT[:2] + [(None, 84, None, None, None), (datetime(2025, 3, 17), None, 90, 1.0, "")])
+    expected = parse_roster(pd.read_excel(path, skiprows=1))
+    streamed = pd.concat(list(RosterReader(path, chunk_size=1)))
+    pd.testing.assert_frame_equal(streamed, expected, check_index_type=False)
+    assert streamed["nom"].iloc[2] == "84"
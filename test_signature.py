@@ -0,0 +1,116 @@
+"""Tests du cache de signature Outlook et du squelette commun des mails (Worker/mail.py)."""
+import os
+import email
+from email import policy
+
+import pytest
+
+from Worker.mail import SIGNATURE_ENCODING, MailComposer, MailSkeleton, SignatureCache
+
+
+PNG = b"\x89PNG\r\n\x1a\nfirst image"
+
+SIGNATURE_HTML = """<html><body>
+<p>Jean Dupont</p>
+<img width=120 src="jdoe_files/image001.png" alt="logo">
+</body></html>"""
+
+
+@pytest.fixture
+def signatures(tmp_path):
+    """Dossier Signatures d'Outlook : jdoe.htm et son image dans jdoe_files/."""
+    (tmp_path / "jdoe_files").mkdir()
+    (tmp_path / "jdoe_files" / "image001.png").write_bytes(PNG)
+    (tmp_path / "jdoe.htm").write_text(SIGNATURE_HTML, encoding=SIGNATURE_ENCODING)
+    return tmp_path
+
+
+def touch(path, data):
+    """Réécrit le fichier avec une date de modification forcément différente."""
+    stat = os.stat(path)
+    path.write_bytes(data)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def parsed(message):
+    return email.message_from_bytes(message.as_bytes(), policy=policy.default)
+
+
+def test_signature_images_rewritten_to_cid(signatures):
+    signature = SignatureCache(str(signatures), "jdoe").get()
+
+    assert 'src="cid:image001.png"' in signature.html
+    assert "jdoe_files/" not in signature.html
+    assert len(signature.images) == 1
+    image = signature.images[0]
+    assert image.cid == "image001.png"
+    assert image.data == PNG
+    assert image.mime_type == "image/png"
+
+
+def test_signature_read_once_until_modified(signatures):
+    cache = SignatureCache(str(signatures), "jdoe")
+    first = cache.get()
+    assert cache.get() is first
+    assert cache.loads == 1
+
+    # Image modifiée : la signature est relue
+    touch(signatures / "jdoe_files" / "image001.png", b"\x89PNG\r\n\x1a\nnew image")
+    second = cache.get()
+    assert second is not first
+    assert second.images[0].data == b"\x89PNG\r\n\x1a\nnew image"
+    assert cache.loads == 2
+
+    # HTML modifié
+    touch(signatures / "jdoe.htm", SIGNATURE_HTML.replace("Jean Dupont", "J. Dupont").encode(SIGNATURE_ENCODING))
+    third = cache.get()
+    assert "J. Dupont" in third.html
+    assert cache.get() is third
+    assert cache.loads == 3
+
+
+def test_message_swaps_only_recipient_subject_and_attachment(signatures, tmp_path):
+    skeleton = MailSkeleton("Dears,\nYour certificate.", SignatureCache(str(signatures), "jdoe").get(),
+                            cc="training@example.com")
+    first_pdf, second_pdf = tmp_path / "Safety - Martin.pdf", tmp_path / "Safety - Durand.pdf"
+    first_pdf.write_bytes(b"%PDF-1.4 Martin")
+    second_pdf.write_bytes(b"%PDF-1.4 Durand")
+
+    first = skeleton.to_mime("alice@example.com", "Safety - Martin", str(first_pdf))
+    second = skeleton.to_mime("bob@example.com", "Safety - Durand", str(second_pdf))
+
+    # Corps et images construits une fois pour tous les messages
+    assert first.get_payload()[0] is second.get_payload()[0]
+
+    first, second = parsed(first), parsed(second)
+    # Mêmes en-têtes (la frontière MIME, tirée au hasard, mise à part)
+    assert first.keys() == second.keys()
+    changed = {"To", "Subject", "Content-Type"}
+    assert [(k, v) for k, v in first.items() if k not in changed] == \
+           [(k, v) for k, v in second.items() if k not in changed]
+    assert first.get_content_type() == second.get_content_type() == "multipart/mixed"
+    assert (first["To"], first["Subject"]) == ("alice@example.com", "Safety - Martin")
+    assert (second["To"], second["Subject"]) == ("bob@example.com", "Safety - Durand")
+    assert first["Cc"] == "training@example.com"
+
+    for message, pdf in ((first, first_pdf), (second, second_pdf)):
+        body = message.get_body(("html",)).get_content()
+        assert 'src="cid:image001.png"' in body
+        assert "Your certificate." in body
+        images = [part for part in message.walk() if part["Content-ID"] == "<image001.png>"]
+        assert [image.get_payload(decode=True) for image in images] == [PNG]
+        attachments = list(message.iter_attachments())
+        assert [a.get_filename() for a in attachments] == [pdf.name]
+        assert attachments[0].get_payload(decode=True) == pdf.read_bytes()
+
+
+def test_composer_rebuilds_skeleton_only_when_signature_changes(signatures):
+    composer = MailComposer(SignatureCache(str(signatures), "jdoe"))
+    params = {"formation_title": "Safety Basics"}
+    skeleton = composer.skeleton("certificate", params, cc="training@example.com")
+    assert composer.skeleton("certificate", params, cc="training@example.com") is skeleton
+
+    touch(signatures / "jdoe_files" / "image001.png", b"\x89PNG\r\n\x1a\nnew image")
+    rebuilt = composer.skeleton("certificate", params, cc="training@example.com")
+    assert rebuilt is not skeleton
+    assert rebuilt.images[0].data == b"\x89PNG\r\n\x1a\nnew image"
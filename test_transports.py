@@ -0,0 +1,118 @@
+"""Tests de SmtpTransport (Worker/transports.py) contre un serveur aiosmtpd local."""
+import socket
+import smtplib
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from Worker.mail import MailSkeleton
+from Worker.transports import SmtpTransport
+
+
+class Recorder:
+    """Handler aiosmtpd : garde les messages reçus, répond 451 aux `refuse` prochains."""
+
+    def __init__(self):
+        self.messages = []
+        self.refuse = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.refuse:
+            self.refuse -= 1
+            return "451 4.3.0 Try again later"
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class SmtpServer:
+    """Serveur SMTP local, redémarrable sur le même port."""
+
+    def __init__(self):
+        self.handler = Recorder()
+        self.port = free_port()
+        self.controller = None
+
+    def start(self):
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+
+    def stop(self):
+        if self.controller is not None:
+            self.controller.stop()
+            self.controller = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+
+@pytest.fixture
+def server():
+    server = SmtpServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+def transport_for(server, **kwargs):
+    return SmtpTransport("127.0.0.1", server.port, sender="noreply@example.com", timeout=5, **kwargs)
+
+
+def send(transport, count, skeleton=None):
+    skeleton = skeleton or MailSkeleton("Dears,\nYour certificate.")
+    for i in range(count):
+        transport.send(skeleton, f"user{i}@example.com", f"Certificate {i}")
+
+
+def test_connection_reused_across_sends(server):
+    with transport_for(server, pool_size=1) as transport:
+        send(transport, 5)
+    assert transport.sent == 5
+    assert transport.connections_opened == 1
+    assert [m.rcpt_tos for m in server.handler.messages] == [[f"user{i}@example.com"] for i in range(5)]
+
+
+def test_retry_after_451(server):
+    server.handler.refuse = 1
+    with transport_for(server, pool_size=1, retries=1) as transport:
+        send(transport, 1)
+    assert transport.sent == 1
+    assert len(server.handler.messages) == 1
+    # La connexion qui a reçu le 451 est abandonnée, l'envoi repart sur une nouvelle
+    assert transport.connections_opened == 2
+
+
+def test_451_without_retry_raises(server):
+    server.handler.refuse = 1
+    with transport_for(server, pool_size=1, retries=0) as transport:
+        with pytest.raises(smtplib.SMTPDataError) as error:
+            send(transport, 1)
+    assert error.value.smtp_code == 451
+    assert transport.sent == 0
+    assert server.handler.messages == []
+
+
+def test_reconnect_after_server_restart(server):
+    with transport_for(server, pool_size=1) as transport:
+        send(transport, 1)
+        assert transport.connections_opened == 1
+        # La connexion gardée dans le pool est coupée par le redémarrage
+        server.restart()
+        send(transport, 1)
+    assert transport.sent == 2
+    assert transport.connections_opened == 2
+    assert len(server.handler.messages) == 2
+
+
+def test_connection_renewed_after_max_messages(server):
+    with transport_for(server, pool_size=1, max_messages=2) as transport:
+        send(transport, 5)
+    assert transport.sent == 5
+    assert transport.connections_opened == 3
+    assert len(server.handler.messages) == 5
@@ -1,3 +1,5 @@
+import os
+
 from PyQt5.QtWidgets import ( 
     QWidget, QVBoxLayout, QLabel, QPushButton, QFileDialog,
     QLineEdit, QFrame, QSpinBox, QDateEdit, QProgressBar, QGraphicsDropShadowEffect
@@ -6,6 +8,7 @@ from PyQt5.QtCore import QDate, Qt
 from PyQt5.QtGui import QColor
 
 from Worker.cert_worker import CertificateWorker
+from Worker.metrics import format_progress
 
 class CertPage(QWidget):
     def __init__(self):
@@ -60,6 +63,14 @@ class CertPage(QWidget):
         self.score_spinbox.setPrefix("Min score: ")
         layout.addWidget(self.score_spinbox)
 
+        # Nombre de process de génération (1 = génération dans le thread du worker)
+        self.workers_spinbox = QSpinBox()
+        self.workers_spinbox.setMinimum(1)
+        self.workers_spinbox.setMaximum(os.cpu_count() or 1)
+        self.workers_spinbox.setValue(1)
+        self.workers_spinbox.setPrefix("Parallel workers: ")
+        layout.addWidget(self.workers_spinbox)
+
         calendar_style = """
             QCalendarWidget QWidget {
                 background-color: #ffffff;
@@ -144,6 +155,11 @@ class CertPage(QWidget):
         self.progress_bar.setFormat("Progress: %p%")
         layout.addWidget(self.progress_bar)
 
+        # Débit et temps restant, mis à jour au plus deux fois par seconde par le worker
+        self.stats_label = QLabel("")
+        self.stats_label.setStyleSheet("color: #7f8c8d; font-size: 13px;")
+        layout.addWidget(self.stats_label)
+
         self.log_label = QLabel("")
         self.log_label.setWordWrap(True)
         self.log_label.setStyleSheet("color: #27ae60; font-weight: 500;")
@@ -218,6 +234,7 @@ class CertPage(QWidget):
         self.log_label.setText("🕒 Generating certificates...")
         self.progress_bar.setValue(0)
         self.progress_bar.setFormat("Generating... %p%")
+        self.stats_label.setText("")
 
         self.worker = CertificateWorker(
             self.template_path,
@@ -226,11 +243,13 @@ class CertPage(QWidget):
             output_folder,
             score_min,
             start,
-            end
+            end,
+            workers=self.workers_spinbox.value()
         )
 
         self.worker.progress.connect(self.show_log_message)
         self.worker.progress_percent.connect(self.progress_bar.setValue)
+        self.worker.stats.connect(self.show_stats)
         self.worker.finished.connect(self.show_log_message)
         self.worker.finished.connect(lambda _: self.progress_bar.setValue(100))
         self.worker.finished.connect(lambda msg: (
@@ -242,5 +261,8 @@ class CertPage(QWidget):
         self.progress_bar.setValue(0)
         self.worker.start()
 
+    def show_stats(self, stats):
+        self.stats_label.setText(f"⏱ {format_progress(stats)}")
+
     def show_log_message(self, message):
         self.log_label.setText(message)
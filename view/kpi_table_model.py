@@ -0,0 +1,90 @@
+"""Modèle Qt du tableau du dashboard KPI (test_kpi.py).
+
+Le modèle garde les colonnes du DataFrame agrégé telles quelles (tableaux
+NumPy) et ne formate que les cellules que la vue demande (`data()`). Le tri
+se fait sur les colonnes, par une permutation des lignes ; changer de
+filtres remplace les colonnes sans créer d'élément par cellule.
+"""
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+
+def format_value(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    return str(value)
+
+
+class KPITableModel(QAbstractTableModel):
+    """Tableau en lecture seule sur un DataFrame ; `set_frame` remplace les données et garde le tri."""
+
+    def __init__(self, frame=None, parent=None):
+        super().__init__(parent)
+        self._headers = []
+        self._columns = []
+        self._numeric = []
+        self._order = np.arange(0)
+        self._sort = None   # (colonne, Qt.SortOrder) choisi dans l'en-tête
+        if frame is not None:
+            self.set_frame(frame)
+
+    def set_frame(self, frame):
+        self.beginResetModel()
+        self._headers = [str(c) for c in frame.columns]
+        self._columns = [frame[c].to_numpy() for c in frame.columns]
+        self._numeric = [pd.api.types.is_numeric_dtype(frame[c]) for c in frame.columns]
+        self._order = self._sorted_order() if self._sort else np.arange(len(frame))
+        self.endResetModel()
+
+    def frame(self):
+        """Les données dans l'ordre affiché (export)."""
+        return pd.DataFrame({h: col[self._order] for h, col in zip(self._headers, self._columns)})
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        column = index.column()
+        if role == Qt.DisplayRole:
+            return format_value(self._columns[column][self._order[index.row()]])
+        if role == Qt.TextAlignmentRole:
+            return int((Qt.AlignRight if self._numeric[column] else Qt.AlignLeft) | Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self._headers[section] if section < len(self._headers) else None
+        return section + 1
+
+    def _sorted_order(self):
+        column, order = self._sort
+        if column >= len(self._columns):
+            return np.arange(len(self._columns[0]) if self._columns else 0)
+        # Tri stable ; valeurs manquantes en fin de tableau dans les deux sens
+        values = pd.Series(self._columns[column])
+        return values.sort_values(ascending=order == Qt.AscendingOrder, kind="stable",
+                                  na_position="last").index.to_numpy()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self._sort = (column, order)
+        previous = self._order
+        self._order = self._sorted_order()
+
+        # La sélection suit les lignes déplacées
+        persistent = self.persistentIndexList()
+        if persistent:
+            position = np.empty(len(self._order), dtype=np.int64)
+            position[self._order] = np.arange(len(self._order))
+            self.changePersistentIndexList(persistent, [
+                self.index(int(position[previous[i.row()]]), i.column()) for i in persistent
+            ])
+        self.layoutChanged.emit()
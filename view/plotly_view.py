@@ -0,0 +1,88 @@
+"""Graphique Plotly persistant du dashboard KPI (test_kpi.py).
+
+Chaque vue charge une seule fois une page locale qui embarque plotly.js (copié
+depuis le paquet Python `plotly`, aucun accès réseau). Les mises à jour
+n'envoient ensuite que la figure en JSON (`fig.to_json()`), redessinée dans la
+page par `Plotly.react`.
+"""
+import os
+import logging
+
+import plotly
+from plotly.offline import get_plotlyjs
+from PyQt5.QtCore import QUrl
+from PyQt5.QtWebEngineWidgets import QWebEngineView
+
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<script src="plotly-{version}.min.js"></script>
+<style>html, body, #chart {{ margin: 0; width: 100%; height: 100%; overflow: hidden; }}</style>
+</head>
+<body>
+<div id="chart"></div>
+<script>
+var chart = document.getElementById("chart");
+function render(figure) {{
+    Plotly.react(chart, figure.data, figure.layout, {{responsive: true, displaylogo: false}});
+}}
+</script>
+</body>
+</html>
+"""
+
+
+def default_assets_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.environ.get("CERT_KPI_ASSETS_DIR") or os.path.join(base, "CertificatesGeneration", "kpi_assets")
+
+
+def _write(path, text):
+    # Écriture atomique : une autre fenêtre peut lire la page au même moment
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def page_path(assets_dir=None):
+    """Chemin de la page hôte, écrite avec plotly.js au premier appel (une fois par version de plotly)."""
+    folder = assets_dir or default_assets_dir()
+    page = os.path.join(folder, f"chart-{plotly.__version__}.html")
+    if not os.path.exists(page):
+        os.makedirs(folder, exist_ok=True)
+        _write(os.path.join(folder, f"plotly-{plotly.__version__}.min.js"), get_plotlyjs())
+        _write(page, PAGE.format(version=plotly.__version__))
+    return page
+
+
+class PlotlyView(QWebEngineView):
+    """Page chargée une fois ; `show_figure` redessine avec la nouvelle figure."""
+
+    def __init__(self, parent=None, assets_dir=None):
+        super().__init__(parent)
+        self._figure = None
+        self._ready = False
+        self.loadStarted.connect(self._loading)
+        self.loadFinished.connect(self._loaded)
+        self.load(QUrl.fromLocalFile(page_path(assets_dir)))
+
+    def show_figure(self, figure_json):
+        """Affiche une figure (`fig.to_json()`) ; pendant le chargement, seule la dernière est gardée."""
+        self._figure = figure_json
+        if self._ready:
+            self.page().runJavaScript(f"render({figure_json});")
+
+    def _loading(self):
+        self._ready = False
+
+    def _loaded(self, ok):
+        if not ok:
+            logging.error(f"KPI chart page failed to load: {self.url().toLocalFile()}")
+            return
+        self._ready = True
+        # Figure reçue pendant le chargement (ou avant un rechargement de la page)
+        if self._figure is not None:
+            self.show_figure(self._figure)